@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+경로 재계획 벤치마크: D* Lite와 매번 전체 A*(GridPlanner). (ROS 없이 실행)
+로봇은 장애물을 모르는 맵(모두 빈 셀)에서 출발해 경로를 따라 한 칸씩 움직이고,
+매 걸음 센서 범위(radius) 안의 실제 셀을 맵에 반영한 뒤 목표까지 다시 계획한다.
+
+    python3 -m auto_runner.benchmark --size 100 --radius 5
+    python3 -m auto_runner.benchmark --size 200 --radius 10 --changes 5 --costs
+"""
+
+import argparse
+import time
+import numpy as np
+from auto_runner.lib.dstar_lite import DStarLite
+from auto_runner.lib.planner import MOVES, ORIENTS, GridPlanner
+
+
+def random_world(size, obstacles=None, seed=0):
+    """임의의 벽(가로/세로 막대)과 직사각형 장애물로 된 grid[x][y] (1: 장애물)"""
+    rng = np.random.default_rng(seed)
+    grid = np.zeros((size, size), dtype=np.int8)
+    for _ in range(obstacles or size // 2):
+        x, y = rng.integers(0, size, 2)
+        length = rng.integers(size // 10, size // 3 + 1)
+        if rng.random() < 0.5:
+            grid[x : x + length, y] = 1
+        elif rng.random() < 0.5:
+            grid[x, y : y + length] = 1
+        else:
+            grid[x : x + length // 4, y : y + length // 4] = 1
+    return grid
+
+
+def near_costs(grid):
+    """장애물 옆 셀은 2, 나머지는 1인 셀 이동 비용 (costmap step_costs 흉내)"""
+    blocked = grid == 1
+    near = np.zeros(grid.shape, dtype=bool)
+    near[1:] |= blocked[:-1]
+    near[:-1] |= blocked[1:]
+    near[:, 1:] |= blocked[:, :-1]
+    near[:, :-1] |= blocked[:, 1:]
+    return np.where(near, 2.0, 1.0)
+
+
+def path_cost(path, costs):
+    if costs is None:
+        return len(path) - 1
+    return float(sum(costs[x][y] for x, y in path[1:]))
+
+
+def _far_cells(world, rng):
+    """서로 먼 빈 셀 두 개 (출발, 목표)"""
+    cells = np.argwhere(world != 1)
+    start = cells[rng.integers(len(cells))]
+    goal = cells[np.abs(cells - start).sum(axis=1).argmax()]
+    return tuple(start.tolist()), tuple(goal.tolist())
+
+
+def bench_replan(size, radius, changes=0, use_costs=False, max_steps=None, seed=0):
+    """
+    같은 맵 순서로 D* Lite(update_map + set_start + plan)와 전체 A*(set_map + plan)를 잰다.
+    changes > 0이면 매 걸음 센서 범위 안의 셀 changes개를 더 바꾼다. (움직이는 장애물)
+    로봇은 D* Lite 경로를 따라가고, 두 경로의 비용이 같은지 매번 확인한다.
+    """
+    rng = np.random.default_rng(seed)
+    world = random_world(size, seed=seed)
+    start, goal = _far_cells(world, rng)
+    world[start] = world[goal] = 0
+    grid = np.zeros_like(world)
+    orient = "x"
+
+    def sense(grid, x, y):
+        grid = grid.copy()
+        window = np.s_[max(0, x - radius) : x + radius + 1, max(0, y - radius) : y + radius + 1]
+        grid[window] = world[window]
+        if changes:
+            xs = np.clip(rng.integers(-radius, radius + 1, changes) + x, 0, size - 1)
+            ys = np.clip(rng.integers(-radius, radius + 1, changes) + y, 0, size - 1)
+            keep = ~(((xs == x) & (ys == y)) | ((xs == goal[0]) & (ys == goal[1])))
+            world[xs[keep], ys[keep]] ^= 1
+            grid[xs[keep], ys[keep]] = world[xs[keep], ys[keep]]
+        return grid, (near_costs(grid) if use_costs else None)
+
+    grid, costs = sense(grid, *start)
+    results = dict(dstar=[], astar=[], expanded=[], changed=[], mismatch=0)
+    started = time.perf_counter()
+    dstar = DStarLite(grid, goal, costs)
+    dstar.set_start(start, orient)
+    path = dstar.plan()
+    results["dstar_initial"] = time.perf_counter() - started
+
+    planner = GridPlanner()
+    started = time.perf_counter()
+    planner.set_map(grid, costs).plan(start, goal, orient)
+    results["astar_initial"] = time.perf_counter() - started
+
+    for _ in range(max_steps or size * size):
+        if len(path) < 2:
+            break
+        # 한 칸 이동하고 주변을 본다.
+        (x, y), (nx, ny) = path[0], path[1]
+        start, orient = (nx, ny), ORIENTS[MOVES.index((nx - x, ny - y))]
+        grid, costs = sense(grid, nx, ny)
+
+        expanded = dstar.expanded
+        started = time.perf_counter()
+        changed = dstar.update_map(grid, costs)
+        dstar.set_start(start, orient)
+        path = dstar.plan()
+        results["dstar"].append(time.perf_counter() - started)
+        results["expanded"].append(dstar.expanded - expanded)
+        results["changed"].append(changed)
+
+        started = time.perf_counter()
+        reference = planner.set_map(grid, costs).plan(start, goal, orient)
+        results["astar"].append(time.perf_counter() - started)
+
+        if bool(path) != bool(reference) or (
+            path and abs(path_cost(path, costs) - path_cost(reference, costs)) > 1e-9
+        ):
+            results["mismatch"] += 1
+    results["arrived"] = start == goal
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100, help="grid width = height (cells)")
+    parser.add_argument("--radius", type=int, default=5, help="sensor range (cells)")
+    parser.add_argument("--changes", type=int, default=0, help="extra cells toggled per move")
+    parser.add_argument("--costs", action="store_true", help="higher cost next to obstacles")
+    parser.add_argument("--steps", type=int, help="stop after this many moves")
+    parser.add_argument("--seed", type=int, default=0)
+    opts = parser.parse_args(args)
+
+    results = bench_replan(
+        opts.size, opts.radius, opts.changes, opts.costs, opts.steps, opts.seed
+    )
+    count = len(results["dstar"])
+    print(
+        f"size={opts.size} radius={opts.radius} changes={opts.changes} "
+        f"costs={opts.costs} moves={count} arrived={results['arrived']}"
+    )
+    print(
+        f"{'initial plan':<18} dstar {1e3 * results['dstar_initial']:.1f}ms "
+        f"astar {1e3 * results['astar_initial']:.1f}ms"
+    )
+    if not count:
+        return
+    dstar, astar = sum(results["dstar"]), sum(results["astar"])
+    print(f"{'replan(dstar_lite)':<18} {count / dstar:10.1f} replans/s")
+    print(f"{'replan(astar)':<18} {count / astar:10.1f} replans/s")
+    print(
+        f"speedup x{astar / dstar:.1f}, per replan: changed cells "
+        f"{np.mean(results['changed']):.1f} expanded {np.mean(results['expanded']):.0f}, "
+        f"cost mismatch {results['mismatch']}/{count}"
+    )
+
+
+if __name__ == "__main__":
+    main()
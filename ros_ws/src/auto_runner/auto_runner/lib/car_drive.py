@@ -47,8 +47,11 @@ class RobotController:
         # 도착처리_다음 목적지 설정
         return self.path_finder.check_arrival(self.dir_data.cur, dest, finish)
 
-    def update_map(self, grid_map: list):
-        self.path_finder.update_map(grid_map)
+    def update_map(self, grid_map: list, version: int = None, layout=None):
+        self.path_finder.update_map(grid_map, version, layout)
+
+    def update_costs(self, cost_grid: list, version: int = None):
+        self.path_finder.update_costs(cost_grid, version)
 
     # 목적위치를 입력받고, 다음동작을 정한다.
     def next_action(self) -> tuple[float, float]:
@@ -22,12 +22,17 @@ class RobotController2:
         self.cur_pos = (0,0)
         self.path = [(-1,-1)]
         self.dest_pos = None
+        self.layout = self.pathMnger.layout
         IMUData.subscribe(o=self.get_msg)
 
     def get_msg(self, message: Message):
         self.imu_data = message.data
 
     def prepare(self):
+        if self.pathMnger.layout != self.layout:
+            # 블록맵 원점이 옮겨졌으면 PathManage가 새 배치로 옮긴 경로/목표를 다시 받는다.
+            self.layout = self.pathMnger.layout
+            self.path, self.dest_pos = self.pathMnger.path, self.pathMnger.dest_pos
         # 방향, 현재위치, 회전각도 등 취합
         self.cur_pos: tuple = self.pathMnger.transfer2_xy(self.imu_data[:2])
         self.angular_data: float = self.imu_data[2]
@@ -42,6 +47,15 @@ class RobotController2:
         else:
             cur_ix = self.path.index(self.cur_pos)
             self.path = self.path[cur_ix:]
+            # 맵/비용이 바뀌었으면 같은 목표까지의 경로를 고친다. 갈 수 없으면 목표를 다시 정한다.
+            path = self.pathMnger.replan(self.cur_pos, self.orient)
+            if path == []:
+                path = self.pathMnger.search_new_path(self.cur_pos, self.orient)
+                if not path:
+                    raise SearchEndException("No path found")
+            if path:
+                self.path = path
+                self.dest_pos = self.path[-1]
         return True
 
     def make_plan(self) -> Policy:
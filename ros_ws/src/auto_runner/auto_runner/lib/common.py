@@ -84,6 +84,8 @@ class Message:
     title: str = None
     data_type: str
     data: dict
+    # 부가정보 (맵: version, changed 등)
+    meta: dict = None
 
 
 class Chainable:
@@ -127,8 +129,8 @@ class Observable:
             cls._observe_map[subject].remove(o)
 
     @classmethod
-    def publish_(cls, data: object):
-        cls.publish(Message(data_type=cls._subject, data=data), cls._subject)
+    def publish_(cls, data: object, meta: dict = None):
+        cls.publish(Message(data_type=cls._subject, data=data, meta=meta), cls._subject)
 
     @classmethod
     def publish(cls, message: Message, subject: str):
@@ -0,0 +1,269 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from auto_runner.map_transform import BLOCK_SIZE, OCCUPIED_THRESHOLD
+
+# 셀 비용 (uint8)
+FREE = 0
+INSCRIBED = 253
+LETHAL = 254
+NO_INFORMATION = 255
+
+# 경로계획에서 블록 비용 1.0당 더하는 이동 비용 (한 칸 이동 = 1)
+COST_WEIGHT = 2.0
+
+# 팽창을 한번에 계산하는 최대 (창 셀 수 x 창 폭), 넘으면 행 단위로 나눈다.
+MAX_WINDOW_CELLS = 4_000_000
+
+
+def inflation_table(resolution, inscribed_radius, inflation_radius, decay=5.0):
+    """
+    장애물까지의 셀 거리 제곱(d2) => 비용 테이블과 반경(셀)
+      0 LETHAL, inscribed_radius 이내 INSCRIBED,
+      inflation_radius 이내는 거리에 따라 지수적으로 감소, 밖은 FREE
+    """
+    radius = int(np.ceil(inflation_radius / resolution))
+    distance = np.sqrt(np.arange(2 * (radius + 1) ** 2 + 1)) * resolution
+    cost = (INSCRIBED - 1) * np.exp(-decay * (distance - inscribed_radius))
+    cost = np.where(distance <= inscribed_radius, INSCRIBED, cost)
+    cost = np.where(distance <= inflation_radius, cost, FREE)
+    cost[0] = LETHAL
+    return cost.astype(np.uint8), radius
+
+
+def inflate(lethal: np.ndarray, table: np.ndarray, radius: int) -> np.ndarray:
+    """
+    장애물 마스크 (h + 2r, w + 2r) => (h, w) 비용.
+    sliding_window_view로 행 방향 최단 |dx|, 열 방향 min(dy^2 + dx^2)를 차례로 구해
+    반경 안의 가장 가까운 장애물 거리를 얻고 table로 비용을 찾는다. (셀당 2(2r+1)번 비교)
+    """
+    size = 2 * radius + 1
+    height, width = lethal.shape[0] - 2 * radius, lethal.shape[1] - 2 * radius
+    costs = np.zeros((max(height, 0), max(width, 0)), dtype=np.uint8)
+    if height <= 0 or width <= 0 or not lethal.any():
+        return costs
+    offsets = np.abs(np.arange(-radius, radius + 1))
+    far = radius + 1
+    step = max(1, MAX_WINDOW_CELLS // (lethal.shape[1] * size))
+    for row in range(0, height, step):
+        band = lethal[row : row + step + 2 * radius]
+        # 같은 행에서 가장 가까운 장애물까지 |dx| (반경 밖은 far)
+        dx = np.where(sliding_window_view(band, size, axis=1), offsets, far).min(axis=2)
+        # 주변 행의 dx로 거리 제곱
+        d2 = (sliding_window_view(dx, size, axis=0) ** 2 + offsets**2).min(axis=2)
+        costs[row : row + step] = table[d2]
+    return costs
+
+
+class CostLayer:
+    """costmap과 같은 크기의 셀 비용 배열"""
+
+    def __init__(self, shape):
+        self.costs = np.zeros(shape, dtype=np.uint8)
+
+    def _replace(self, row0, col0, values):
+        """영역을 values로 바꾸고 실제로 바뀐 셀 영역을 반환한다. 바뀐 셀이 없으면 None"""
+        window = self.costs[row0 : row0 + values.shape[0], col0 : col0 + values.shape[1]]
+        rows, cols = np.nonzero(window != values)
+        if rows.size == 0:
+            return None
+        window[...] = values
+        return (
+            row0 + int(rows.min()),
+            col0 + int(cols.min()),
+            row0 + int(rows.max()) + 1,
+            col0 + int(cols.max()) + 1,
+        )
+
+
+class StaticLayer(CostLayer):
+    """SLAM 맵(OccupancyGrid 값, 미탐색 -1). threshold보다 크면 LETHAL, 미탐색은 NO_INFORMATION"""
+
+    def __init__(self, shape, threshold=OCCUPIED_THRESHOLD):
+        super().__init__(shape)
+        self.threshold = threshold
+
+    def update(self, cells, bounds):
+        row0, col0, row1, col1 = bounds
+        window = cells[row0:row1, col0:col1]
+        values = np.where(window > self.threshold, LETHAL, FREE).astype(np.uint8)
+        values[window < 0] = NO_INFORMATION
+        return self._replace(row0, col0, values)
+
+
+class ObstacleLayer(CostLayer):
+    """
+    마지막 라이다 스캔의 끝점 셀을 LETHAL로 둔다.
+    새 스캔이 오면 이전 스캔의 표시는 지운다. (SLAM 맵에 아직 반영되지 않은 장애물용)
+    """
+
+    def __init__(self, shape, resolution, origin):
+        super().__init__(shape)
+        self.resolution = resolution
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.marked = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def update(self, pose, ranges, angle_min, angle_increment, range_max=np.inf):
+        """pose (x, y, yaw) 에서의 스캔. 빔 각도는 yaw + angle_min + i * angle_increment"""
+        ranges = np.asarray(ranges, dtype=np.float64)
+        hit = np.isfinite(ranges) & (ranges > 0) & (ranges < range_max)
+        angles = pose[2] + angle_min + np.flatnonzero(hit) * angle_increment
+        ends = np.asarray(pose[:2]) + ranges[hit, None] * np.column_stack(
+            [np.cos(angles), np.sin(angles)]
+        )
+        cells = np.floor((ends - self.origin) / self.resolution).astype(np.int64)
+        inside = (
+            (cells[:, 0] >= 0)
+            & (cells[:, 0] < self.costs.shape[1])
+            & (cells[:, 1] >= 0)
+            & (cells[:, 1] < self.costs.shape[0])
+        )
+        rows, cols = cells[inside, 1], cells[inside, 0]
+
+        old_rows, old_cols = self.marked
+        all_rows = np.concatenate([old_rows, rows])
+        all_cols = np.concatenate([old_cols, cols])
+        if all_rows.size == 0:
+            return None
+        row0, col0 = int(all_rows.min()), int(all_cols.min())
+        values = np.zeros((int(all_rows.max()) + 1 - row0, int(all_cols.max()) + 1 - col0), np.uint8)
+        values[rows - row0, cols - col0] = LETHAL
+        self.marked = (rows, cols)
+        return self._replace(row0, col0, values)
+
+
+class Costmap:
+    """
+    블록맵 영역(MapStore.cells와 같은 셀 배열, 모서리는 MapStore.cells_origin)의 셀 비용
+      static     SLAM 맵의 장애물/미탐색
+      obstacle   마지막 라이다 스캔의 장애물
+      inflation  두 레이어의 장애물을 inflation_table의 거리별 비용으로 팽창
+    레이어가 바뀐 셀 영역에서 커널 반경만큼만 다시 계산한다.
+    """
+
+    def __init__(
+        self,
+        inscribed_radius=0.2,
+        inflation_radius=0.5,
+        decay=5.0,
+        threshold=OCCUPIED_THRESHOLD,
+        block_size=BLOCK_SIZE,
+        blocked_ratio=0.5,
+    ):
+        self.inscribed_radius = inscribed_radius
+        self.inflation_radius = inflation_radius
+        self.decay = decay
+        self.threshold = threshold
+        self.origin = None
+        self.block_size = block_size
+        # 블록 안 INSCRIBED 이상 셀 비율이 이보다 크면 지나갈 수 없는 블록
+        self.blocked_ratio = blocked_ratio
+        self.resolution = None
+        self.costs: np.ndarray = None
+        self.version = 0
+        # 다시 계산한 셀 수
+        self.updated = 0
+
+    @property
+    def shape(self):
+        return None if self.costs is None else self.costs.shape
+
+    def _reset(self, shape, resolution, origin):
+        self.resolution = resolution
+        self.origin = origin
+        self.table, self.radius = inflation_table(
+            resolution, self.inscribed_radius, self.inflation_radius, self.decay
+        )
+        self.static = StaticLayer(shape, self.threshold)
+        self.obstacle = ObstacleLayer(shape, resolution, self.origin)
+        self.costs = np.full(shape, NO_INFORMATION, dtype=np.uint8)
+
+    def update_static(self, cells, resolution, origin, bounds=None):
+        """
+        MapStore.cells의 bounds(MapStore.touched) 영역을 반영한다. 비용이 바뀌었으면 True
+        origin은 cells (0, 0) 셀 모서리의 월드좌표 (MapStore.cells_origin)
+        """
+        if (
+            self.costs is None
+            or cells.shape != self.shape
+            or resolution != self.resolution
+            or origin != self.origin
+        ):
+            # 크기/해상도/영역이 바뀌면 전체를 다시 계산한다.
+            self._reset(cells.shape, resolution, origin)
+            self.static.update(cells, (0, 0, *cells.shape))
+            return self._inflate((0, 0, *cells.shape))
+        return self._inflate(self.static.update(cells, bounds or (0, 0, *cells.shape)))
+
+    def update_scan(self, pose, scan):
+        """LaserScan (ranges, angle_min, angle_increment, range_max). 정적 맵을 받기 전에는 무시한다."""
+        if self.costs is None:
+            return False
+        changed = self.obstacle.update(
+            pose, scan.ranges, scan.angle_min, scan.angle_increment, scan.range_max
+        )
+        return self._inflate(changed)
+
+    def _inflate(self, bounds):
+        """바뀐 레이어 영역에서 radius 안의 비용만 다시 계산한다."""
+        if bounds is None:
+            return False
+        radius = self.radius
+        height, width = self.shape
+        row0, col0 = max(bounds[0] - radius, 0), max(bounds[1] - radius, 0)
+        row1, col1 = min(bounds[2] + radius, height), min(bounds[3] + radius, width)
+
+        # 결과 영역을 radius만큼 넓힌 장애물 마스크 (맵 밖은 장애물 없음)
+        lethal = np.zeros((row1 - row0 + 2 * radius, col1 - col0 + 2 * radius), dtype=bool)
+        r0, c0 = max(row0 - radius, 0), max(col0 - radius, 0)
+        r1, c1 = min(row1 + radius, height), min(col1 + radius, width)
+        lethal[r0 - row0 + radius : r1 - row0 + radius, c0 - col0 + radius : c1 - col0 + radius] = (
+            self.static.costs[r0:r1, c0:c1] == LETHAL
+        ) | (self.obstacle.costs[r0:r1, c0:c1] == LETHAL)
+
+        costs = inflate(lethal, self.table, self.radius)
+        unknown = (self.static.costs[row0:row1, col0:col1] == NO_INFORMATION) & (costs < LETHAL)
+        costs[unknown] = NO_INFORMATION
+        window = self.costs[row0:row1, col0:col1]
+        self.updated += costs.size
+        if np.array_equal(window, costs):
+            return False
+        window[...] = costs
+        self.version += 1
+        return True
+
+    def cost_at(self, x, y):
+        """월드좌표 (x, y)의 셀 비용. 배열도 받는다. 영역 밖은 NO_INFORMATION"""
+        cols = np.floor((np.asarray(x) - self.origin[0]) / self.resolution).astype(np.int64)
+        rows = np.floor((np.asarray(y) - self.origin[1]) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        values = np.full(rows.shape, NO_INFORMATION, dtype=np.uint8)
+        values[inside] = self.costs[rows[inside], cols[inside]]
+        return values
+
+    def block_grid(self) -> list[list[float]]:
+        """
+        경로계획용 블록 비용 grid[x][y] (convert_map과 같은 배치)
+          1.0        INSCRIBED 이상 셀이 blocked_ratio보다 많은 블록 (지나갈 수 없음)
+          0.0 ~ 1.0  탐색된 셀의 평균 비용 / INSCRIBED (미탐색 셀은 0)
+        """
+        block = max(1, int(round(self.block_size / self.resolution)))
+        rows, cols = self.shape[0] // block, self.shape[1] // block
+        blocks = self.costs[: rows * block, : cols * block].reshape(rows, block, cols, block)
+        known = blocks != NO_INFORMATION
+        blocked = ((blocks >= INSCRIBED) & known).mean(axis=(1, 3)) > self.blocked_ratio
+        cost = np.where(known, blocks, FREE).mean(axis=(1, 3)) / INSCRIBED
+        grid = np.where(blocked, 1.0, np.minimum(cost, 0.99))
+        return grid.T.tolist()
+
+
+def step_costs(cost_grid, shape=None):
+    """
+    블록 비용 grid[x][y] => planner.astar의 셀 이동 비용 (지나갈 수 없으면 inf).
+    없거나 맵 크기(shape)와 다르면(블록맵 영역이 바뀌는 중) None
+    """
+    if not cost_grid:
+        return None
+    cost = np.asarray(cost_grid, dtype=np.float64)
+    if shape is not None and cost.shape != tuple(shape):
+        return None
+    return np.where(cost >= 1.0, np.inf, 1.0 + COST_WEIGHT * cost)
@@ -0,0 +1,196 @@
+import heapq
+from array import array
+import numpy as np
+from auto_runner.lib.planner import MASK_ORIENTS, GridPlanner, orient_index
+
+INF = float("inf")
+
+
+class DStarLite:
+    """
+    방향을 가진 상태 (x, y, orient)에서의 D* Lite (Koenig & Likhachev, optimized version).
+    목표에서 거꾸로 탐색한 g(상태 => 목표까지 비용)를 맵 변경/로봇 이동 사이에 유지하고,
+    비용이 바뀐 셀로 들어가는 간선의 상태만 다시 계산한다.
+
+    상태, 이웃 테이블, 후진 금지 규칙은 GridPlanner와 같다. (flat 셀 * 4 + orient)
+    목표 셀에서는 방향과 관계없이 도착으로 본다.
+    맵 크기가 바뀌거나 목표가 바뀌면 새로 만든다.
+    """
+
+    def __init__(self, grid, goal: tuple[int, int], costs=None, no_reverse=True):
+        planner = GridPlanner(no_reverse).set_map(grid, costs)
+        self.transitions = planner.transitions
+        # 다음 방향 o'로 올 수 있는 이전 방향 목록
+        self.pred_orients = tuple(
+            tuple(o for o in range(4) if self.transitions[o] >> next_o & 1) for next_o in range(4)
+        )
+        # 이웃 테이블은 처음 한번만 만들고, 이후에는 바뀐 셀 주변만 고친다.
+        self.shape = planner.shape
+        self.stride = planner.stride
+        self.offsets = planner.offsets
+        self.valid = planner.valid
+        self.cost_array = self._cell_costs(grid, costs)
+        self.cost = self.cost_array.tolist()
+        self.goal = tuple(goal)
+        self.goal_cell = (goal[0] + 1) * self.stride + goal[1] + 1
+
+        size = len(self.valid) * 4
+        self.g = array("d", [INF]) * size
+        self.rhs = array("d", [INF]) * size
+        # 상태 => 힙에 넣은 키. 힙에는 (k1, k2, 상태)를 넣고 키가 다른 항목은 버린다.
+        self.open = {}
+        self.heap = []
+        self.km = 0.0
+        self.start = None
+        self.start_xy = None
+        # 통계
+        self.expanded = 0
+        self.updated = 0
+
+    def _cell_costs(self, grid, costs) -> np.ndarray:
+        """테두리를 포함한 flat 셀로 들어가는 비용 (장애물/테두리는 inf)"""
+        blocked = np.asarray(grid) == 1
+        cost = np.full((blocked.shape[0] + 2, blocked.shape[1] + 2), INF)
+        inner = cost[1:-1, 1:-1]
+        inner[...] = 1.0 if costs is None else costs
+        inner[blocked] = INF
+        return cost.ravel()
+
+    def _key(self, state) -> tuple[float, float]:
+        g, rhs = self.g[state], self.rhs[state]
+        x, y = divmod(state >> 2, self.stride)
+        # start 셀까지의 맨해튼 거리 (셀 이동 비용은 1 이상)
+        h = abs(x - self.start_xy[0]) + abs(y - self.start_xy[1])
+        if g < rhs:
+            # 값이 커진 상태는 같은 k1 안에서 가장 먼저 처리한다.
+            return (g + h + self.km, -INF)
+        # k1이 같으면 g가 큰(start에 가까운) 상태부터. 빈 맵에서 k1이 같은
+        # 직사각형 영역을 모두 펼치지 않는다. (A*의 h 타이브레이크와 같다)
+        return (rhs + h + self.km, -rhs)
+
+    def _update_vertex(self, state):
+        self.updated += 1
+        g, rhs = self.g, self.rhs
+        cell, o = state >> 2, state & 3
+        if cell != self.goal_cell:
+            best = INF
+            cost, offsets = self.cost, self.offsets
+            for next_o in MASK_ORIENTS[self.valid[cell] & self.transitions[o]]:
+                next_cell = cell + offsets[next_o]
+                value = cost[next_cell] + g[next_cell * 4 + next_o]
+                if value < best:
+                    best = value
+            rhs[state] = best
+        if g[state] != rhs[state]:
+            key = self._key(state)
+            if self.open.get(state) != key:
+                self.open[state] = key
+                heapq.heappush(self.heap, (*key, state))
+        else:
+            self.open.pop(state, None)
+
+    def _update_predecessors(self, state):
+        cell, next_o = state >> 2, state & 3
+        prev_cell = cell - self.offsets[next_o]
+        # 장애물/테두리 셀에서 출발하는 것은 로봇이 거기 있을 때(start)뿐이다.
+        if self.cost[prev_cell] == INF and prev_cell != self.start >> 2:
+            return
+        for o in self.pred_orients[next_o]:
+            self._update_vertex(prev_cell * 4 + o)
+
+    def _compute(self):
+        g, rhs, open_, heap = self.g, self.rhs, self.open, self.heap
+        start = self.start
+        while heap:
+            k1, k2, state = heap[0]
+            key = (k1, k2)
+            if open_.get(state) != key:
+                # 갱신/제거된 항목
+                heapq.heappop(heap)
+                continue
+            if key >= self._key(start) and rhs[start] <= g[start]:
+                break
+            new_key = self._key(state)
+            if key < new_key:
+                # km이 늘어 키가 커진 상태
+                open_[state] = new_key
+                heapq.heapreplace(heap, (*new_key, state))
+                continue
+            heapq.heappop(heap)
+            del open_[state]
+            self.expanded += 1
+            if g[state] > rhs[state]:
+                g[state] = rhs[state]
+            else:
+                g[state] = INF
+                self._update_vertex(state)
+            self._update_predecessors(state)
+
+    def set_start(self, start: tuple[int, int], orient="x"):
+        """로봇 위치/방향. 이동한 만큼 km을 늘려 기존 키를 그대로 쓴다."""
+        state = ((start[0] + 1) * self.stride + start[1] + 1) * 4 + orient_index(orient)
+        last, last_xy = self.start, self.start_xy
+        self.start = state
+        self.start_xy = divmod(state >> 2, self.stride)
+        if last is None:
+            # 처음: 목표 셀의 모든 방향에서 거꾸로 탐색을 시작한다.
+            for o in range(4):
+                goal = self.goal_cell * 4 + o
+                self.rhs[goal] = 0.0
+                self._update_vertex(goal)
+        elif state >> 2 != last >> 2:
+            # 이전 위치 => 새 위치 거리만큼 힙의 키 하한이 줄어든다.
+            self.km += abs(last_xy[0] - self.start_xy[0]) + abs(last_xy[1] - self.start_xy[1])
+        if self.cost[state >> 2] == INF and state >> 2 != self.goal_cell:
+            # 장애물 셀의 상태는 유지하지 않으므로 출발할 때 계산한다.
+            self._update_vertex(state)
+
+    def update_map(self, grid, costs=None) -> int:
+        """새 맵/비용. 들어가는 비용이 바뀐 셀의 간선만 다시 계산하고, 바뀐 셀 수를 반환한다."""
+        cost = self._cell_costs(grid, costs)
+        if cost.shape != self.cost_array.shape:
+            raise ValueError("map shape changed, create a new DStarLite")
+        changed = np.flatnonzero(cost != self.cost_array).tolist()
+        self.cost_array = cost
+        for cell, value in zip(changed, cost[changed].tolist()):
+            self.cost[cell] = value
+            # 이웃 셀에서 이 셀로 가는 방향 비트
+            for o, offset in enumerate(self.offsets):
+                if value == INF:
+                    self.valid[cell - offset] &= ~(1 << o)
+                else:
+                    self.valid[cell - offset] |= 1 << o
+        for cell in changed:
+            for next_o in range(4):
+                # 셀 자신(장애물 => 길이 된 경우)과 셀로 들어오는 상태
+                self._update_vertex(cell * 4 + next_o)
+                self._update_predecessors(cell * 4 + next_o)
+        return len(changed)
+
+    def plan(self) -> list[tuple[int, int]]:
+        """start부터 goal까지의 (x, y) 목록, 경로가 없으면 []"""
+        self._compute()
+        if self.start >> 2 == self.goal_cell:
+            return [self.goal]
+        # 탐색이 끝나도 start는 g > rhs로 남을 수 있으므로 rhs(= 최소 이웃 g + 비용)로 본다.
+        if self.rhs[self.start] == INF:
+            return []
+        g, cost, offsets = self.g, self.cost, self.offsets
+        path = []
+        state = self.start
+        for _ in range(len(g)):
+            cell, o = state >> 2, state & 3
+            x, y = divmod(cell, self.stride)
+            path.append((x - 1, y - 1))
+            if cell == self.goal_cell:
+                return path
+            best, best_value = None, INF
+            for next_o in MASK_ORIENTS[self.valid[cell] & self.transitions[o]]:
+                next_cell = cell + offsets[next_o]
+                value = cost[next_cell] + g[next_cell * 4 + next_o]
+                if value < best_value:
+                    best, best_value = next_cell * 4 + next_o, value
+            if best is None:
+                return []
+            state = best
+        return []
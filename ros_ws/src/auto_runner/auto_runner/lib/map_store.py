@@ -0,0 +1,225 @@
+import hashlib
+import threading
+from typing import NamedTuple
+import numpy as np
+from gmapping.utils_lib.map_snapshot import patch_geometry
+from auto_runner.map_transform import (
+    MIN_LAYOUT,
+    OCCUPIED_THRESHOLD,
+    UNKNOWN_VALUE,
+    BlockLayout,
+    GridInfo,
+    align_to_blocks,
+    block_layout,
+    block_offset,
+    cells_origin,
+    create_blockmap,
+)
+
+
+class MapChange(NamedTuple):
+    """블록맵이 바뀌었을 때의 결과. grid는 convert_map과 같은 grid[x][y] 리스트, layout은 grid의 배치"""
+
+    version: int
+    grid: list[list[float]]
+    changed: list[tuple[int, int]]
+    layout: BlockLayout
+
+
+def stamp_nanoseconds(stamp) -> int:
+    """builtin_interfaces/Time => 나노초"""
+    return stamp.sec * 1_000_000_000 + stamp.nanosec
+
+
+class MapStore:
+    """
+    /occ_grid_map(전체 맵)과 /occ_grid_map_updates(패치)를 받아 경로계획용 블록맵을 관리한다.
+      - 전체 맵 데이터의 해시가 이전과 같으면 아무것도 하지 않는다.
+      - 이전 데이터와 달라진 셀이 속한 블록만 다시 계산한다.
+      - 블록맵이 실제로 바뀌었을 때만 version을 올리고 MapChange를 반환한다.
+      - 블록맵 영역(layout)은 맵 영역에 따라 넓어지며, 바뀌면 블록 좌표도 바뀐다.
+      - 두 토픽은 도착 순서가 보장되지 않으므로, 마지막으로 반영한 메시지보다
+        header.stamp가 이른 전체 맵/패치는 버린다. (stamp 0은 순서 검사를 하지 않는다.)
+      - 패치는 header.frame_id에 붙은 맵 영역(patch_frame_id)이 마지막 전체 맵과 같을 때만
+        반영한다. 맵이 넓어지거나 원점이 옮겨지면 새 영역의 전체 맵을 받을 때까지 버린다.
+    (ReentrantCallbackGroup에서 두 토픽이 동시에 들어와도 되도록 lock을 건다.)
+    """
+
+    def __init__(self, threshold=OCCUPIED_THRESHOLD, base: BlockLayout = MIN_LAYOUT):
+        self.threshold = threshold
+        # 블록맵은 base 격자에 맞춰 맵 전체를 덮는다. (block_layout)
+        self.base = base
+        self.layout = base
+        self.info: GridInfo = None
+        self.raw: np.ndarray = None
+        self.digest = None
+        # 블록맵 영역에 맞춘 셀 값 (미탐색 -1, 맵 밖 OUTSIDE_VALUE), 블록 크기(셀), 맵 (0, 0) 셀 위치
+        self.cells: np.ndarray = None
+        self.cells_origin = None
+        self.block = 0
+        self.offset = (0, 0)
+        # (y, x) 블록 장애물 여부
+        self.blocks = np.zeros(base.shape, dtype=bool)
+        self.version = 0
+        self.grid = None
+        # 마지막으로 반영한 메시지의 header.stamp (나노초)
+        self.stamp = 0
+        # 마지막 갱신에서 값이 바뀐 셀 영역 (row0, col0, row1, col1), 없으면 None (costmap 갱신용)
+        self.touched = None
+
+        # 통계
+        self.received = 0
+        self.same_data = 0
+        self.same_blocks = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+
+    def update_map(self, data, info: GridInfo, stamp=0) -> MapChange | None:
+        """전체 맵. 블록맵이 바뀌지 않았거나 지난 메시지면 None"""
+        with self._lock:
+            if self._is_stale(stamp):
+                return None
+            self.stamp = max(self.stamp, stamp)
+            return self._update_map(data, info)
+
+    def update_patch(self, update, stamp=0) -> MapChange | None:
+        """
+        OccupancyGridUpdate 패치 (x, y, width, height, data).
+        전체 맵을 받기 전이거나 지난 메시지, 영역이 다른 맵의 패치는 None
+        """
+        with self._lock:
+            if self.raw is None or self._is_stale(stamp):
+                return None
+            if not self._same_geometry(update):
+                # 버린 패치의 stamp는 남기지 않는다. (뒤이어 올 새 영역의 전체 맵을 받는다.)
+                self.stale += 1
+                self.touched = None
+                return None
+            self.stamp = max(self.stamp, stamp)
+            return self._update_patch(update)
+
+    def _is_stale(self, stamp) -> bool:
+        if stamp and stamp < self.stamp:
+            self.stale += 1
+            self.touched = None
+            return True
+        return False
+
+    def _same_geometry(self, update) -> bool:
+        """패치가 마지막 전체 맵과 같은 영역(크기, 원점)의 맵에서 만들어졌는지"""
+        geometry = patch_geometry(update.header.frame_id)
+        if geometry is None:
+            # 영역을 붙이지 않은 패치는 맵 안에 들어가는지만 본다.
+            return (
+                update.x + update.width <= self.info.width
+                and update.y + update.height <= self.info.height
+            )
+        width, height, origin = geometry
+        half = self.info.resolution / 2
+        return (
+            (width, height) == (self.info.width, self.info.height)
+            and abs(origin[0] - self.info.origin[0]) < half
+            and abs(origin[1] - self.info.origin[1]) < half
+        )
+
+    def _update_map(self, data, info: GridInfo) -> MapChange | None:
+        self.received += 1
+        self.touched = None
+        raw = np.asarray(data, dtype=np.int8).reshape(-1)
+        digest = hashlib.blake2b(raw.tobytes(), digest_size=16)
+        digest.update(repr(tuple(info)).encode())
+        digest = digest.digest()
+        if digest == self.digest:
+            self.same_data += 1
+            return None
+        self.digest = digest
+
+        if self.raw is None or info != self.info:
+            # 처음이거나 맵 영역/해상도가 바뀌면 전체를 다시 계산한다.
+            self.info = info
+            self.raw = raw.copy()
+            layout = block_layout(info, self.base)
+            grid = raw.reshape(info.height, info.width)
+            self.cells, self.block = align_to_blocks(grid, info, layout)
+            self.cells_origin = cells_origin(info, layout)
+            self.offset = block_offset(info, layout)
+            self.touched = (0, 0, *self.cells.shape)
+            blocks = create_blockmap(
+                np.where(self.cells == -1, UNKNOWN_VALUE, self.cells),
+                map_size=layout.shape,
+                _grid_size=self.block,
+                threshold=self.threshold,
+            ).astype(bool)
+            if layout != self.layout:
+                # 블록맵 영역이 바뀌면 블록 좌표도 바뀌므로 전체를 바뀐 것으로 본다.
+                changed = np.argwhere(np.ones(layout.shape, dtype=bool))
+                self.layout = layout
+            else:
+                changed = np.argwhere(blocks != self.blocks)
+            self.blocks = blocks
+            return self._commit(changed, force=self.grid is None)
+
+        rows, cols = np.divmod(np.flatnonzero(raw != self.raw), info.width)
+        self.raw = raw.copy()
+        return self._apply(rows, cols)
+
+    def _update_patch(self, update) -> MapChange | None:
+        self.received += 1
+        self.touched = None
+        raw = self.raw.reshape(-1, self.info.width)
+        patch = np.array(update.data, dtype=np.int8).reshape(update.height, update.width)
+        window = raw[update.y : update.y + update.height, update.x : update.x + update.width]
+        rows, cols = np.nonzero(window != patch)
+        if rows.size == 0:
+            self.same_data += 1
+            return None
+        window[...] = patch
+        # 다음 전체 맵은 해시 대신 셀 비교로 판단한다.
+        self.digest = None
+        return self._apply(rows + update.y, cols + update.x)
+
+    def _apply(self, rows, cols) -> MapChange | None:
+        """맵 셀 (rows, cols)의 새 값을 블록맵 셀에 반영하고 해당 블록만 다시 계산한다."""
+        values = self.raw.reshape(-1, self.info.width)[rows, cols]
+        rows, cols = rows + self.offset[0], cols + self.offset[1]
+        inside = (
+            (rows >= 0) & (rows < self.cells.shape[0]) & (cols >= 0) & (cols < self.cells.shape[1])
+        )
+        rows, cols, values = rows[inside], cols[inside], values[inside]
+        if rows.size == 0:
+            self.same_blocks += 1
+            return None
+        self.cells[rows, cols] = values
+        self.touched = (int(rows.min()), int(cols.min()), int(rows.max()) + 1, int(cols.max()) + 1)
+
+        block = self.block
+        shape = self.layout.shape
+        keys = np.unique(rows // block * shape[1] + cols // block)
+        block_rows, block_cols = np.divmod(keys, shape[1])
+        # (블록 수, block, block) => 블록 평균
+        cells = self.cells.reshape(shape[0], block, shape[1], block)
+        cells = cells[block_rows, :, block_cols, :]
+        occupied = np.where(cells == -1, UNKNOWN_VALUE, cells).mean(axis=(1, 2)) > self.threshold
+        moved = occupied != self.blocks[block_rows, block_cols]
+        self.blocks[block_rows[moved], block_cols[moved]] = occupied[moved]
+        return self._commit(np.column_stack([block_rows[moved], block_cols[moved]]))
+
+    def _commit(self, changed, force=False) -> MapChange | None:
+        if len(changed) == 0 and not force:
+            self.same_blocks += 1
+            return None
+        self.version += 1
+        self.grid = self.blocks.T.astype(np.float64).tolist()
+        # (y, x) 블록 => 경로계획 좌표 (x, y)
+        return MapChange(
+            self.version, self.grid, [(int(x), int(y)) for y, x in changed], self.layout
+        )
+
+    def stats(self) -> dict:
+        return dict(
+            version=self.version,
+            received=self.received,
+            same_data=self.same_data,
+            same_blocks=self.same_blocks,
+            stale=self.stale,
+        )
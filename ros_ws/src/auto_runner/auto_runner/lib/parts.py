@@ -30,7 +30,35 @@ class PolicyType(Enum):
 
 
 class MapData(Observable):
+    """
+    블록맵은 바뀌었을 때만 발행되므로, 마지막 메시지를 보관했다가
+    새로 구독하는 쪽에 바로 전달한다.
+    """
+
     _subject = "map"
+    latest: Message = None
+
+    @classmethod
+    def subscribe(cls, o: Observer, subject: str = None):
+        super().subscribe(o, subject)
+        if cls.latest is None:
+            return
+        if callable(o):
+            o(cls.latest)
+        elif isinstance(o, Observer):
+            o.update(cls.latest)
+
+    @classmethod
+    def publish_(cls, data: object, meta: dict = None):
+        cls.latest = Message(data_type=cls._subject, data=data, meta=meta)
+        cls.publish(cls.latest, cls._subject)
+
+
+class CostData(MapData):
+    """costmap 블록 비용 grid[x][y] (1.0은 지나갈 수 없는 블록)"""
+
+    _subject = "cost"
+    latest: Message = None
 
 
 class LidarData(Observable):
@@ -352,9 +380,9 @@ class BackMoveAction(EvHandle, Observer, Chainable):
         mmr_sampling.print_log(f"cur_pos: {cur_pos}")
         _trap_map = {
             orient.Y: self.map_data[x0][y0 - 1] if y0 > 1 else 1,
-            orient._Y: self.map_data[x0][y0 + 1] if y0 < 8 else 1,
+            orient._Y: self.map_data[x0][y0 + 1] if y0 < len(self.map_data[0]) - 2 else 1,
             orient.X: self.map_data[x0 - 1][y0] if x0 > 1 else 1,
-            orient._X: self.map_data[x0 + 1][y0] if x0 < 8 else 1,
+            orient._X: self.map_data[x0 + 1][y0] if x0 < len(self.map_data) - 2 else 1,
         }
         _trap_map.pop(orient)
 
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+import numpy as np
+from auto_runner.lib.planner import orient_index
+
+
+class PathCache:
+    """
+    (version, start, orient, goal) => 경로 LRU 캐시.
+    version이 바뀌면 이전 맵과 비교해 값이 바뀐 셀을 지나는 경로만 버리고 나머지는 새 version으로 유지한다.
+    (셀 => 그 셀을 지나는 키) 역색인으로 찾는다.
+      - 경로를 못 찾은 결과([])는 지나는 셀이 없으므로 맵이 바뀌면 모두 버린다.
+      - 바뀐 셀이 길이 된 경우 남은 경로는 유효하지만 최단이 아닐 수 있다.
+    version이 None이면 캐시하지 않는다.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.version = None
+        self.grids = None
+        # (start, orient, goal) => 경로 tuple
+        self.entries: OrderedDict = OrderedDict()
+        # (x, y) => 그 셀을 지나는 키
+        self.cells: dict[tuple[int, int], set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def sync(self, version, *grids):
+        """현재 맵(grid[x][y] 들)과 version. version이 바뀌었으면 바뀐 셀을 지나는 경로를 버린다."""
+        if version is not None and version == self.version:
+            return
+        grids = tuple(None if grid is None else np.asarray(grid) for grid in grids)
+        changed = self._changed(grids) if version is not None else None
+        if changed is None:
+            self.clear()
+        else:
+            self._invalidate(changed)
+        self.version = version
+        self.grids = grids
+
+    def _changed(self, grids):
+        """이전 맵과 값이 다른 셀 (x, y) 목록. 비교할 수 없으면 None"""
+        if self.grids is None or len(grids) != len(self.grids):
+            return None
+        changed = set()
+        for old, new in zip(self.grids, grids):
+            if old is None and new is None:
+                continue
+            if old is None or new is None or old.shape != new.shape:
+                return None
+            changed.update(map(tuple, np.argwhere(old != new).tolist()))
+        return changed
+
+    def _invalidate(self, changed):
+        keys = {key for key, path in self.entries.items() if not path}
+        for cell in changed:
+            keys |= self.cells.get(cell, set())
+        for key in keys:
+            self._remove(key)
+        self.invalidated += len(keys)
+
+    def _remove(self, key):
+        for cell in self.entries.pop(key, ()):
+            keys = self.cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.cells[cell]
+
+    def clear(self):
+        self.invalidated += len(self.entries)
+        self.entries.clear()
+        self.cells.clear()
+
+    def get(self, start, orient, goal):
+        """캐시된 경로(list), 없으면 None"""
+        key = (tuple(start), orient_index(orient), tuple(goal))
+        path = self.entries.get(key) if self.version is not None else None
+        if path is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return list(path)
+
+    def put(self, start, orient, goal, path):
+        if self.version is None:
+            return
+        key = (tuple(start), orient_index(orient), tuple(goal))
+        self._remove(key)
+        path = tuple(tuple(cell) for cell in path)
+        self.entries[key] = path
+        for cell in path:
+            self.cells.setdefault(cell, set()).add(key)
+        while len(self.entries) > self.maxsize:
+            self._remove(next(iter(self.entries)))
+
+    def stats(self) -> dict:
+        return dict(
+            version=self.version,
+            size=len(self.entries),
+            hits=self.hits,
+            misses=self.misses,
+            invalidated=self.invalidated,
+        )
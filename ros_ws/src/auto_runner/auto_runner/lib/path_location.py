@@ -1,7 +1,9 @@
-from collections import deque
 from auto_runner.lib.common import Orient, MessageHandler, TypeVar
 from auto_runner import mmr_sampling
-import re, math
+from auto_runner.map_transform import MIN_LAYOUT, BlockLayout, layout_shift, world_to_block
+from auto_runner.lib.costmap import step_costs
+from auto_runner.lib.planner import GridPlanner
+from auto_runner.lib.path_cache import PathCache
 
 LoggableNode = TypeVar("LoggableNode", bound=MessageHandler)
 
@@ -20,6 +22,16 @@ class PathFinder:
         self.algorithm = algorithm
         self.cur_pos = None
         self.dest_pos = dest_pos
+        # costmap 블록 비용 grid[x][y], 받기 전에는 None
+        self.cost_grid = None
+        self.map_version = None
+        self.cost_version = None
+        # 블록맵 배치. 영역이 넓어지면 블록 좌표가 바뀐다.
+        self.layout = MIN_LAYOUT
+        # 맵/비용 version이 바뀔 때만 이웃 테이블을 다시 만든다.
+        self.planner = GridPlanner()
+        # 같은 (맵, 출발, 방향, 목표) 재탐색을 줄인다.
+        self.path_cache = PathCache()
 
     def find_path(self, **kwargs):
         if self.algorithm == "a-star":
@@ -27,8 +39,26 @@ class PathFinder:
         else:
             return []
 
-    def update_map(self, map: list[tuple[int,int]]) -> None:
+    def update_map(
+        self, map: list[tuple[int,int]], version: int = None, layout: BlockLayout = None
+    ) -> None:
         self.grid_map = map
+        self.map_version = version
+        if layout is not None and layout != self.layout:
+            # 블록맵 원점이 옮겨지면 가지고 있던 블록 좌표를 새 배치로 옮긴다.
+            dx, dy = layout_shift(self.layout, layout)
+            if dx or dy:
+                self.paths = [(x + dx, y + dy) for x, y in self.paths]
+                if self.dest_pos:
+                    self.dest_pos = (self.dest_pos[0] + dx, self.dest_pos[1] + dy)
+                if self.cur_pos:
+                    self.cur_pos = (self.cur_pos[0] + dx, self.cur_pos[1] + dy)
+                self.path_cache.clear()
+            self.layout = layout
+
+    def update_costs(self, cost_grid: list[list[float]], version: int = None) -> None:
+        self.cost_grid = cost_grid
+        self.cost_version = version
 
     # 도착위치이면 새로운 도착위치를 반환한다.
     def check_arrival(self, cur_dir, new_pos: None, finish: bool = False) -> bool:
@@ -83,6 +113,7 @@ class PathFinder:
 
             self.node.print_log(f"목표위치: {dest_pos}, A* PATH: {paths}")
 
+        self.node.print_log(f"path cache: {self.path_cache.stats()}")
         self.dest_pos = dest_pos
         self.paths = paths
         # 다음위치 반환
@@ -104,11 +135,8 @@ class PathFinder:
 
     # 위치값을 맵좌표로 변환
     def _transfer2_xy(self, pose: tuple[float, float]) -> tuple[int, int]:
-        # PC 맵 좌표를 SLAM 맵 좌표로 변환
-        _x = math.floor(5.0 + pose[0])  # x
-        _y = math.floor(5.0 + pose[1])  # y
-
-        result = (_x if _x > 0 else 0, _y if _y > 0 else 0)
+        # SLAM 맵 좌표를 블록맵 좌표로 변환
+        result = tuple(world_to_block(pose[:2], self.layout).tolist())
         self.node.print_log(f"<<_transfer2_xy>> {pose} => {result}")
         return result
 
@@ -129,70 +157,22 @@ class PathFinder:
         if not grid_map:
             return []
 
-        frontier = deque()
-        visited = set()  # 방문한 노드 집합
-
-        start = (start[0], start[1], init_dir)
-        frontier.append((start, [start]))  # 큐에 시작 위치와 경로 추가
-
-        while frontier:
-            curr_node, path = frontier.popleft()
-
-            if curr_node[:2] == goal:
-                # 초기입력된 방향값 제거
-                path[0] = path[0][:2]
-                return path
-
-            if curr_node in visited:
-                continue
-
-            visited.add(curr_node)
-
-            x, y, cur_d = curr_node
-            for next_x, next_y, next_d in (
-                (x + 1, y, Orient.X),
-                (x - 1, y, Orient._X),
-                (x, y + 1, Orient.Y),
-                (x, y - 1, Orient._Y),
-            ):
-                if (
-                    0 <= next_x < len(grid_map[1])
-                    and 0 <= next_y < len(grid_map[0])
-                    and grid_map[next_x][next_y] != 1
-                    # 최초 다음위치에서 self.dir의 반대방향을 제외시킨다.
-                    and not self._check_if_backpath(cur_d, next_d)
-                ):
-                    if self._check_if_backpath(cur_d, next_d):
-                        continue
-
-                    frontier.append(
-                        ((next_x, next_y, next_d), path + [(next_x, next_y)])
-                    )
-
-            frontier = deque(
-                sorted(
-                    frontier,
-                    key=lambda x: len(x[1]) + self._heuristic_distance(x[0][:2], goal),
-                )
-            )
-
-        return []
-
-    # 방향 제한조건
-    def _check_if_backpath(self, cur_dir: Orient, next_dir: Orient) -> bool:
-        # -xx or x-x 패턴
-        pattern = re.compile(r"^-(.)\1$|^(.)-\2$")
-        # 후진 경로 배제
-        return pattern.match(f"{cur_dir.value}{next_dir.value}") is not None
-
-    # 목표지점까지 추정거리
-    def _heuristic_distance(self, start_pos, end_pos) -> int:
-        """
-        목표점까지의 추정거리를 추정한다
-        """
-        (x1, y1) = start_pos
-        (x2, y2) = end_pos
-        return abs(x1 - x2) + abs(y1 - y2)
+        # costmap 비용 (장애물 근처일수록 크다), 진행방향의 반대방향은 제외한다.
+        version = self.planner_version()
+        self.path_cache.sync(version, grid_map, self.cost_grid)
+        path = self.path_cache.get(start, init_dir, goal)
+        if path is None:
+            costs = step_costs(self.cost_grid, (len(grid_map), len(grid_map[0])))
+            self.planner.set_map(grid_map, costs=costs, version=version)
+            path = self.planner.plan(start, goal, init_dir)
+            self.path_cache.put(start, init_dir, goal, path)
+        return path
+
+    def planner_version(self):
+        """GridPlanner/PathCache version (맵, 비용). 알 수 없으면 None(매번 다시 만든다)"""
+        if self.map_version is None or (self.cost_grid and self.cost_version is None):
+            return None
+        return (self.map_version, self.cost_version if self.cost_grid else None)
 
     # 경로이탈 여부
     def _check_pose_error(self, cur_pos):
@@ -1,7 +1,11 @@
-import math, re
-from collections import deque
+import math
 from auto_runner.lib.common import *
 from auto_runner import mmr_sampling
+from auto_runner.map_transform import MIN_LAYOUT, block_to_world, layout_shift, world_to_block
+from auto_runner.lib.costmap import step_costs
+from auto_runner.lib.planner import GridPlanner
+from auto_runner.lib.dstar_lite import DStarLite
+from auto_runner.lib.path_cache import PathCache
 import time
 
 LoggableNode = TypeVar("LoggableNode", bound=MessageHandler)
@@ -9,14 +13,50 @@ print_log = mmr_sampling.print_log
 
 class PathManage(Observer):
     grid_map = None
+    # 블록맵 배치 (맵 메시지의 meta). transfer2_xy/transfer2_point가 클래스에서도 쓴다.
+    layout = MIN_LAYOUT
     def __init__(self, algorithm: str = "a-star", dest_pos:tuple=(0,0)):
-        from auto_runner.lib.parts import MapData
+        from auto_runner.lib.parts import MapData, CostData
         self.path = []
         self.dest_pos = dest_pos
         self.visited = set()
+        # costmap 블록 비용 grid[x][y]와 version, 받기 전에는 None
+        self.cost_grid = None
+        self.cost_version = None
+        self.map_version = None
+        # 맵/비용 version이 바뀔 때만 이웃 테이블을 다시 만든다.
+        self.planner = GridPlanner()
+        # 같은 (맵, 출발, 방향, 목표) 재탐색을 줄인다.
+        self.path_cache = PathCache()
+        # 현재 목표까지의 D* Lite. 맵/비용이 바뀌면 남은 경로만 고친다.
+        self.dstar: DStarLite = None
+        self.replan_version = None
         if algorithm == "a-star":
             self.pathfinder = self._astar_method
         MapData.subscribe(o=self)
+        CostData.subscribe(o=self)
+
+    def update(self, message: Message):
+        if message.data_type == "cost":
+            self.cost_grid, self.cost_version = message.data, (message.meta or {}).get("version")
+            return
+        layout = (message.meta or {}).get("layout")
+        if layout is not None and layout != PathManage.layout:
+            self.shift_layout(layout)
+        super().update(message)
+
+    def shift_layout(self, layout):
+        """블록맵 원점이 옮겨지면 가지고 있던 블록 좌표(경로, 목표, 방문 위치)를 새 배치로 옮긴다."""
+        dx, dy = layout_shift(PathManage.layout, layout)
+        PathManage.layout = layout
+        if not (dx or dy):
+            return
+        self.path = [(x + dx, y + dy) for x, y in self.path]
+        if self.dest_pos:
+            self.dest_pos = (self.dest_pos[0] + dx, self.dest_pos[1] + dy)
+        self.visited = {(x + dx, y + dy) for x, y in self.visited}
+        self.path_cache.clear()
+        self.dstar = None
 
     def search_new_path(self, cur_pos: tuple, cur_orient: Orient) -> tuple:
         print_log(f"<<check_and_dest>> pos:{cur_pos}, dir:{cur_orient}")
@@ -27,7 +67,7 @@ class PathManage(Observer):
         exclude.extend(self.visited)
 
         while len(path) == 0 and count > 0:
-            grid_map = self.get_msg().data
+            grid_map = self.get_map()
 
             dest_pos = mmr_sampling.find_farthest_coordinate(
                 grid_map, cur_pos, exclude
@@ -43,29 +83,69 @@ class PathManage(Observer):
 
             print_log(f"목표위치: {dest_pos}, A* PATH: {path}")
 
+        print_log(f"path cache: {self.path_cache.stats()}")
         if len(path) == 0:
             return []
         
         self.dest_pos = dest_pos
         self.path = path
         self.visited.add(dest_pos)
+        self.replan_version = self.planner_version()
         return self.path
 
+    def replan(self, cur_pos: tuple, cur_orient: Orient) -> list | None:
+        """
+        맵/비용 version이 경로를 만든 뒤로 바뀌었으면 현재 목표까지의 경로를 D* Lite로 고친다.
+        :return: 고친 경로, 바뀌지 않았으면 None, 목표에 갈 수 없으면 []
+        """
+        grid_map = self.get_map()
+        version = self.planner_version()
+        if version is not None and version == self.replan_version:
+            return None
+        shape = (len(grid_map), len(grid_map[0]))
+        costs = step_costs(self.cost_grid, shape)
+        dstar = self.dstar
+        if dstar is None or dstar.goal != tuple(self.dest_pos) or dstar.shape != shape:
+            dstar = self.dstar = DStarLite(grid_map, self.dest_pos, costs)
+        else:
+            changed = dstar.update_map(grid_map, costs)
+            print_log(f"<<replan>> changed cells: {changed}")
+        dstar.set_start(cur_pos, cur_orient)
+        self.replan_version = version
+        self.path = dstar.plan()
+        print_log(f"<<replan>> {cur_pos} => {self.dest_pos}, expanded: {dstar.expanded}")
+        return self.path
+
+    def get_map(self) -> list[list[float]]:
+        # 맵은 바뀔 때만 발행되므로, 받은 맵이 있으면 새 메시지를 기다리지 않는다.
+        if self._msg is None:
+            msg = self.get_msg()
+        else:
+            self._msg_arrived = False
+            msg = self._msg
+        self.map_version = (msg.meta or {}).get("version")
+        return msg.data
+
+    def planner_version(self):
+        """GridPlanner/PathCache version (맵, 비용). 알 수 없으면 None(매번 다시 만든다)"""
+        if self.map_version is None or (self.cost_grid and self.cost_version is None):
+            return None
+        return (self.map_version, self.cost_version if self.cost_grid else None)
+
     @classmethod
-    def transfer2_point(self, pose: tuple[int, int]) -> tuple[int, int]:
-        # PC 맵 좌표를 SLAM 맵 좌표로 변환
-        x = pose[0]-5.0+0.5  # _x
-        y = pose[1]-5.0+0.5  # _y
-        return (x, y)
+    def transfer2_point(self, pose: tuple[int, int]) -> tuple[float, float]:
+        # 블록맵 좌표를 SLAM 맵 좌표(블록 중심)로 변환, (n, 2) 배열도 받는다.
+        point = block_to_world(pose, self.layout)
+        return tuple(point.tolist()) if point.ndim == 1 else point
 
     # 위치값을 맵좌표로 변환
     @classmethod
     def transfer2_xy(self, pose: tuple[float, float]) -> tuple[int, int]:
-        # PC 맵 좌표를 SLAM 맵 좌표로 변환
-        _x = math.floor(5.0 + pose[0])  # x
-        _y = math.floor(5.0 + pose[1])  # y
-
-        result = (_x if _x > 0 else 0, _y if _y > 0 else 0)
+        # SLAM 맵 좌표를 블록맵 좌표로 변환, (n, 2) 배열도 받는다.
+        cells = world_to_block(pose, self.layout)
+        if cells.ndim > 1:
+            return cells
+        result = tuple(cells.tolist())
         print_log(f"<<_transfer2_xy>> {pose} => {result}")
         return result
 
@@ -83,76 +163,20 @@ class PathManage(Observer):
         :param goal: 목표 지점 (x, y)
         :return: 최단 경로
         """
-        grid_map = self.get_msg().data
+        grid_map = self.get_map()
         print_log(
             f"cur_pos: {start}, goal: {goal}, map:{grid_map}"
         )
-        
-        # 목표지점까지 추정거리
-        def _heuristic_distance(start_pos, end_pos) -> int:
-            """
-            목표점까지의 추정거리를 추정한다
-            """
-            (x1, y1) = start_pos
-            (x2, y2) = end_pos
-            return abs(x1 - x2) + abs(y1 - y2)
-
-        # 방향 제한조건
-        def _check_if_backpath(cur_dir: Orient, next_dir: Orient) -> bool:
-            # -xx or x-x 패턴
-            pattern = re.compile(r"^-(.)\1$|^(.)-\2$")
-            # 후진 경로 배제
-            return pattern.match(f"{cur_dir.value}{next_dir.value}") is not None
-
-        # queue
-        frontier = deque()
-        visited = set()  # 방문한 노드 집합
-
-        start = (start[0], start[1], init_orient)
-        frontier.append((start, [start]))  # 큐에 시작 위치와 경로 추가
-
-        while frontier:
-            curr_node, path = frontier.popleft()
-
-            if curr_node[:2] == goal:
-                # 초기입력된 방향값 제거
-                path[0] = path[0][:2]
-                return path
-
-            if curr_node in visited:
-                continue
-
-            visited.add(curr_node)
-
-            x, y, cur_d = curr_node
-            for next_x, next_y, next_d in (
-                (x + 1, y, Orient.X),
-                (x - 1, y, Orient._X),
-                (x, y + 1, Orient.Y),
-                (x, y - 1, Orient._Y),
-            ):
-                if (
-                    0 <= next_x < len(grid_map[1])
-                    and 0 <= next_y < len(grid_map[0])
-                    and grid_map[next_x][next_y] != 1
-                    # 최초 다음위치에서 self.dir의 반대방향을 제외시킨다.
-                    and not _check_if_backpath(cur_d, next_d)
-                ):
-                    if _check_if_backpath(cur_d, next_d):
-                        continue
-
-                    frontier.append(
-                        ((next_x, next_y, next_d), path + [(next_x, next_y)])
-                    )
-
-            frontier = deque(
-                sorted(
-                    frontier,
-                    key=lambda x: len(x[1]) + _heuristic_distance(x[0][:2], goal),
-                )
-            )
-
-        return []
+        # costmap 비용 (장애물 근처일수록 크다), 진행방향의 반대방향은 제외한다.
+        version = self.planner_version()
+        self.path_cache.sync(version, grid_map, self.cost_grid)
+        path = self.path_cache.get(start, init_orient, goal)
+        if path is None:
+            costs = step_costs(self.cost_grid, (len(grid_map), len(grid_map[0])))
+            self.planner.set_map(grid_map, costs=costs, version=version)
+            path = self.planner.plan(start, goal, init_orient)
+            self.path_cache.put(start, init_orient, goal, path)
+        return path
 
     # 경로이탈 여부
     def _check_pose_error(self, cur_pos):
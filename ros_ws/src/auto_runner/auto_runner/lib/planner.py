@@ -0,0 +1,159 @@
+import heapq
+from array import array
+import numpy as np
+
+# 진행방향 (Orient.value와 같은 문자열). 인덱스 순서는 MOVES와 같다.
+ORIENTS = ("x", "-x", "y", "-y")
+# 방향별 한 칸 이동 (dx, dy)
+MOVES = ((1, 0), (-1, 0), (0, 1), (0, -1))
+# 방향별 반대방향(후진) 인덱스: x <-> -x, y <-> -y
+REVERSE = (1, 0, 3, 2)
+# 방향 비트마스크(0 ~ 15) => 방향 인덱스 목록
+MASK_ORIENTS = tuple(tuple(o for o in range(4) if mask >> o & 1) for mask in range(16))
+
+
+def orient_index(orient) -> int:
+    """Orient 또는 방향 문자열("x", "-x", "y", "-y") => 인덱스"""
+    return ORIENTS.index(getattr(orient, "value", orient))
+
+
+def transition_table(no_reverse=True) -> tuple[int, ...]:
+    """현재 방향별로 다음에 갈 수 있는 방향 비트마스크. no_reverse면 반대방향(후진)을 뺀다."""
+    return tuple(0b1111 & ~(1 << REVERSE[o]) if no_reverse else 0b1111 for o in range(4))
+
+
+class GridPlanner:
+    """
+    방향을 가진 상태 (x, y, orient)에서의 A*.
+    맵이 바뀔 때(version)만 아래 테이블을 NumPy로 만들고, 탐색은 flat 인덱스로만 한다.
+      - 테두리를 장애물로 두른 (width + 2, height + 2) 셀의 flat 인덱스 => 범위 검사가 없다.
+      - 방향별 flat 이웃 오프셋
+      - 셀별 이동 가능한 방향 비트마스크 (이웃 셀이 장애물/지나갈 수 없는 비용이면 0)
+      - 현재 방향별 허용 방향 비트마스크 (transition_table)
+    상태는 flat 셀 * 4 + orient 정수, 힙에는 (f, h, 상태)만 넣고 경로는 parent 배열로 만든다.
+    """
+
+    def __init__(self, no_reverse=True):
+        self.transitions = transition_table(no_reverse)
+        self.version = None
+        self.shape = None
+        # 테이블을 다시 만든 횟수
+        self.rebuilt = 0
+
+    def set_map(self, grid, costs=None, version=None) -> "GridPlanner":
+        """
+        :param grid: grid[x][y] (중첩 리스트 또는 배열), 1은 장애물
+        :param costs: grid와 같은 배치의 셀 이동 비용 (1 이상, inf는 지나갈 수 없음), None이면 모두 1
+        :param version: 이전과 같으면 테이블을 다시 만들지 않는다. None이면 항상 다시 만든다.
+        """
+        if version is not None and version == self.version:
+            return self
+        blocked = np.asarray(grid) == 1
+        width, height = blocked.shape
+        stride = height + 2
+        free = np.zeros((width + 2, stride), dtype=bool)
+        free[1:-1, 1:-1] = ~blocked
+        if costs is None:
+            self.step = None
+        else:
+            step = np.full(free.shape, np.inf)
+            step[1:-1, 1:-1] = costs
+            free &= np.isfinite(step)
+            self.step = step.ravel().tolist()
+
+        flat = free.ravel()
+        offsets = tuple(dx * stride + dy for dx, dy in MOVES)
+        valid = np.zeros(flat.size, dtype=np.uint8)
+        for o, offset in enumerate(offsets):
+            lo, hi = max(0, -offset), flat.size - max(0, offset)
+            valid[lo:hi] |= flat[lo + offset : hi + offset].astype(np.uint8) << o
+
+        self.shape = (width, height)
+        self.stride = stride
+        self.offsets = offsets
+        self.valid = valid.tolist()
+        self.version = version
+        self.rebuilt += 1
+        return self
+
+    def plan(self, start: tuple[int, int], goal: tuple[int, int], orient="x"):
+        """
+        :param start: 시작 지점 (x, y)
+        :param goal: 목표 지점 (x, y)
+        :param orient: 시작 방향 (Orient 또는 방향 문자열)
+        :return: start부터 goal까지의 (x, y) 목록, 경로가 없으면 []
+        """
+        width, height = self.shape
+        (sx, sy), (gx, gy) = start, goal
+        if not (0 <= gx < width and 0 <= gy < height and 0 <= sx < width and 0 <= sy < height):
+            return []
+        if (sx, sy) == (gx, gy):
+            return [(sx, sy)]
+
+        stride, offsets, valid, step = self.stride, self.offsets, self.valid, self.step
+        transitions = self.transitions
+        size = len(valid) * 4
+        g = array("d", [np.inf]) * size
+        parent = array("q", [-1]) * size
+        closed = bytearray(size)
+        # 패딩 좌표
+        gx, gy = gx + 1, gy + 1
+        goal_cell = gx * stride + gy
+
+        state = ((sx + 1) * stride + sy + 1) * 4 + orient_index(orient)
+        g[state] = 0.0
+        h = abs(sx + 1 - gx) + abs(sy + 1 - gy)
+        heap = [(h, h, state)]
+        while heap:
+            _, _, state = heapq.heappop(heap)
+            if closed[state]:
+                continue
+            closed[state] = 1
+            cell, o = divmod(state, 4)
+            if cell == goal_cell:
+                return self._build_path(parent, state)
+
+            cost = g[state]
+            for next_o in MASK_ORIENTS[valid[cell] & transitions[o]]:
+                next_cell = cell + offsets[next_o]
+                next_state = next_cell * 4 + next_o
+                if closed[next_state]:
+                    continue
+                next_g = cost + (1.0 if step is None else step[next_cell])
+                if next_g < g[next_state]:
+                    g[next_state] = next_g
+                    parent[next_state] = state
+                    nx, ny = divmod(next_cell, stride)
+                    h = abs(nx - gx) + abs(ny - gy)
+                    heapq.heappush(heap, (next_g + h, h, next_state))
+        return []
+
+    def _build_path(self, parent, state) -> list[tuple[int, int]]:
+        path = []
+        while state >= 0:
+            x, y = divmod(state // 4, self.stride)
+            path.append((x - 1, y - 1))
+            state = parent[state]
+        path.reverse()
+        return path
+
+
+def astar(
+    grid,
+    start: tuple[int, int],
+    goal: tuple[int, int],
+    orient="x",
+    costs=None,
+    no_reverse=True,
+) -> list[tuple[int, int]]:
+    """
+    한번만 탐색할 때. 같은 맵에서 여러 번 탐색하면 GridPlanner를 두고 version을 넘긴다.
+    :param grid: grid[x][y] (중첩 리스트 또는 배열), 1은 장애물
+    :param start: 시작 지점 (x, y)
+    :param goal: 목표 지점 (x, y)
+    :param orient: 시작 방향 (Orient 또는 방향 문자열)
+    :param costs: 셀 이동 비용 (1 이상, inf는 지나갈 수 없음), None이면 모두 1
+    :param no_reverse: 진행방향의 반대방향으로는 이동하지 않는다.
+    :return: start부터 goal까지의 (x, y) 목록, 경로가 없으면 []
+    """
+    return GridPlanner(no_reverse).set_map(grid, costs).plan(start, goal, orient)
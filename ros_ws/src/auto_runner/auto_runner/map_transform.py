@@ -1,7 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from collections import deque
-import re
+from typing import NamedTuple
+from auto_runner.lib.planner import astar
+from gmapping.utils_lib.map_pyramid import pool_blocks
 
 # 300x300 배열 생성
 
@@ -22,10 +23,71 @@ filter_kernel = np.array(
     ]
 )
 
-_size = 10
-grid_ratio = 0.1
-grid_size = int(1 / grid_ratio)
-map_size = int(_size / grid_ratio)
+# 경로계획 블록 크기(m)
+BLOCK_SIZE = 1.0
+# 미탐색(-1) 셀은 이 값으로 본다. 블록 평균이 OCCUPIED_THRESHOLD 보다 크면 장애물
+UNKNOWN_VALUE = 95
+OCCUPIED_THRESHOLD = 40
+# 기존 pre_process의 1셀 패딩 후 2셀 크롭: 맵 (1, 1) 셀이 블록맵 (0, 0) 셀이 되고,
+# 맵이 없는 곳(끝 1셀 포함)은 빈 곳(0)이다. 경로계획 좌표가 이 배치에 맞춰져 있어 유지한다.
+MAP_SHIFT = 1
+OUTSIDE_VALUE = 0
+
+
+class GridInfo(NamedTuple):
+    """OccupancyGrid.info 중 좌표 변환에 필요한 값"""
+
+    resolution: float
+    width: int
+    height: int
+    origin: tuple[float, float]
+
+
+class BlockLayout(NamedTuple):
+    """경로계획 블록맵 배치: (0, 0) 블록 모서리의 SLAM 맵 좌표 (x, y), 블록 크기(m), (rows, cols) 블록 수"""
+
+    origin: tuple[float, float]
+    size: float
+    shape: tuple[int, int]
+
+
+# 블록 경계의 기준 격자이자 최소 영역. 맵이 이 영역을 벗어나면 맵 전체를 덮도록 넓힌다.
+# (시뮬레이터 맵 (-5, -5) ~ (5, 5)에서 기존 경로계획 좌표와 같다.)
+MIN_LAYOUT = BlockLayout((-5.0, -5.0), BLOCK_SIZE, (10, 10))
+
+
+def grid_info(info) -> GridInfo:
+    return GridInfo(
+        info.resolution,
+        info.width,
+        info.height,
+        (info.origin.position.x, info.origin.position.y),
+    )
+
+
+def block_layout(info: GridInfo, base: BlockLayout = MIN_LAYOUT) -> BlockLayout:
+    """맵 영역(OccupancyGrid.info)과 base 영역을 모두 덮는, base 격자에 맞춘 블록맵 배치"""
+    size = base.size
+    base_origin = np.asarray(base.origin, dtype=np.float64)
+    map_origin = np.asarray(info.origin, dtype=np.float64)
+    lower = np.minimum(map_origin, base_origin)
+    upper = np.maximum(
+        map_origin + (info.width * info.resolution, info.height * info.resolution),
+        base_origin + (base.shape[1] * size, base.shape[0] * size),
+    )
+    # 부동소수 오차로 블록 하나가 더 붙지 않도록 셀 크기보다 작은 여유를 둔다.
+    eps = 1e-6
+    low = np.floor((lower - base_origin) / size + eps)
+    high = np.ceil((upper - base_origin) / size - eps)
+    cols, rows = (high - low).astype(int).tolist()
+    return BlockLayout(tuple((base_origin + low * size).tolist()), size, (rows, cols))
+
+
+def layout_shift(old: BlockLayout, new: BlockLayout) -> tuple[int, int]:
+    """old 배치의 블록 좌표 (x, y)를 new 배치 좌표로 옮길 때 더하는 값"""
+    return tuple(
+        int(round((a - b) / new.size)) for a, b in zip(old.origin, new.origin)
+    )
 
 
 # 가우시안 블러 필터 생성
@@ -43,68 +105,72 @@ def gaussian_kernel(size, sigma=1):
     return kernel
 
 
-def pre_process(data) -> np.array:
-    data[data == -1] = 95
-    # data[data>70] = 1
-    # data[data <= 40] = 0
-    data = data.reshape(map_size, map_size)
-
-    # 5x5 필터 커널 생성
-    filter_kernel = np.array(
-        [
-            [0, 0, 0, 0, 0],
-            [0, 1, 1, 1, 0],
-            [1, 1, 1, 1, 0],
-            [0, 1, 1, 1, 0],
-            [0, 0, 0, 0, 0],
-        ],
-        dtype=np.uint8,
-    )
-    filter = gaussian_kernel(5, 1)
-    # 패딩처리
-    data = np.pad(data, 3 // 2, mode="constant", constant_values=0)
-    data = data[2:, 2:]
-
-    # 필터 적용
-    # for row in range(2, data.shape[0] - 2):
-    #     for col in range(2, data.shape[1] - 2):
-    #         sub_data = data[row - 2:row + 3, col - 2:col + 3]
-    #         if np.bitwise_and(sub_data.astype(np.int8), filter_kernel.astype(np.int8)).a_Y():
-    #             data[row, col] = 90
-    #         else:
-    #             data[row, col] = 0
-
-    # data = filled_data
-    # data[0,:] =100
-    # data[99,:]=100
-    # data[:,0]=100
-    # data[:,99]=100
-
-    # 300x300 배열 생성 (0과 1로 이루어짐)
-    # data = np.random.randint(2, size=(300, 300))
-    return data
+def pre_process(data, info: GridInfo) -> np.array:
+    """1차원 맵 데이터 => (height, width), 미탐색은 UNKNOWN_VALUE"""
+    data = np.asarray(data).reshape(info.height, info.width)
+    return np.where(data == -1, UNKNOWN_VALUE, data)
 
 
-def create_blockmap(data, _grid_size: int, map_size: tuple) -> np.array:
+def block_offset(info: GridInfo, layout: BlockLayout) -> tuple[int, int]:
+    """맵 (0, 0) 셀의 블록맵 셀 배열 위치 (row, col), MAP_SHIFT만큼 당긴다."""
+    return (
+        int(round((info.origin[1] - layout.origin[1]) / info.resolution)) - MAP_SHIFT,
+        int(round((info.origin[0] - layout.origin[0]) / info.resolution)) - MAP_SHIFT,
+    )
 
-    # data = data.reshape(*map_size, _grid_size, _grid_size)
 
-    result = np.zeros(map_size)
+def cells_origin(info: GridInfo, layout: BlockLayout) -> tuple[float, float]:
+    """align_to_blocks 셀 배열 (0, 0) 셀 모서리의 SLAM 맵 좌표 (x, y)"""
+    return (
+        layout.origin[0] + MAP_SHIFT * info.resolution,
+        layout.origin[1] + MAP_SHIFT * info.resolution,
+    )
 
-    for i in range(result.shape[0]):
-        for j in range(result.shape[1]):
-            start_row = i * _grid_size
-            end_row = start_row + _grid_size
-            start_col = j * _grid_size
-            end_col = start_col + _grid_size
-            _sub = data[start_row:end_row, start_col:end_col]
-            if _sub.mean() > 40:
-                result[i, j] = 1
-            else:
-                result[i, j] = 0
 
+def align_to_blocks(grid, info: GridInfo, layout: BlockLayout, fill=OUTSIDE_VALUE):
+    """
+    (height, width) 맵을 블록맵 영역(layout)에 맞춰 옮긴 셀 배열과 블록 크기(셀)를 반환한다.
+    블록맵 영역 밖의 맵은 버리고, 맵이 없는 곳은 fill
+    """
+    block = max(1, int(round(layout.size / info.resolution)))
+    shape = layout.shape
+    canvas = np.full((shape[0] * block, shape[1] * block), fill, dtype=grid.dtype)
+    row, col = block_offset(info, layout)
+    r0, c0 = max(row, 0), max(col, 0)
+    r1 = min(row + grid.shape[0], canvas.shape[0])
+    c1 = min(col + grid.shape[1], canvas.shape[1])
+    if r0 < r1 and c0 < c1:
+        canvas[r0:r1, c0:c1] = grid[r0 - row : r1 - row, c0 - col : c1 - col]
+    return canvas, block
+
+
+def create_blockmap(
+    data, _grid_size: int, map_size: tuple, reduce: str = "mean", threshold=OCCUPIED_THRESHOLD
+) -> np.array:
+    """
+    _grid_size x _grid_size 셀 블록마다 장애물(1)/빈 곳(0)을 정한 map_size 블록맵
+    mean, max는 블록 값이 threshold보다 크면, any는 threshold보다 큰 셀이 있으면 장애물
+    """
+    rows, cols = map_size
+    data = np.asarray(data)[: rows * _grid_size, : cols * _grid_size]
+    pooled = pool_blocks(data, _grid_size, reduce, fill=UNKNOWN_VALUE, threshold=threshold)
+    if reduce != "any":
+        pooled = pooled > threshold
+    result = np.ones(map_size)
+    result[: pooled.shape[0], : pooled.shape[1]] = pooled
     return result
 
+
+def world_to_block(points, layout: BlockLayout = MIN_LAYOUT) -> np.ndarray:
+    """SLAM 맵 좌표 (x, y) 또는 (n, 2) => 블록 좌표 (음수는 0)"""
+    cells = np.floor((np.asarray(points, dtype=np.float64) - layout.origin) / layout.size)
+    return np.maximum(cells, 0).astype(int)
+
+
+def block_to_world(cells, layout: BlockLayout = MIN_LAYOUT) -> np.ndarray:
+    """블록 좌표 (x, y) 또는 (n, 2) => 블록 중심의 SLAM 맵 좌표"""
+    return np.asarray(layout.origin) + (np.asarray(cells, dtype=np.float64) + 0.5) * layout.size
+
 def flip_map(data:list, axis:int=0) -> list:    
     return np.flip(data, axis=axis)
 
@@ -179,76 +245,29 @@ def find_path(
     :param grid: 2D 그리드 맵
     :param start: 시작 지점 (x, y)
     :param goal: 목표 지점 (x, y)
-    :return: 최단 경로
+    :return: 최단 경로, 없으면 []
     """
-    start = (start[0], start[1], dir)
-
-    frontier = deque()
-    frontier.append((start, [start]))  # 큐에 시작 위치와 경로 추가
-    visited = set()  # 방문한 노드 집합
-
-    while frontier:
-        curr_node, path = frontier.popleft()
-
-        if curr_node[:2] == goal:
-            # 초기입력된 방향값 제거
-            path[0] = path[0][:2]
-            return path
-
-        if curr_node in visited:
-            continue
-
-        visited.add(curr_node)
-
-        x, y, cur_d = curr_node
-        for next_x, next_y, next_d in (
-            (x + 1, y, "x"),
-            (x - 1, y, "-x"),
-            (x, y + 1, "y"),
-            (x, y - 1, "-y"),
-        ):
-            if (
-                0 <= next_x < len(grid[1])
-                and 0 <= next_y < len(grid[0])
-                and grid[next_x][next_y] != 1
-            ):
-                # 최초 다음위치에서 self.dir의 반대방향을 제외시킨다.
-                if _check_if_backpath(cur_d, next_d):
-                    continue
-
-                frontier.append(((next_x, next_y, next_d), path + [(next_x, next_y)]))
-
-        frontier = deque(
-            sorted(
-                frontier,
-                key=lambda x: len(x[1]) + _heuristic_distance(x[0][:2], goal),
-            )
-        )
-
-    # return []
-    path[0] = path[0][:2]
-    return path
-
-
-def _check_if_backpath(cur_dir: str, next_dir: str) -> bool:
+    return astar(grid, start, goal, dir)
 
-    pattern = re.compile(r"^-(.)\1$|^(.)-\2$")
-    # 후진 경로 배제
-    return pattern.match(f"{cur_dir}{next_dir}") is not None
 
-
-def _heuristic_distance(a, b) -> int:
+def apply_map_update(data: np.ndarray, width: int, update) -> np.ndarray:
     """
-    목표점까지의 추정거리를 추정한다
+    OccupancyGridUpdate 패치(x, y, width, height, data)를 1차원 맵 데이터에 반영한다.
     """
-    (x1, y1) = a
-    (x2, y2) = b
-    return abs(x1 - x2) + abs(y1 - y2)
+    grid = data.reshape(-1, width)
+    patch = np.array(update.data, dtype=np.int8).reshape(update.height, update.width)
+    grid[update.y : update.y + update.height, update.x : update.x + update.width] = patch
+    return data
 
 
-def convert_map(data:np=None) -> list[int]:
-    data = pre_process(data)
-    data = create_blockmap(data, map_size=(10, 10), _grid_size=10)
+def convert_map(
+    data: np.ndarray, info: GridInfo, reduce: str = "mean", base: BlockLayout = MIN_LAYOUT
+) -> list[int]:
+    """OccupancyGrid 데이터 => 경로계획용 블록맵 (grid[x][y], 영역은 block_layout(info, base))"""
+    layout = block_layout(info, base)
+    data = pre_process(data, info)
+    data, block = align_to_blocks(data, info, layout)
+    data = create_blockmap(data, map_size=layout.shape, _grid_size=block, reduce=reduce)
     # transpose x->y
     # data = transpose2_map(data)
     # flip -y->y
@@ -269,14 +288,15 @@ if __name__ == "__main__":
         base_dir = (
             r"D:\unity_works\with-robot-2024-1st\ros_ws\src\slam_map"
         )
-    data = np.loadtxt(f"{base_dir}/resource/occ_map.txt")
-    
-    data = ' '.join(map(str, data.flatten()))
-    raw_data = np.fromstring(data, dtype=float, sep=' ')
+    from gmapping.utils_lib.map_snapshot import load_snapshot
+
+    header, snapshot = load_snapshot(f"{base_dir}/resource/occ_map.bin")
+    raw_data = np.array(snapshot, dtype=float).reshape(-1)
+    info = GridInfo(header.resolution, header.width, header.height, header.origin)
 
-    map = convert_map(raw_data)
+    map = convert_map(raw_data, info)
     print(map)
 
-    paths = find_path(data, (1,1), (5,9))
+    paths = find_path(map, (1,1), (5,9))
     print(paths)
-    plot_map(map, None, map_size=10)
+    plot_map(map, None, map_size=len(map))
@@ -1,4 +1,3 @@
-import numpy as np
 import rclpy
 from rclpy.node import Node
 from rclpy.qos import QoSProfile
@@ -9,11 +8,20 @@ from geometry_msgs.msg import TwistStamped, Twist, Vector3
 from yolov8_msgs.srv import CmdMsg
 from sensor_msgs.msg import LaserScan
 from nav_msgs.msg import OccupancyGrid
-from auto_runner.map_transform import convert_map
-from auto_runner.lib import car_drive, common, path_location
+from map_msgs.msg import OccupancyGridUpdate
+from auto_runner.map_transform import MIN_LAYOUT, grid_info
+from auto_runner.lib.map_store import MapChange, MapStore, stamp_nanoseconds
+from auto_runner.lib.costmap import Costmap
+from auto_runner.lib import car_drive, common
 
 laser_scan: LaserScan = None
 grid_map: list[list[int]] = None
+# grid_map의 version (블록맵이 바뀔 때만 증가)과 배치
+grid_version = 0
+grid_layout = MIN_LAYOUT
+# costmap 블록 비용 grid[x][y]와 version
+cost_grid: list[list[float]] = None
+cost_version = 0
 
 
 class GridMap(Node):
@@ -30,11 +38,41 @@ class GridMap(Node):
             self.receive_map,
             10,
         )
+        # 전체 맵 수신 사이의 변경 영역 패치
+        self.map_update_sub = self.create_subscription(
+            OccupancyGridUpdate,
+            "/occ_grid_map_updates",
+            self.receive_map_update,
+            10,
+        )
+        # 블록맵이 바뀌었을 때만 grid_map을 교체한다.
+        self.store = MapStore()
+        # SLAM 맵 장애물 + 팽창 비용
+        self.costmap = Costmap()
 
     def receive_map(self, map: OccupancyGrid):
-        global grid_map
-        raw_data = np.array(map.data, dtype=np.int8)
-        grid_map = convert_map(raw_data)
+        stamp = stamp_nanoseconds(map.header.stamp)
+        self.apply_change(self.store.update_map(map.data, grid_info(map.info), stamp))
+
+    def receive_map_update(self, update: OccupancyGridUpdate):
+        # 전체 맵을 받기 전이거나 전체 맵보다 오래된 패치는 반영하지 않는다. (None)
+        stamp = stamp_nanoseconds(update.header.stamp)
+        self.apply_change(self.store.update_patch(update, stamp))
+
+    def apply_change(self, change: MapChange):
+        global grid_map, grid_version, grid_layout, cost_grid, cost_version
+        # 값이 바뀐 셀 영역만 costmap에 반영한다.
+        if self.store.touched is not None and self.costmap.update_static(
+            self.store.cells,
+            self.store.info.resolution,
+            self.store.cells_origin,
+            self.store.touched,
+        ):
+            cost_grid, cost_version = self.costmap.block_grid(), self.costmap.version
+        if change is None:
+            return
+        grid_map, grid_version, grid_layout = change.grid, change.version, change.layout
+        self.get_logger().info(f"map v{change.version}: changed={change.changed}")
 
 
 class LidarScanNode(Node):
@@ -95,7 +133,8 @@ class AStartSearchNode(Node):
             return
 
         # 맵,위치데이터 수신
-        self.robot_ctrl.update_map(grid_map)
+        self.robot_ctrl.update_map(grid_map, grid_version, grid_layout)
+        self.robot_ctrl.update_costs(cost_grid, cost_version)
         self.robot_ctrl.update_pos(loc_data)
 
         if self.robot_ctrl.check_arrival(finish=False):
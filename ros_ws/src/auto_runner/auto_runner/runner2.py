@@ -1,4 +1,4 @@
-import numpy as np
+import threading
 import rclpy
 from rclpy.node import Node
 from rclpy.qos import QoSProfile
@@ -9,10 +9,13 @@ from geometry_msgs.msg import TwistStamped, Twist, Vector3
 from yolov8_msgs.srv import CmdMsg
 from sensor_msgs.msg import LaserScan
 from nav_msgs.msg import OccupancyGrid
-from auto_runner.map_transform import convert_map
+from map_msgs.msg import OccupancyGridUpdate
+from auto_runner.map_transform import grid_info
+from auto_runner.lib.map_store import MapChange, MapStore, stamp_nanoseconds
+from auto_runner.lib.costmap import Costmap
 from auto_runner.lib.parts import *
 from auto_runner.lib.car_drive2 import RobotController2
-from auto_runner.lib.common import Message, Observable, SearchEndException
+from auto_runner.lib.common import Message, Observable
 
 class GridMap(Node):
     def __init__(self) -> None:
@@ -29,11 +32,77 @@ class GridMap(Node):
             callback_group=self._default_callback_group,
             qos_profile=10,
         )
+        # 전체 맵 수신 사이의 변경 영역 패치
+        self.map_update_sub = self.create_subscription(
+            OccupancyGridUpdate,
+            "/occ_grid_map_updates",
+            callback=self.receive_map_update,
+            callback_group=self._default_callback_group,
+            qos_profile=10,
+        )
+        # 블록맵이 바뀌었을 때만 version을 올려 발행한다.
+        self.store = MapStore()
+        # SLAM 맵 + 라이다 장애물 + 팽창 비용. 블록 비용이 바뀌면 CostData로 발행한다.
+        self.costmap = Costmap()
+        self.cost_grid = None
+        self.pose = None
+        self._lock = threading.Lock()
+        IMUData.subscribe(o=self.receive_pose)
+        LidarData.subscribe(o=self.receive_scan)
 
     def receive_map(self, map: OccupancyGrid):
-        raw_data = np.array(map.data, dtype=np.int8)
-        grid_map = convert_map(raw_data)
-        MapData.publish_(data = grid_map)
+        with self._lock:
+            stamp = stamp_nanoseconds(map.header.stamp)
+            self.publish_change(self.store.update_map(map.data, grid_info(map.info), stamp))
+            self.update_costmap()
+
+    def receive_map_update(self, update: OccupancyGridUpdate):
+        with self._lock:
+            # 전체 맵을 받기 전이거나 전체 맵보다 오래된 패치는 반영하지 않는다. (None)
+            stamp = stamp_nanoseconds(update.header.stamp)
+            self.publish_change(self.store.update_patch(update, stamp))
+            self.update_costmap()
+
+    def receive_pose(self, message: Message):
+        # [x, y, yaw]
+        self.pose = message.data
+
+    def receive_scan(self, message: Message):
+        if self.pose is None:
+            return
+        with self._lock:
+            if self.costmap.update_scan(self.pose, message.data):
+                self.publish_costs()
+
+    def update_costmap(self):
+        # 값이 바뀐 셀 영역만 costmap에 반영한다.
+        if self.store.touched is None:
+            return
+        if self.costmap.update_static(
+            self.store.cells,
+            self.store.info.resolution,
+            self.store.cells_origin,
+            self.store.touched,
+        ):
+            self.publish_costs()
+
+    def publish_costs(self):
+        cost_grid = self.costmap.block_grid()
+        if cost_grid == self.cost_grid:
+            return
+        self.cost_grid = cost_grid
+        CostData.publish_(data=cost_grid, meta=dict(version=self.costmap.version))
+
+    def publish_change(self, change: MapChange):
+        if change is None:
+            return
+        MapData.publish_(
+            data=change.grid,
+            meta=dict(version=change.version, changed=change.changed, layout=change.layout),
+        )
+        self.get_logger().info(
+            f"map v{change.version}: changed={change.changed}, {self.store.stats()}"
+        )
 
 
 class LidarScanNode(Node):
@@ -23,6 +23,7 @@ setup(
         "console_scripts": [
             f"runner = {package_name}.runner:main",
             f"runner2 = {package_name}.runner2:main",
+            f"planner_benchmark = {package_name}.benchmark:main",
         ],
     },
 )
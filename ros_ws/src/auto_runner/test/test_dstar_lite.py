@@ -0,0 +1,52 @@
+import numpy as np
+from auto_runner.lib.dstar_lite import DStarLite
+from auto_runner.lib.planner import MOVES, ORIENTS, astar
+
+
+def path_cost(path, costs):
+    return sum(costs[x][y] for x, y in path[1:])
+
+
+def last_orient(path, orient):
+    """경로의 마지막 이동 방향 (이동이 없으면 orient)"""
+    if len(path) < 2:
+        return orient
+    (x0, y0), (x1, y1) = path[-2:]
+    return ORIENTS[MOVES.index((x1 - x0, y1 - y0))]
+
+
+def test_replan_after_obstacle_change_matches_fresh_astar():
+    rng = np.random.default_rng(1)
+    compared = unreachable = 0
+    for _ in range(60):
+        grid = (rng.random((9, 8)) < 0.2).astype(int)
+        costs = rng.integers(1, 4, grid.shape).astype(float)
+        start, goal = (0, 0), (8, 7)
+        grid[start] = grid[goal] = 0
+        dstar = DStarLite(grid, goal, costs=costs)
+        dstar.set_start(start, "x")
+        path = dstar.plan()
+        assert path_cost(path, costs) == path_cost(astar(grid, start, goal, "x", costs), costs)
+        if len(path) < 4:
+            continue
+
+        # 두 칸 이동한 후 앞 경로에 장애물이 생기고 다른 곳의 장애물은 없어진다.
+        start, orient = path[2], last_orient(path[:3], "x")
+        dstar.set_start(start, orient)
+        grid = grid.copy()
+        for x, y in path[3:-1:3]:
+            grid[x, y] = 1
+        grid[tuple(rng.integers(0, grid.shape))] = 0
+        dstar.update_map(grid, costs)
+
+        replanned = dstar.plan()
+        expected = astar(grid, start, goal, orient, costs)
+        assert (replanned == []) == (expected == [])
+        if expected:
+            assert replanned[0] == start and replanned[-1] == goal
+            assert all(grid[x, y] != 1 for x, y in replanned)
+            assert path_cost(replanned, costs) == path_cost(expected, costs)
+            compared += 1
+        else:
+            unreachable += 1
+    assert compared and unreachable
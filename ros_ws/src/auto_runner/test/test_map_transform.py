@@ -0,0 +1,163 @@
+from types import SimpleNamespace
+import numpy as np
+from auto_runner.map_transform import GridInfo, block_layout, convert_map
+from auto_runner.lib.map_store import MapStore
+from gmapping.utils_lib.map_snapshot import patch_frame_id
+
+# 시뮬레이터 맵 (100 x 100, 0.1m, 원점 (-5, -5))
+INFO = GridInfo(0.1, 100, 100, (-5.0, -5.0))
+
+
+def baseline_convert_map(data):
+    """기존 pre_process + create_blockmap 이중 루프 (100x100, 0.1m 맵)"""
+    data = np.array(data, dtype=np.float64)
+    data[data == -1] = 95
+    data = data.reshape(100, 100)
+    data = np.pad(data, 1, mode="constant", constant_values=0)[2:, 2:]
+    result = np.zeros((10, 10))
+    for i in range(10):
+        for j in range(10):
+            block = data[i * 10 : (i + 1) * 10, j * 10 : (j + 1) * 10]
+            result[i, j] = 1 if block.mean() > 40 else 0
+    return result.T.tolist()
+
+
+def baseline_layout_map(data, info, origin, shape, block_size=1.0):
+    """
+    기존 pre_process(1셀 패딩 후 2셀 크롭) + 블록 이중 루프를 임의의 원점/해상도로 일반화한 것.
+    블록맵 (0, 0) 셀 모서리 = origin, 셀 (i, j) = 맵 (i + 1 - 원점 차, j + 1 - 원점 차) 셀
+    """
+    data = np.array(data, dtype=np.float64).reshape(info.height, info.width)
+    data[data == -1] = 95
+    block = int(round(block_size / info.resolution))
+    row_shift = int(round((info.origin[1] - origin[1]) / info.resolution))
+    col_shift = int(round((info.origin[0] - origin[0]) / info.resolution))
+    cells = np.zeros((shape[0] * block, shape[1] * block))
+    for i in range(cells.shape[0]):
+        for j in range(cells.shape[1]):
+            row, col = i + 1 - row_shift, j + 1 - col_shift
+            if 0 <= row < info.height and 0 <= col < info.width:
+                cells[i, j] = data[row, col]
+    result = np.zeros(shape)
+    for i in range(shape[0]):
+        for j in range(shape[1]):
+            result[i, j] = 1 if cells[i * block : (i + 1) * block, j * block : (j + 1) * block].mean() > 40 else 0
+    return result.T.tolist()
+
+
+def random_maps(count, seed=0, shape=(100, 100)):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        grid = rng.choice([-1, 0, 0, 0, 100], size=shape)
+        # 블록 경계에 걸친 장애물 덩어리
+        for _ in range(rng.integers(0, 20)):
+            row, col = rng.integers(0, min(shape), 2)
+            grid[row : row + rng.integers(1, 15), col : col + rng.integers(1, 15)] = 100
+        yield grid.reshape(-1).astype(np.int8)
+
+
+def test_convert_map_matches_baseline():
+    for data in random_maps(50):
+        assert convert_map(data.copy(), INFO) == baseline_convert_map(data)
+
+
+def test_default_layout_matches_baseline_loop():
+    # 일반화한 기준 구현이 기존 100 x 100 기준 구현과 같은지 먼저 확인한다.
+    for data in random_maps(5, seed=3):
+        expected = baseline_convert_map(data)
+        assert baseline_layout_map(data, INFO, (-5.0, -5.0), (10, 10)) == expected
+
+
+def test_block_layout_covers_map():
+    assert block_layout(INFO) == ((-5.0, -5.0), 1.0, (10, 10))
+    # 10m보다 큰 맵은 잘리지 않고 블록맵이 넓어진다. 블록 경계는 (-5, -5) 격자에 맞춘다.
+    info = GridInfo(0.05, 300, 260, (-8.0, -6.5))
+    assert block_layout(info) == ((-8.0, -7.0), 1.0, (14, 15))
+    info = GridInfo(0.1, 64 * 3, 64 * 2, (-9.6, -3.2))
+    assert block_layout(info) == ((-10.0, -5.0), 1.0, (15, 20))
+
+
+def test_convert_map_other_origin_and_resolution():
+    cases = [
+        # (해상도, (height, width), 원점)
+        (0.05, (260, 300), (-8.0, -6.5)),
+        (0.1, (128, 192), (-9.6, -3.2)),
+        (0.2, (40, 60), (-3.0, -4.0)),
+    ]
+    for resolution, shape, origin in cases:
+        info = GridInfo(resolution, shape[1], shape[0], origin)
+        layout = block_layout(info)
+        for data in random_maps(3, seed=4, shape=shape):
+            expected = baseline_layout_map(data, info, layout.origin, layout.shape)
+            assert convert_map(data.copy(), info) == expected
+            store = MapStore()
+            store.update_map(data, info)
+            assert store.grid == expected
+            assert store.layout == layout
+
+
+def test_map_store_matches_convert_map():
+    store = MapStore()
+    for data in random_maps(20, seed=1):
+        store.update_map(data, INFO)
+        assert store.grid == convert_map(data.copy(), INFO)
+
+
+def make_patch(data, info, x=0, y=0):
+    """info 영역의 맵에서 만든 OccupancyGridUpdate (data는 (height, width) 배열)"""
+    data = np.asarray(data, dtype=np.int8)
+    frame_id = patch_frame_id("odom", info.width, info.height, info.origin)
+    return SimpleNamespace(
+        header=SimpleNamespace(frame_id=frame_id),
+        x=x,
+        y=y,
+        width=data.shape[1],
+        height=data.shape[0],
+        data=data.reshape(-1),
+    )
+
+
+def test_map_store_drops_stale_patch():
+    store = MapStore()
+    old, new = random_maps(2, seed=2)
+    store.update_map(new, INFO, stamp=20)
+    # 전체 맵보다 먼저 만들어져 늦게 도착한 패치는 반영하지 않는다.
+    patch = make_patch(old.reshape(100, 100), INFO)
+    assert store.update_patch(patch, stamp=10) is None
+    assert store.stale == 1
+    assert store.grid == convert_map(new.copy(), INFO)
+    # 전체 맵 이후의 패치는 반영한다.
+    store.update_patch(patch, stamp=30)
+    assert store.grid == convert_map(old.copy(), INFO)
+    # 패치보다 오래된 전체 맵도 버린다.
+    assert store.update_map(new, INFO, stamp=25) is None
+    assert store.stale == 2
+
+
+def test_map_store_drops_patches_until_grown_map_arrives():
+    store = MapStore()
+    small, grown = random_maps(2, seed=5, shape=(100, 164))
+    small = small.reshape(100, 164)[:, :100].reshape(-1).copy()
+    store.update_map(small, INFO, stamp=10)
+
+    # 맵이 x 음수 방향으로 6.4m 넓어졌다. 순서: 전체 맵(20), 새 영역의 패치(30)
+    # 패치가 전체 맵보다 먼저 도착한다. 패치는 이전 맵 배열 안에 들어가는 위치다.
+    info = GridInfo(0.1, 164, 100, (-11.4, -5.0))
+    wall = np.full((5, 10), 100)
+    patch = make_patch(wall, info, x=70, y=40)
+    assert store.update_patch(patch, stamp=30) is None
+    assert store.stale == 1
+    assert store.grid == convert_map(small.copy(), INFO)
+
+    # 늦게 온 새 영역의 전체 맵은 패치보다 stamp가 이르지만 버리지 않는다.
+    store.update_map(grown, info, stamp=20)
+    assert store.grid == convert_map(grown.copy(), info)
+    assert store.layout == block_layout(info)
+
+    # 이후 같은 영역의 패치는 반영한다.
+    store.update_patch(make_patch(wall, info, x=70, y=40), stamp=40)
+    expected = grown.reshape(100, 164).copy()
+    expected[40:45, 70:80] = 100
+    assert store.grid == convert_map(expected.reshape(-1), info)
+    # 이전 영역의 패치는 stamp가 늦어도 버린다.
+    assert store.update_patch(make_patch(wall, INFO), stamp=50) is None
@@ -0,0 +1,52 @@
+import numpy as np
+from auto_runner.lib.path_cache import PathCache
+from auto_runner.lib.planner import astar
+
+
+def cached_paths(grid):
+    """(0, y) => (5, y) 직선 경로 두 개를 캐시에 넣는다."""
+    cache = PathCache()
+    cache.sync(1, grid)
+    for y in (1, 4):
+        cache.put((0, y), "x", (5, y), astar(grid, (0, y), (5, y), "x"))
+    return cache
+
+
+def test_changed_cell_drops_only_paths_through_it():
+    grid = np.zeros((6, 6), dtype=int)
+    cache = cached_paths(grid)
+    kept = cache.get((0, 4), "x", (5, 4))
+
+    changed = grid.copy()
+    changed[3, 1] = 1
+    cache.sync(2, changed)
+    assert cache.get((0, 1), "x", (5, 1)) is None
+    assert cache.get((0, 4), "x", (5, 4)) == kept
+    assert cache.invalidated == 1
+    assert cache.version == 2
+
+
+def test_unreachable_result_dropped_on_any_change():
+    grid = np.zeros((6, 6), dtype=int)
+    cache = cached_paths(grid)
+    cache.put((0, 0), "-x", (5, 0), [])
+    assert cache.get((0, 0), "-x", (5, 0)) == []
+
+    changed = grid.copy()
+    changed[5, 5] = 1
+    cache.sync(2, changed)
+    assert cache.get((0, 0), "-x", (5, 0)) is None
+    assert cache.get((0, 1), "x", (5, 1)) is not None
+
+
+def test_same_version_or_other_shape():
+    grid = np.zeros((6, 6), dtype=int)
+    cache = cached_paths(grid)
+    # 같은 version이면 비교하지 않는다.
+    changed = grid.copy()
+    changed[3, 1] = 1
+    cache.sync(1, changed)
+    assert cache.get((0, 1), "x", (5, 1)) is not None
+    # 맵 크기가 바뀌면 모두 버린다.
+    cache.sync(2, np.zeros((7, 6), dtype=int))
+    assert cache.stats()["size"] == 0
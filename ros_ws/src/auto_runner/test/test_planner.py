@@ -0,0 +1,109 @@
+from collections import deque
+import numpy as np
+from auto_runner.lib.planner import REVERSE, ORIENTS, GridPlanner, astar
+
+MOVES = {"x": (1, 0), "-x": (-1, 0), "y": (0, 1), "-y": (0, -1)}
+
+
+def baseline_find_path(grid, start, goal, orient="x"):
+    """기존 정렬 기반 탐색 (path_location._astar_method, 후진 제외)"""
+    frontier = deque([((start[0], start[1], orient), [tuple(start)])])
+    visited = set()
+    while frontier:
+        node, path = frontier.popleft()
+        if node[:2] == tuple(goal):
+            return path
+        if node in visited:
+            continue
+        visited.add(node)
+        x, y, cur = node
+        for next_o, (dx, dy) in MOVES.items():
+            nx, ny = x + dx, y + dy
+            if ORIENTS.index(next_o) == REVERSE[ORIENTS.index(cur)]:
+                continue
+            if 0 <= nx < len(grid) and 0 <= ny < len(grid[0]) and grid[nx][ny] != 1:
+                frontier.append(((nx, ny, next_o), path + [(nx, ny)]))
+        frontier = deque(
+            sorted(
+                frontier,
+                key=lambda f: len(f[1]) + abs(f[0][0] - goal[0]) + abs(f[0][1] - goal[1]),
+            )
+        )
+    return []
+
+
+def assert_valid_path(grid, path, start, goal, orient):
+    assert path[0] == start and path[-1] == goal
+    prev = ORIENTS.index(orient)
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        o = ORIENTS.index(next(k for k, v in MOVES.items() if v == (x1 - x0, y1 - y0)))
+        assert o != REVERSE[prev]
+        assert grid[x1][y1] != 1
+        prev = o
+
+
+def test_astar_matches_baseline_on_random_maps():
+    rng = np.random.default_rng(0)
+    found = missing = 0
+    for _ in range(200):
+        grid = (rng.random((8, 7)) < 0.3).astype(int).tolist()
+        start = tuple(rng.integers(0, (8, 7)).tolist())
+        goal = tuple(rng.integers(0, (8, 7)).tolist())
+        orient = ORIENTS[rng.integers(4)]
+        grid[start[0]][start[1]] = 0
+        path = astar(grid, start, goal, orient)
+        expected = baseline_find_path(grid, start, goal, orient)
+        # 막힌 목표, 닿을 수 없는 목표는 둘 다 []
+        assert len(path) == len(expected)
+        if path:
+            assert_valid_path(grid, path, start, goal, orient)
+            found += 1
+        else:
+            missing += 1
+    assert found and missing
+
+
+def test_astar_blocked_and_unreachable_goal():
+    grid = [
+        [0, 0, 0, 0],
+        [1, 1, 1, 0],
+        [0, 0, 1, 1],
+        [0, 0, 1, 0],
+    ]
+    # 목표가 장애물
+    assert astar(grid, (0, 0), (1, 1)) == []
+    # 벽으로 막힌 영역
+    assert astar(grid, (0, 0), (3, 0)) == []
+    assert baseline_find_path(grid, (0, 0), (3, 0)) == []
+    # 맵 밖
+    assert astar(grid, (0, 0), (4, 0)) == []
+    # 후진 금지: -y 방향으로 시작하면 y로 갈 수 없고 x쪽은 막혀 있다.
+    assert astar(grid, (0, 0), (0, 3), "y") == [(0, 0), (0, 1), (0, 2), (0, 3)]
+    assert astar(grid, (0, 0), (0, 3), "-y") == []
+
+
+def test_grid_planner_rebuilds_only_on_version_change():
+    grid = np.zeros((5, 5), dtype=int)
+    planner = GridPlanner()
+    planner.set_map(grid, version=1)
+    assert len(planner.plan((0, 2), (4, 2))) == 5
+    planner.set_map(grid, version=1)
+    assert planner.rebuilt == 1
+
+    # 같은 version이면 바뀐 맵을 보지 않는다.
+    wall = grid.copy()
+    wall[2, :4] = 1
+    planner.set_map(wall, version=1)
+    assert len(planner.plan((0, 2), (4, 2))) == 5
+
+    planner.set_map(wall, version=2)
+    assert planner.rebuilt == 2
+    path = planner.plan((0, 2), (4, 2))
+    assert len(path) == len(baseline_find_path(wall.tolist(), (0, 2), (4, 2)))
+    assert (2, 4) in path
+    assert_valid_path(wall, path, (0, 2), (4, 2), "x")
+
+    # version=None이면 항상 다시 만든다.
+    planner.set_map(grid)
+    planner.set_map(grid)
+    assert planner.rebuilt == 4
@@ -8,9 +8,8 @@ from rclpy.callback_groups import ReentrantCallbackGroup
 from geometry_msgs.msg import TwistStamped, Twist, Vector3
 from yolov8_msgs.srv import CmdMsg
 from sensor_msgs.msg import LaserScan
-from collections import deque
 import math
-import re
+from auto_runner.lib.planner import astar
 
 laser_scan: LaserScan = None
 
@@ -391,68 +390,8 @@ class AStartSearchNode(Node):
         :return: 최단 경로
         """
         self.get_logger().info(f"find_path: {start}, goal: {goal}")
-        grid = self.SLAM_MAP
-        start = (start[0], start[1], self.dir)
-
-        frontier = deque()
-        frontier.append((start, [start]))  # 큐에 시작 위치와 경로 추가
-        visited = set()  # 방문한 노드 집합
-
-        while frontier:
-            curr_node, path = frontier.popleft()
-
-            if curr_node[:2] == goal:
-                # 초기입력된 방향값 제거
-                path[0] = path[0][:2]
-                return path
-
-            if curr_node in visited:
-                continue
-
-            visited.add(curr_node)
-
-            x, y, cur_d = curr_node
-            for next_x, next_y, next_d in (
-                (x + 1, y, "x"),
-                (x - 1, y, "-x"),
-                (x, y + 1, "y"),
-                (x, y - 1, "-y"),
-            ):
-                if (
-                    0 <= next_x < len(grid)
-                    and 0 <= next_y < len(grid[0])
-                    and grid[next_x][next_y] != 1
-                ):
-                    # 최초 다음위치에서 self.dir의 반대방향을 제외시킨다.
-                    if self._check_if_backpath(cur_d, next_d):
-                        continue
-
-                    frontier.append(
-                        ((next_x, next_y, next_d), path + [(next_x, next_y)])
-                    )
-
-            frontier = deque(
-                sorted(
-                    frontier,
-                    key=lambda x: len(x[1]) + self._heuristic_distance(x[0][:2], goal),
-                )
-            )
-
-        return []
-
-    def _check_if_backpath(self, cur_dir: str, next_dir: str) -> bool:
-
-        pattern = re.compile(r"^-(.)\1$|^(.)-\2$")
-        # 후진 경로 배제
-        return pattern.match(f"{cur_dir}{next_dir}") is not None
-
-    def _heuristic_distance(self, a, b) -> int:
-        """
-        목표점까지의 추정거리를 추정한다
-        """
-        (x1, y1) = a
-        (x2, y2) = b
-        return abs(x1 - x2) + abs(y1 - y2)
+        # 진행방향(self.dir)의 반대방향은 제외한다.
+        return astar(self.SLAM_MAP, start, goal, self.dir)
 
 
 def main(args=None):
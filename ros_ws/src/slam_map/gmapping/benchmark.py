@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+gmapping 스캔 적분 벤치마크. (ROS 없이 실행)
+
+    python3 -m gmapping.benchmark --scans 200 --beams 65
+    python3 -m gmapping.benchmark --log test/pose.txt test/measurements.txt
+    python3 -m gmapping.benchmark --suite -o bench.json --compare baseline.json
+"""
+
+import argparse
+import array
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from gmapping.utils_lib.bresenham import bresenham_line
+from gmapping.utils_lib.gridmap import GridMap, RayTable, to_occupancy
+from gmapping.utils_lib.scan_matcher import CorrelativeScanMatcher, apply_transform
+from gmapping.utils_lib.tiled_gridmap import TiledGridMap
+from gmapping.utils_lib.scan_log import load_text_log
+
+# Unity LidarPublisher 기본값
+ANGLE_MIN = -1.57
+
+
+def synthetic_scans(count, beams, map_width, seed=0):
+    """
+    맵 중앙부의 임의 위치/각도와 임의 거리로 스캔을 만든다.
+    add_ray는 맵 밖으로 나가는 빔을 처리하지 못하므로 빔은 맵 안에 머물게 한다.
+    """
+    rng = np.random.default_rng(seed)
+    half = map_width / 4
+    poses = np.column_stack(
+        [
+            rng.uniform(-half, half, count),
+            rng.uniform(-half, half, count),
+            rng.uniform(-np.pi, np.pi, count),
+        ]
+    )
+    ranges = rng.uniform(0.3, half, (count, beams))
+    return poses, ranges
+
+
+def _beam_angles(theta, beams):
+    return theta + ANGLE_MIN + np.arange(beams) * (2 * -ANGLE_MIN / beams)
+
+
+def bench_ray_trace(poses, ranges, cell_size, map_width, table_size=16384):
+    """add_ray(bresenham_line), add_scan(DDA), add_scan(RayTable)을 비교한다."""
+    beams = ranges.shape[1]
+    results = {}
+
+    gridmap = GridMap((0, 0), None, cell_size=cell_size, map_width=map_width)
+    started = time.perf_counter()
+    for (x, y, theta), scan in zip(poses, ranges):
+        for angle, range_ in zip(_beam_angles(theta, beams), scan):
+            gridmap.add_ray((x, y), angle, range_, 0.7)
+    results["add_ray(bresenham_line)"] = time.perf_counter() - started
+
+    gridmap = GridMap((0, 0), None, cell_size=cell_size, map_width=map_width)
+    started = time.perf_counter()
+    for (x, y, theta), scan in zip(poses, ranges):
+        gridmap.add_scan((x, y), _beam_angles(theta, beams), scan, 0.7)
+    results["add_scan(dda)"] = time.perf_counter() - started
+
+    # 첫 회는 테이블 생성 비용 포함, 두번째는 채워진 테이블로 측정
+    table = RayTable(maxsize=table_size)
+    for name in ("add_scan(ray_table,cold)", "add_scan(ray_table,warm)"):
+        gridmap = GridMap(
+            (0, 0), None, cell_size=cell_size, map_width=map_width, ray_table=table
+        )
+        started = time.perf_counter()
+        for (x, y, theta), scan in zip(poses, ranges):
+            gridmap.add_scan((x, y), _beam_angles(theta, beams), scan, 0.7)
+        results[name] = time.perf_counter() - started
+
+    return results, table.cache_info()
+
+
+def bench_scan_matcher(poses, ranges, cell_size, noise=(0.15, 0.15, 0.08), step=5, seed=0):
+    """
+    로그 전체로 만든 맵에 pose를 흔든 스캔을 매칭해 속도와 보정 전후 오차를 잰다.
+    로그의 pose를 정답으로 본다.
+    """
+    beams = ranges.shape[1]
+    max_range = float(np.nanmax(ranges)) + 1.0
+    gridmap = TiledGridMap((0, 0), None, cell_size=cell_size)
+    for (x, y, theta), scan in zip(poses, ranges):
+        gridmap.add_scan((x, y), _beam_angles(theta, beams), scan, 0.7)
+
+    rng = np.random.default_rng(seed)
+    matcher = CorrelativeScanMatcher(cell_size)
+    prepare_time = match_time = 0.0
+    before, after = [], []
+    for (x, y, theta), scan in zip(poses[::step], ranges[::step]):
+        error = rng.uniform(-1, 1, 3) * noise
+        start = np.array([x, y]) + error[:2]
+        angles = _beam_angles(theta + error[2], beams)
+
+        started = time.perf_counter()
+        matcher.prepare(gridmap, start, max_range)
+        prepare_time += time.perf_counter() - started
+        started = time.perf_counter()
+        transform, _ = matcher.match(start, angles, scan, max_range)
+        match_time += time.perf_counter() - started
+
+        before.append((np.hypot(*error[:2]), abs(error[2])))
+        if transform is not None:
+            start, angles = apply_transform(transform, start, angles)
+        angle_error = angles[0] - _beam_angles(theta, beams)[0]
+        after.append((np.hypot(*(start - (x, y))), abs(angle_error)))
+
+    count = len(before)
+    return dict(
+        scans=count,
+        prepare_ms=1e3 * prepare_time / count,
+        match_ms=1e3 * match_time / count,
+        error_before=np.mean(before, axis=0),
+        error_after=np.mean(after, axis=0),
+    )
+
+
+def procedural_world(map_width, cell_size, obstacles=20, seed=0):
+    """
+    외벽과 임의의 직사각형/원 장애물로 된 점유 격자 (True: 장애물).
+    GridMap((0, 0), map_width)과 같은 배치로, 셀 (0, 0)의 월드좌표는 (-map_width/2, -map_width/2)
+    """
+    rng = np.random.default_rng(seed)
+    cells = int(round(map_width / cell_size))
+    world = np.zeros((cells, cells), dtype=bool)
+    world[[0, -1], :] = True
+    world[:, [0, -1]] = True
+    y, x = (np.mgrid[0:cells, 0:cells] + 0.5) * cell_size
+    for _ in range(obstacles):
+        cx, cy = rng.uniform(0, map_width, 2)
+        size = rng.uniform(0.3, 0.1 * map_width)
+        if rng.random() < 0.5:
+            world |= (np.abs(x - cx) < size / 2) & (np.abs(y - cy) < size * rng.uniform(0.2, 1) / 2)
+        else:
+            world |= np.hypot(x - cx, y - cy) < size / 2
+    return world
+
+
+def world_scans(world, cell_size, count, beams, max_range=10.0, seed=0):
+    """
+    world의 빈 셀에서 찍은 스캔 (poses (count, 3), ranges (count, beams)).
+    빔을 cell_size/2 간격으로 진행하며 처음 닿은 장애물까지의 거리, 없으면 max_range
+    """
+    rng = np.random.default_rng(seed)
+    half = world.shape[0] * cell_size / 2
+    free_rows, free_cols = np.nonzero(~world)
+    picked = rng.choice(free_rows.size, count)
+    poses = np.column_stack(
+        [
+            (free_cols[picked] + 0.5) * cell_size - half,
+            (free_rows[picked] + 0.5) * cell_size - half,
+            rng.uniform(-np.pi, np.pi, count),
+        ]
+    )
+    steps = np.arange(1, int(max_range / (cell_size / 2)) + 1) * (cell_size / 2)
+    ranges = np.empty((count, beams))
+    for index, (x, y, theta) in enumerate(poses):
+        angles = _beam_angles(theta, beams)[:, None]
+        cols = np.floor((x + np.cos(angles) * steps + half) / cell_size).astype(np.intp)
+        rows = np.floor((y + np.sin(angles) * steps + half) / cell_size).astype(np.intp)
+        inside = (rows >= 0) & (rows < world.shape[0]) & (cols >= 0) & (cols < world.shape[1])
+        hit = ~inside
+        hit[inside] = world[rows[inside], cols[inside]]
+        ranges[index] = np.where(hit.any(axis=1), steps[hit.argmax(axis=1)], max_range)
+    return poses, ranges
+
+
+def _timed(stage, repeat_memory):
+    """stage()의 실행시간(s)과 tracemalloc 최대 할당량(bytes, 측정하지 않으면 None)"""
+    started = time.perf_counter()
+    stage()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if repeat_memory:
+        # 할당 추적은 느리므로 시간 측정과 따로 한번 더 실행한다.
+        tracemalloc.start()
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_stages(map_width, cell_size, beams, scans=100, ray_scans=10, memory=True, seed=0):
+    """
+    절차적으로 만든 world의 스캔으로 단계별 처리량을 잰다.
+    파이썬 루프 경로(bresenham_line, update_cell, add_ray)는 ray_scans개만 사용한다.
+    결과: [{stage, scans, seconds, scans_per_s, ms_per_scan, peak_kb}, ..]
+    """
+    max_range = 10.0
+    world = procedural_world(map_width, cell_size, seed=seed)
+    poses, ranges = world_scans(world, cell_size, scans, beams, max_range, seed=seed)
+    ray_poses, ray_ranges = poses[:ray_scans], ranges[:ray_scans]
+
+    def new_map(cls=GridMap, **kwargs):
+        return cls((0, 0), None, cell_size=cell_size, map_width=map_width, **kwargs)
+
+    # add_ray가 bresenham_line에 넘기는 셀 좌표와 그 결과
+    def beam_cells():
+        gridmap = new_map()
+        for (x, y, theta), scan in zip(ray_poses, ray_ranges):
+            for angle, range_ in zip(_beam_angles(theta, beams), scan):
+                end = (x + range_ * np.cos(angle), y + range_ * np.sin(angle))
+                yield (
+                    [int(v) for v in gridmap.position_to_cell((x, y))],
+                    [int(v) for v in gridmap.position_to_cell(end)],
+                )
+
+    cells = list(beam_cells())
+    lines = [list(bresenham_line(start, end, 1)) for start, end in cells]
+
+    def run_bresenham():
+        for start, end in cells:
+            bresenham_line(start, end, 1)
+
+    def run_update_cell():
+        gridmap = new_map()
+        for points in lines:
+            gridmap.update_cell(points, 0.7)
+
+    def run_add_ray():
+        gridmap = new_map()
+        for (x, y, theta), scan in zip(ray_poses, ray_ranges):
+            for angle, range_ in zip(_beam_angles(theta, beams), scan):
+                gridmap.add_ray((x, y), angle, range_, 0.7)
+
+    def run_add_scan(cls=GridMap, **kwargs):
+        def run():
+            gridmap = new_map(cls, **kwargs)
+            for (x, y, theta), scan in zip(poses, ranges):
+                gridmap.add_scan((x, y), _beam_angles(theta, beams), scan, 0.7, max_range)
+
+        return run
+
+    # publish_gridmap의 변환 부분: 스캔마다 변경 영역을 발행 버퍼로 변환하고 패치 데이터를 만든다.
+    published = new_map()
+    for (x, y, theta), scan in zip(poses, ranges):
+        published.add_scan((x, y), _beam_angles(theta, beams), scan, 0.7, max_range)
+
+    def run_publish_update():
+        gridmap = new_map()
+        occ = np.empty(gridmap.grid.shape, dtype=np.int8)
+        scratch = np.empty(gridmap.grid.shape)
+        for (x, y, theta), scan in zip(poses, ranges):
+            gridmap.add_scan((x, y), _beam_angles(theta, beams), scan, 0.7, max_range)
+            row0, col0, row1, col1 = gridmap.pop_dirty()
+            window = (slice(row0, row1), slice(col0, col1))
+            to_occupancy(gridmap.grid[window], occ[window], scratch[window])
+            array.array("b", occ[window].tobytes())
+
+    def run_publish_full():
+        occ = np.empty(published.grid.shape, dtype=np.int8)
+        scratch = np.empty(published.grid.shape)
+        for _ in range(scans):
+            to_occupancy(published.grid, occ, scratch)
+            array.array("b", occ.tobytes())
+
+    stages = [
+        ("bresenham_line", run_bresenham, len(ray_poses)),
+        ("update_cell", run_update_cell, len(ray_poses)),
+        ("add_ray", run_add_ray, len(ray_poses)),
+        ("add_scan(dense)", run_add_scan(), scans),
+        ("add_scan(tiled)", run_add_scan(TiledGridMap), scans),
+        ("add_scan(tiled,int16)", run_add_scan(TiledGridMap, fixed_point=True), scans),
+        ("add_scan+publish(update)", run_publish_update, scans),
+        ("publish(full)", run_publish_full, scans),
+    ]
+    results = []
+    for name, stage, count in stages:
+        elapsed, peak = _timed(stage, memory)
+        results.append(
+            dict(
+                stage=name,
+                scans=count,
+                seconds=elapsed,
+                scans_per_s=count / elapsed,
+                ms_per_scan=1e3 * elapsed / count,
+                peak_kb=None if peak is None else peak / 1024,
+            )
+        )
+    return results
+
+
+def run_suite(opts):
+    """설정 조합별 bench_stages 결과를 모아 (JSON으로 쓸) dict로 반환한다."""
+    results = []
+    for map_width in opts.widths:
+        for cell_size in opts.cell_sizes:
+            for beams in opts.beam_counts:
+                config = dict(map_width=map_width, cell_size=cell_size, beams=beams)
+                print(f"map_width={map_width} cell_size={cell_size} beams={beams}")
+                for result in bench_stages(
+                    map_width,
+                    cell_size,
+                    beams,
+                    scans=opts.scans,
+                    ray_scans=opts.ray_scans,
+                    memory=not opts.no_memory,
+                ):
+                    peak = result["peak_kb"]
+                    print(
+                        f"  {result['stage']:<26} {result['scans_per_s']:10.1f} scans/s "
+                        f"{result['ms_per_scan']:8.2f} ms/scan"
+                        + ("" if peak is None else f" peak {peak:9.1f} KB")
+                    )
+                    results.append(dict(config, **result))
+    return dict(
+        meta=dict(
+            created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            python=sys.version.split()[0],
+            numpy=np.__version__,
+            machine=platform.machine(),
+            processor=platform.processor(),
+            scans=opts.scans,
+            ray_scans=opts.ray_scans,
+        ),
+        results=results,
+    )
+
+
+def compare_results(current, baseline, threshold=0.8):
+    """
+    같은 (map_width, cell_size, beams, stage) 끼리 처리량을 비교해 출력한다.
+    baseline 대비 threshold배 미만으로 느려진 항목 수를 반환한다.
+    """
+
+    def key(result):
+        return (result["map_width"], result["cell_size"], result["beams"], result["stage"])
+
+    base = {key(result): result for result in baseline["results"]}
+    regressions = 0
+    for result in current["results"]:
+        old = base.get(key(result))
+        if old is None:
+            continue
+        ratio = result["scans_per_s"] / old["scans_per_s"]
+        mark = ""
+        if ratio < threshold:
+            regressions += 1
+            mark = " REGRESSION"
+        print(f"{str(key(result)):<60} x{ratio:6.2f}{mark}")
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--beams", type=int, default=65)
+    parser.add_argument("--cell-size", type=float, default=0.1)
+    parser.add_argument("--map-width", type=float, default=10.0)
+    parser.add_argument("--table-size", type=int, default=16384)
+    parser.add_argument(
+        "--log",
+        nargs=2,
+        metavar=("POSE_FILE", "MEASUREMENT_FILE"),
+        help="recorded pose.txt / measurements.txt instead of synthetic scans",
+    )
+    suite = parser.add_argument_group("suite", "stage benchmarks on procedural worlds")
+    suite.add_argument("--suite", action="store_true")
+    suite.add_argument("--widths", type=float, nargs="+", default=[20.0, 40.0])
+    suite.add_argument("--cell-sizes", type=float, nargs="+", default=[0.1, 0.05])
+    suite.add_argument("--beam-counts", type=int, nargs="+", default=[65, 360])
+    suite.add_argument("--ray-scans", type=int, default=10)
+    suite.add_argument("--no-memory", action="store_true", help="skip tracemalloc pass")
+    suite.add_argument("-o", "--output", help="write results as JSON")
+    suite.add_argument("--compare", help="baseline JSON from a previous --output")
+    suite.add_argument("--threshold", type=float, default=0.8)
+    opts = parser.parse_args(args)
+
+    if opts.suite:
+        results = run_suite(opts)
+        if opts.output:
+            with open(opts.output, "w") as f:
+                json.dump(results, f, indent=1)
+        if opts.compare:
+            with open(opts.compare) as f:
+                baseline = json.load(f)
+            if compare_results(results, baseline, opts.threshold):
+                sys.exit(1)
+        return
+
+    if opts.log:
+        _, poses, ranges = load_text_log(*opts.log)
+        # add_ray가 처리할 수 있도록 모든 빔이 들어가는 크기로 맵을 잡는다.
+        reach = np.abs(poses[:, :2]).max() + ranges[np.isfinite(ranges)].max()
+        opts.map_width = max(opts.map_width, float(np.ceil(2 * reach + 1)))
+        opts.scans, opts.beams = ranges.shape
+    else:
+        poses, ranges = synthetic_scans(opts.scans, opts.beams, opts.map_width)
+    results, info = bench_ray_trace(
+        poses, ranges, opts.cell_size, opts.map_width, opts.table_size
+    )
+
+    print(
+        f"scans={opts.scans} beams={opts.beams} "
+        f"cell_size={opts.cell_size} map_width={opts.map_width}"
+    )
+    for name, elapsed in results.items():
+        print(f"{name:<28} {opts.scans / elapsed:10.1f} scans/s")
+    print(
+        f"ray_table hits={info['hits']} misses={info['misses']} "
+        f"size={info['currsize']}"
+    )
+
+    if opts.log:
+        # 기록된 스캔으로만 의미가 있다. (임의 스캔은 맵과 일관성이 없음)
+        match = bench_scan_matcher(poses, ranges, opts.cell_size)
+        print(
+            f"scan_matcher {match['scans']} scans "
+            f"prepare {match['prepare_ms']:.2f}ms match {match['match_ms']:.2f}ms "
+            f"({1e3 / (match['prepare_ms'] + match['match_ms']):.1f} scans/s)"
+        )
+        print(
+            f"  error (m, rad) before {np.round(match['error_before'], 3)} "
+            f"after {np.round(match['error_after'], 3)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
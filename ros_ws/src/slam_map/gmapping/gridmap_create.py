@@ -8,24 +8,72 @@ from sensor_msgs.msg import LaserScan
 from sensor_msgs.msg import Image
 from geometry_msgs.msg import TwistStamped
 from nav_msgs.msg import OccupancyGrid
+from nav_msgs.srv import GetMap
+from std_msgs.msg import Header
+from map_msgs.msg import OccupancyGridUpdate
+from std_srvs.srv import Trigger
 import tf2_ros
-from gmapping.utils_lib.gridmap import GridMap
-import math
+from gmapping.utils_lib.distance_layer import DistanceLayer
+from gmapping.utils_lib.gridmap import to_occupancy
+from gmapping.utils_lib.map_pyramid import MapPyramid
+from gmapping.utils_lib.tiled_gridmap import TILE_SIZE, TiledGridMap
+from gmapping.utils_lib.map_snapshot import SnapshotWriter, patch_frame_id
+from gmapping.utils_lib.map_state import load_map_state, pack_map_state, write_map_state
+from gmapping.utils_lib.particle_filter import ParticleFilterSLAM
+from gmapping.utils_lib.pose_buffer import PoseBuffer
+from gmapping.utils_lib.scan_matcher import CorrelativeScanMatcher
+from gmapping.utils_lib.scan_pipeline import ScanIntegrator, StageStats
+from gmapping.utils_lib.scan_log import ScanLogWriter
+import array
 import numpy as np
 import os
+import time
+
+# 미검출(range_max) 빔을 빈 공간으로 갱신하는 최대 거리(m)
+MAX_FREE_RANGE = 10.0
 
 
 class GridmapPubNode(Node):
-    def __init__(self, scan_topic, world_frame_id, cell_size):
+    def __init__(self, scan_topic, world_frame_id, cell_size, full_map_period=5.0):
         super().__init__("gridmap_make_node")
 
         self.world_frame_id = world_frame_id
         self.occ_grid_pub = self.create_publisher(
             OccupancyGrid, "/occ_grid_map", qos_profile=1
         )
+        # 변경된 영역만 담은 패치. 전체 맵은 주기적으로, 그리고 구독자가 늘 때 발행한다.
+        self.occ_grid_update_pub = self.create_publisher(
+            OccupancyGridUpdate, "/occ_grid_map_updates", qos_profile=10
+        )
         self.occ_grid_map_img = self.create_publisher(
             Image, "/occ_grid_map_img", qos_profile=1
         )
+        # 저해상도 맵 (0.1m 기준 5배 => 0.5m, 10배 => 1.0m), /occ_grid_map_level1, 2..
+        self.pyramid_factors = tuple(
+            self.declare_parameter("pyramid_factors", [5, 10]).value
+        )
+        # mapping: odometry pose로 적분, rbpf: 입자 필터 SLAM (입자마다 맵을 가짐)
+        self.slam_mode = self.declare_parameter("slam_mode", "mapping").value
+        self.particles = self.declare_parameter("particles", 30).value
+        # int16 고정소수점 로그확율 맵 (메모리 1/4, 발행은 변환 테이블 사용)
+        # rbpf는 입자마다 맵을 가지므로 기본으로 켠다.
+        self.fixed_point = self.declare_parameter("fixed_point", self.slam_mode == "rbpf").value
+        # 적분 전에 스캔을 맵에 매칭해 odometry drift를 보정한다.
+        self.scan_matching = self.declare_parameter("scan_matching", False).value
+        # 장애물까지 거리 레이어 (0이면 사용하지 않음, m)
+        self.distance_max = self.declare_parameter("distance_max", 0.0).value
+        self.distance_pub = None
+        self.distance_subscribers = 0
+        if self.distance_max > 0:
+            # 장애물 근접도 100(장애물) ~ 0(distance_max 이상)
+            self.distance_pub = self.create_publisher(
+                OccupancyGrid, "/occ_grid_map_distance", qos_profile=1
+            )
+        self.level_pubs = [
+            self.create_publisher(OccupancyGrid, f"/occ_grid_map_level{level}", qos_profile=1)
+            for level in range(1, len(self.pyramid_factors) + 1)
+        ]
+        self.level_subscribers = [0] * len(self.level_pubs)
         self.create_subscription(
             TwistStamped,
             "unity_tf",
@@ -36,195 +84,540 @@ class GridmapPubNode(Node):
             LaserScan, scan_topic, self.receive_scan, qos_profile=10
         )
 
-        self.pub_timer = self.create_timer(0.2, self.publish_gridmap)
+        # 발행 주기(s). 구독자가 없으면 변환/발행을 생략한다.
+        self.publish_period = self.declare_parameter("publish_period", 0.2).value
+        self.image_period = self.declare_parameter("image_period", 1.0).value
+        self.pub_timer = self.create_timer(self.publish_period, self.publish_gridmap)
+        self.stats_timer = self.create_timer(10.0, self.log_stats)
 
         self.tfBuffer = tf2_ros.Buffer()
         self.listener = tf2_ros.TransformListener(self.tfBuffer, self, qos=10)
         self.cell_size = cell_size
         self.nanoseconds = 0
-        self.gridmap = None
+        # 맵 상태 디렉토리. 지정했을 때만 불러와서 시작하고, 종료 시와 save_map 서비스로 저장한다.
+        # 비우면(기본) 빈 맵에서 시작하고 저장하지 않는다.
+        self.map_file = self.declare_parameter("map_file", "").value
+        self.gridmap = self.load_gridmap()
+        # 스캔이 갱신한 타일만 저해상도 레벨로 축소한다.
+        self.pyramid = MapPyramid(self.gridmap, factors=self.pyramid_factors)
+        # 점유가 바뀐 타일 주변만 거리를 다시 계산한다.
+        self.distance_layer = None
+        if self.distance_max > 0:
+            self.distance_layer = DistanceLayer(self.gridmap, max_distance=self.distance_max)
+        if self.gridmap.tiles:
+            # 불러온 맵 전체를 레이어에 반영한다.
+            self.gridmap.mark_region(*self.gridmap.bounds())
+        self.particle_filter = None
+        if self.slam_mode == "rbpf":
+            # 발행용 gridmap은 가장 가중치가 높은 입자의 타일을 가리킨다.
+            self.particle_filter = ParticleFilterSLAM(
+                particles=self.particles,
+                cell_size=0.1,
+                map_width=10,
+                fixed_point=self.fixed_point,
+                initial_map=self.gridmap if self.gridmap.tiles else None,
+            )
+        # 콜백은 스캔을 큐에 넣기만 하고, 적분은 별도 스레드에서 배치로 처리한다.
+        self.integrator = ScanIntegrator(
+            self.gridmap,
+            p=0.7,
+            batch_size=8,
+            max_queue=64,
+            matcher=CorrelativeScanMatcher(cell_size) if self.scan_matching else None,
+            match_radius=MAX_FREE_RANGE + 0.5,
+            particle_filter=self.particle_filter,
+        )
+        self.integrator.start()
+        self.save_service = self.create_service(Trigger, "save_map", self.save_map_callback)
+        # 맵 버전이 같으면 캐시한 메시지를 돌려주는 GetMap 서비스
+        self.map_service = self.create_service(GetMap, "get_map", self.get_map_callback)
+        self.map_cache = None
+        self.map_cache_version = -1
+        self.map_cache_hits = 0
+        self.map_cache_misses = 0
+        self.publish_time = StageStats()
         self.odometry = None
+        # 스캔 시각의 pose를 보간하기 위한 odometry 기록.
+        # /unity_tf와 스캔 header.stamp는 같은 시계여야 한다. stamp가 0이면 수신 시각을 쓰고,
+        # 두 시각이 pose_clock_tolerance(s) 이상 어긋나면 보간 대신 최신 pose를 쓴다.
+        self.pose_buffer = PoseBuffer(capacity=512, max_extrapolation=0.1)
+        self.pose_clock_tolerance = self.declare_parameter("pose_clock_tolerance", 1.0).value
         self.image_msg = Image()
+        # 마지막으로 발행한 맵 버전과 재사용하는 메시지 버퍼
+        self.published_version = -1
+        self.full_map_period = full_map_period
+        self.full_map_version = -1
+        self.full_map_time = self.get_clock().now()
+        self.map_subscribers = 0
+        self.publish_skipped = 0
+        self.image_time = self.get_clock().now()
+        self.snapshot_time = self.get_clock().now()
+        self.occ_data = None
+        self.occ_view = None
+        self.occ_scratch = None
+        # 발행 중인 맵 영역 (row0, col0, row1, col1), 탐색 영역이 넓어지면 바뀐다.
+        self.occ_bounds = None
         
         self.prepare_log_file()
         self.get_logger().info(f"Gridmap node has started: {world_frame_id}")
 
+    def load_gridmap(self):
+        """map_file이 있으면 불러오고(memmap), 없으면 빈 맵을 만든다."""
+        if self.map_file and os.path.exists(os.path.join(self.map_file, "meta.json")):
+            try:
+                # 해상도/타일 크기/고정소수점이 다르면 불러오지 않는다.
+                gridmap = load_map_state(
+                    self.map_file,
+                    logger=self.get_logger(),
+                    cell_size=self.cell_size,
+                    tile_size=TILE_SIZE,
+                    fixed_point=self.fixed_point,
+                )
+                self.get_logger().info(
+                    f"map loaded: {self.map_file} version {gridmap.version}, "
+                    f"{len(gridmap.tiles)} tiles"
+                )
+                return gridmap
+            except (OSError, ValueError, KeyError) as e:
+                self.get_logger().warn(f"cannot load map {self.map_file}, starting empty: {e}")
+
+        # 탐색한 영역만큼 타일을 할당하며 맵이 커진다. (초기 10m x 10m)
+        return TiledGridMap(
+            center=(0,0),
+            logger=self.get_logger(),
+            cell_size=self.cell_size,
+            map_width=10,
+            fixed_point=self.fixed_point,
+        )
+
+    def save_map_state(self):
+        """맵 상태를 map_file에 저장하고 타일 파일 경로를 반환한다."""
+        # 복사만 lock 안에서, 파일 쓰기는 밖에서 한다.
+        with self.integrator.lock:
+            meta, tiles = pack_map_state(self.gridmap)
+        return write_map_state(self.map_file, meta, tiles)
+
+    def save_map_callback(self, request, response):
+        if not self.map_file:
+            response.success = False
+            response.message = "map_file parameter is not set"
+            return response
+        try:
+            path = self.save_map_state()
+            response.success = True
+            response.message = path
+        except OSError as e:
+            response.success = False
+            response.message = str(e)
+        return response
+
     def prepare_log_file(self):
         pkg_base = get_package_share_directory("gmapping")
-        self.measurement_file = os.path.join(pkg_base, "resource", "measurements.txt")
-        if os.path.exists(self.measurement_file):
-            os.remove(self.measurement_file)
-
-        self.pose_file = os.path.join(pkg_base, "resource", "pose.txt")
-        if os.path.exists(self.pose_file):
-            os.remove(self.pose_file)
+        # pose/measurement 바이너리 로그 (record_log 파라미터로 기록)
+        self.record_log = self.declare_parameter("record_log", False).value
+        self.scan_log_dir = os.path.join(pkg_base, "resource", "scan_log")
+        self.scan_logger = None
 
-        self.occ_map_file = os.path.join(pkg_base, "resource", "occ_map.txt")
+        # 맵 스냅샷은 백그라운드에서 1초에 한번 이하로 기록한다.
+        self.occ_map_file = os.path.join(pkg_base, "resource", "occ_map.bin")
+        self.snapshot_period = 1.0
+        self.snapshot_writer = SnapshotWriter(self.occ_map_file, min_interval=self.snapshot_period)
+        self.snapshot_writer.start()
 
     def odom_callback(self, msg):
         self.odometry = msg
+        self.pose_buffer.add(
+            self.stamp_nanoseconds(msg.header.stamp),
+            msg.twist.linear.x,
+            msg.twist.linear.y,
+            msg.twist.angular.z,
+        )
 
     def lidar_callback(self, msg):
         self.laser_scan = msg
 
+    def stamp_nanoseconds(self, stamp):
+        """header.stamp(ns). 브리지가 stamp를 채우지 않으면(0) 수신 시각"""
+        nanoseconds = Time.from_msg(stamp).nanoseconds
+        return nanoseconds if nanoseconds else self.get_clock().now().nanoseconds
+
     def receive_scan(self, scan):
 
-        time = Time.from_msg(scan.header.stamp)
+        scan_time = self.stamp_nanoseconds(scan.header.stamp)
         # Run if only laser scan from simulation is updated
         # 0.2초단위로 수신
-        if (
-            self.odometry == None
-            or self.odometry.twist.linear.x == None
-            or time.nanoseconds <= self.nanoseconds
-        ):
+        if scan_time <= self.nanoseconds:
             return
 
-        self.nanoseconds = time.nanoseconds
-
-        def euler_from_quaternion(x, y, z, w) -> tuple:
-            """
-            Convert a quaternion into euler angles (roll, pitch, yaw)
-            roll is rotation around x in radians (counterclockwise)
-            pitch is rotation around y in radians (counterclockwise)
-            yaw is rotation around z in radians (counterclockwise)
-            """
-            t0 = +2.0 * (w * x + y * z)
-            t1 = +1.0 - 2.0 * (x * x + y * y)
-            roll_x = math.atan2(t0, t1)
-
-            t2 = +2.0 * (w * y - z * x)
-            t2 = +1.0 if t2 > +1.0 else t2
-            t2 = -1.0 if t2 < -1.0 else t2
-            pitch_y = math.asin(t2)
-
-            t3 = +2.0 * (w * z + x * y)
-            t4 = +1.0 - 2.0 * (y * y + z * z)
-            yaw_z = math.atan2(t3, t4)
+        # 빔별 측정 시각의 pose (time_increment가 0이면 스캔 시각 하나)
+        if scan.time_increment > 0:
+            stamps = scan_time + (
+                np.arange(len(scan.ranges)) * scan.time_increment * 1e9
+            ).astype(np.int64)
+        else:
+            stamps = scan_time
+        poses = self.pose_buffer.lookup(stamps)
+        if poses is None and self.pose_buffer.clock_mismatch(stamps, self.pose_clock_tolerance):
+            # odometry와 스캔의 시계가 다르면 보간할 수 없으므로 최신 pose로 적분한다.
+            poses = self.pose_buffer.latest_pose()
+            self.get_logger().warn(
+                f"scan stamp {scan_time} is not on the odometry clock "
+                f"[{self.pose_buffer.oldest()}, {self.pose_buffer.latest()}], "
+                f"using the latest pose",
+                throttle_duration_sec=30.0,
+            )
+        if poses is None:
+            # 버퍼보다 오래된 스캔, 또는 아직 odometry가 도착하지 않은 스캔은 버린다.
+            self.get_logger().warn(
+                f"drop scan {scan_time}: pose buffer "
+                f"[{self.pose_buffer.oldest()}, {self.pose_buffer.latest()}]",
+                throttle_duration_sec=5.0,
+            )
+            return
 
-            return roll_x, pitch_y, yaw_z  # in radians
+        self.nanoseconds = scan_time
+
+        # 스캔 시각으로 보간한 pose, 빔별 pose이면 (n, 2) 위치와 (n,) 각도
+        current_pos = poses[..., :2]
+        theta = poses[..., 2]
+
+        # ranges는 65개, 모든 빔을 한번에 적분한다.
+        yaw_rays = theta + scan.angle_min + np.arange(len(scan.ranges)) * scan.angle_increment
+        # 위치, 각도, 길이 => 적분 스레드의 큐
+        # 미검출 빔은 MAX_FREE_RANGE까지만 빈 셀로 갱신한다. (먼 곳에 타일이 생기지 않도록)
+        self.integrator.submit(
+            current_pos,
+            yaw_rays,
+            scan.ranges,
+            max_range=min(scan.range_max, MAX_FREE_RANGE),
+        )
 
-        try:
-            # if self.tfBuffer.can_transform(self.world_frame_id, scan.header.frame_id, scan.header.stamp):
-            #     trans = self.tfBuffer.lookup_transform(self.world_frame_id, scan.header.frame_id, scan.header.stamp)
-            # else:            
-            #     now = self.get_clock().now().to_msg()
-            #     trans = self.tfBuffer.lookup_transform(self.world_frame_id, scan.header.frame_id, now)
-
-            # __, __, yaw = euler_from_quaternion(
-            #     trans.transform.rotation.x,
-            #     trans.transform.rotation.y,
-            #     trans.transform.rotation.z,
-            #     trans.transform.rotation.w,
-            # )
-            # x = self.sub_odom.linear.x
-            # y = self.sub_odom.linear.y
-            # current_pos = (self.odometry.twist.linear.x+5.0, 5.0-self.odometry.twist.linear.y)
-            # 좌표를 +축으로 이동. (-5 ~ 5 ) ==> (0, 10)
-            current_pos = (self.odometry.twist.linear.x, self.odometry.twist.linear.y)
-            theta = self.odometry.twist.angular.z
-            # if (self.nanoseconds // 1_000_000_000) % 3 == 0:
-            #     self.get_logger().info(f"gridmap current_pos: {current_pos}, angular: {theta}")
-
-
-            if self.gridmap is None:
-                self.gridmap = GridMap(
-                    center=(0,0),
-                    logger=self.get_logger(),
-                    cell_size=0.1,
-                    map_width=10,
-                )
+        # pose와 measurement를 저장한다.
+        if self.record_log:
+            self.save_pose_measurement(scan, poses.reshape(-1, 3)[0])
 
-            # ranges는 65개
-            for i, range_ in enumerate(scan.ranges):
-                yaw_ray = (theta + scan.angle_min + i * scan.angle_increment)
-                # self.get_logger().info(f"scan: {range_}, yaw_ray: {yaw_ray}")
-                # 위치, 각도, 길이, threathold확율값
-                self.gridmap.add_ray(current_pos, yaw_ray, range_, 0.7)
-
-            # pose와 measurement를 저장한다.
-            # self.save_pose_measurement(scan)
-
-        except (
-            tf2_ros.LookupException,
-            tf2_ros.ConnectivityException,
-            tf2_ros.ExtrapolationException,
-        ) as e:
-            self.get_logger().info(f"tf2 exception: {e}")
-            return
+    # 위치와 센서측정거리를 로그에 추가한다. (파일 기록은 백그라운드)
+    def save_pose_measurement(self, scan, pose):
+        if self.scan_logger is None:
+            self.scan_logger = ScanLogWriter(
+                self.scan_log_dir,
+                len(scan.ranges),
+                scan.angle_min,
+                scan.angle_increment,
+                range_max=scan.range_max,
+            )
+            self.scan_logger.start()
 
-    # 위치와 센서측정거리를 파일로 저장한다.
-    def save_pose_measurement(self, scan):
-        with open(self.measurement_file, "a") as f:
-            f.write(f"{self.nanoseconds}")
-            for distance in scan.ranges:
-                f.write(f",{distance:0.3f}")
-            f.write("\n")
-
-        with open(self.pose_file, "a") as f:
-            f.write(f"{self.nanoseconds}")
-            f.write(f",{self.odometry.twist.linear.x}")
-            f.write(f",{self.odometry.twist.linear.y}")
-            f.write(f",{self.odometry.twist.angular.z}")
-            f.write("\n")
-        
-        # self.get_logger().info(f"saved")
+        self.scan_logger.append(self.nanoseconds, pose, scan.ranges)
 
     """주기적으로 작성 중인 맵을 발행"""
 
     def publish_gridmap(self, event=None):
+        now = self.get_clock().now()
+        # 구독자가 없고 스냅샷 파일을 쓸 때도 아니면 맵을 변환하지 않는다.
+        # (변경 영역은 gridmap.dirty에 계속 누적되어 다음 발행 때 반영된다.)
+        snapshot_due = (now - self.snapshot_time).nanoseconds >= self.snapshot_period * 1e9
+        if not (snapshot_due or self.has_subscribers()):
+            self.publish_skipped += 1
+            return
 
-        if self.gridmap is None:
+        started = time.perf_counter()
+        # 적분 스레드가 맵을 갱신하지 못하도록 막고 변경 영역만 발행 버퍼로 복사한다.
+        # 전체 맵과 패치는 다른 토픽이라 도착 순서가 보장되지 않으므로, 같은 lock 안에서
+        # 찍은 stamp(맵 버전 순서)로 구독 측이 전체 맵보다 이른 패치를 버린다.
+        with self.integrator.lock:
+            snapshot = self.snapshot_map()
+            stamp = self.get_clock().now().to_msg()
+        header = Header(frame_id=self.world_frame_id, stamp=stamp)
+        if snapshot is None:
+            # 맵이 그대로여도 새로 구독한 레벨/거리 토픽에는 발행한다.
+            self.publish_levels(header, False)
+            self.publish_distance(header, False)
+            if snapshot_due:
+                # 바뀐 것이 없으면 다음 스냅샷 주기까지 확인하지 않는다.
+                self.snapshot_time = now
             return
+        version, bounds, region, full_map_due, new_subscriber = snapshot
+        row0, col0 = bounds[:2]
+
+        # Publishing the message
+        if full_map_due or new_subscriber:
+            if self.map_subscribers:
+                # map data is the occupancy grid map
+                self.occ_grid_pub.publish(
+                    self.make_occupancy_grid(
+                        header,
+                        self.occ_data,
+                        self.cell_size,
+                        self.gridmap.cell_to_position(row0, col0),
+                        self.occ_view.shape,
+                    )
+                )
+            self.full_map_version = version
+            self.full_map_time = now
+        elif (
+            region is not None
+            and version > self.full_map_version
+            and self.occ_grid_update_pub.get_subscription_count()
+        ):
+            # 패치는 마지막 전체 맵 이후의 변경만 담는다.
+            self.publish_update(header, region)
+        self.published_version = version
+        self.publish_levels(header, full_map_due)
+        self.publish_distance(header, full_map_due)
+
+        if snapshot_due:
+            self.save_map(bounds, version, now)
+        self.publish_image(now)
+        self.publish_time.add(time.perf_counter() - started)
+
+    def has_subscribers(self):
+        publishers = [
+            self.occ_grid_pub,
+            self.occ_grid_update_pub,
+            self.occ_grid_map_img,
+            *self.level_pubs,
+        ]
+        if self.distance_pub is not None:
+            publishers.append(self.distance_pub)
+        return any(publisher.get_subscription_count() for publisher in publishers)
+
+    def make_occupancy_grid(self, header, data, resolution, origin, shape):
+        occ_grid = OccupancyGrid()
+        occ_grid.header = header
+        # resolution means the size of each cell
+        occ_grid.info.resolution = resolution
+        occ_grid.info.width = shape[1]
+        occ_grid.info.height = shape[0]
+        occ_grid.info.origin.position.x = origin[0]
+        occ_grid.info.origin.position.y = origin[1]
+        occ_grid.info.origin.orientation.w = 1.0
+        occ_grid.data = data
+        return occ_grid
+
+    def snapshot_map(self):
+        """
+        integrator.lock 안에서 호출. 변경 영역을 발행 버퍼(occ_view)에 반영하고
+        (version, bounds, 버퍼 기준 변경 영역, 전체맵 발행여부, 새 구독자 여부)를 반환한다.
+        바뀐 것이 없으면 None
+        """
+        # 새 구독자가 있거나 주기가 지나면 전체 맵, 그 외에는 변경 영역만 발행한다.
+        now = self.get_clock().now()
+        subscribers = self.occ_grid_pub.get_subscription_count()
+        new_subscriber = subscribers > self.map_subscribers
+        self.map_subscribers = subscribers
+        full_map_due = self.gridmap.version != self.full_map_version and (
+            (now - self.full_map_time).nanoseconds >= self.full_map_period * 1e9
+        )
+
+        # 마지막 발행 이후 스캔으로 바뀐 것이 없으면 발행/저장을 생략한다.
+        changed = self.gridmap.version != self.published_version
+        if not (changed or new_subscriber):
+            return None
         # 초기 0으로 설정되었다가,
         # 빈 셀인경우 0.847씩 차감하고, 대상 셀인 경우, 0.847씩 가산한다. (0.8은 70%에 대한 로그 확율치)
         # 셀이 갱신되어 감에 따라, -6.91이 되어 가거나 +6.91이 되어간다.
         # 최소값 -6.91을 0으로 변환. 0 ~ 13.82이 됨.
         # 13.82*7.23 = 100 => 0~100% 확율로 변환 50%이면 미 확인셀이되는 셈.
-        # Reshape and scale the Gridmap_ 한행으로 변환, 각 셀은 0 ~ 100의 값을 갖는다.
-        reshaped_gridmap = (self.gridmap.get_map().reshape((1, -1))[0] + 6.91) * 7.23
+        # 각 셀은 0 ~ 100의 값을 갖고, 초기값 0인 상태(비탐색 지역)는 -1
+        bounds = self.gridmap.bounds()
+        region = self.gridmap.pop_dirty()
+        row0, col0, row1, col1 = bounds
+        shape = (row1 - row0, col1 - col0)
+        if self.occ_data is None or bounds != self.occ_bounds:
+            # 맵 영역이 넓어지면 버퍼를 새로 잡고 전체 맵을 발행한다.
+            # 메시지 데이터(array)를 numpy로 직접 쓰기 위한 버퍼
+            self.occ_data = array.array("b", bytes(shape[0] * shape[1]))
+            self.occ_view = np.frombuffer(self.occ_data, dtype=np.int8).reshape(shape)
+            self.occ_scratch = np.empty(shape, dtype=np.float64)
+            to_occupancy(self.gridmap.read_region(*bounds), self.occ_view, self.occ_scratch)
+            self.occ_bounds = bounds
+            full_map_due = True
+            region = None
+        elif region is not None:
+            # 버퍼는 변경 영역만 다시 변환한다. (dirty 영역은 맵 셀 좌표 => 버퍼 좌표)
+            grid = self.gridmap.read_region(*region)
+            region = (
+                region[0] - row0,
+                region[1] - col0,
+                region[2] - row0,
+                region[3] - col0,
+            )
+            window = (slice(region[0], region[2]), slice(region[1], region[3]))
+            to_occupancy(grid, self.occ_view[window], self.occ_scratch[window])
+
+        return self.gridmap.version, bounds, region, full_map_due, new_subscriber
+
+    def publish_update(self, header, region):
+        row0, col0, row1, col1 = region
+        update = OccupancyGridUpdate()
+        # 구독 측이 영역이 다른(아직 받지 못한) 전체 맵 기준의 패치를 버릴 수 있게 맵 영역을 붙인다.
+        origin = self.gridmap.cell_to_position(self.occ_bounds[0], self.occ_bounds[1])
+        height, width = self.occ_view.shape
+        frame_id = patch_frame_id(header.frame_id, width, height, origin)
+        update.header = Header(frame_id=frame_id, stamp=header.stamp)
+        update.x = col0
+        update.y = row0
+        update.width = col1 - col0
+        update.height = row1 - row0
+        update.data = array.array(
+            "b", self.occ_view[row0:row1, col0:col1].tobytes()
+        )
+        self.occ_grid_update_pub.publish(update)
+
+    def publish_levels(self, header, full_map_due):
+        """구독자가 있는 저해상도 레벨을 전체 맵 주기(또는 새 구독자)에 맞춰 발행한다."""
+        for level, publisher in enumerate(self.level_pubs, start=1):
+            subscribers = publisher.get_subscription_count()
+            new_subscriber = subscribers > self.level_subscribers[level - 1]
+            self.level_subscribers[level - 1] = subscribers
+            if subscribers == 0 or not (full_map_due or new_subscriber):
+                continue
+            publisher.publish(self.get_level_map(level, header))
+
+    def get_level_map(self, level, header):
+        """피라미드 레벨(0은 원본)을 OccupancyGrid로 만든다."""
+        with self.integrator.lock:
+            grid, (resolution, origin) = self.pyramid.get_level(level)
+        data = to_occupancy(grid, np.empty(grid.shape, dtype=np.int8))
+        return self.make_occupancy_grid(
+            header, array.array("b", data.tobytes()), resolution, origin, grid.shape
+        )
 
-        # Unexplored cells are set to negative 1
-        # 초기값 0인 상태: 비탐색 지역
-        for index, key in enumerate(reshaped_gridmap):
-            if key == 6.91 * 7.23:
-                reshaped_gridmap[index] = -1
+    def get_distance(self):
+        """거리 레이어 스냅샷 (거리 배열(m), (resolution, origin)). 레이어가 없으면 None"""
+        if self.distance_layer is None:
+            return None
+        with self.integrator.lock:
+            return self.distance_layer.snapshot()
 
-        # 그리드맵을 작성
-        occ_grid = OccupancyGrid()
-        occ_grid.header.frame_id = self.world_frame_id
-        occ_grid.header.stamp = self.get_clock().now().to_msg()
-        # resolution means the size of each cell
-        occ_grid.info.resolution = self.cell_size
-        occ_grid.info.width = int(self.gridmap.map_width[0] / self.cell_size)
-        occ_grid.info.height = int(self.gridmap.map_width[1] / self.cell_size)
-        occ_grid.info.origin.position.x = self.gridmap.origin[0]
-        occ_grid.info.origin.position.y = self.gridmap.origin[1]
-        occ_grid.info.origin.position.z = 0.0
-        occ_grid.info.origin.orientation.x = 0.0
-        occ_grid.info.origin.orientation.y = 0.0
-        occ_grid.info.origin.orientation.z = 0.0
-        occ_grid.info.origin.orientation.w = 1.0
-        # map data is the occupancy grid map
-        occ_grid.data = reshaped_gridmap.astype(dtype=np.int8).flatten().tolist()
+    def publish_distance(self, header, full_map_due):
+        """구독자가 있으면 거리 레이어를 근접도 맵으로 발행한다."""
+        if self.distance_pub is None:
+            return
+        subscribers = self.distance_pub.get_subscription_count()
+        new_subscriber = subscribers > self.distance_subscribers
+        self.distance_subscribers = subscribers
+        if subscribers == 0 or not (full_map_due or new_subscriber):
+            return
 
-        # Publishing the message
-        self.occ_grid_pub.publish(occ_grid)
+        distance, (resolution, origin) = self.get_distance()
+        proximity = np.rint(100.0 * (1.0 - distance / self.distance_max)).astype(np.int8)
+        self.distance_pub.publish(
+            self.make_occupancy_grid(
+                header, array.array("b", proximity.tobytes()), resolution, origin, distance.shape
+            )
+        )
 
-        self.save_map(occ_grid)
+    def save_map(self, bounds, version, now):
+        self.snapshot_writer.submit(
+            self.occ_view,
+            self.cell_size,
+            self.gridmap.cell_to_position(bounds[0], bounds[1]),
+            version=version,
+            stamp=now.nanoseconds,
+        )
+        self.snapshot_time = now
 
-    def save_map(self, grid):
-        data_str=' '.join(str(x) for x in grid.data)
-        with open(self.occ_map_file, "w") as f:
-            f.write(data_str)
+    def publish_image(self, now):
+        """구독자가 있을 때 image_period 간격으로 발행한다."""
+        if self.occ_grid_map_img.get_subscription_count() == 0:
+            return
+        if (now - self.image_time).nanoseconds < self.image_period * 1e9:
+            return
+        self.image_time = now
+        height, width = self.occ_view.shape
 
-        self.image_msg.data = bytes(grid.data)  # 데이터 타입 변환
-        self.image_msg.height = grid.info.height
-        self.image_msg.width = grid.info.width
+        # -1(미탐색)은 255로 표시된다.
+        self.image_msg.data = array.array("B", self.occ_data.tobytes())
+        self.image_msg.height = height
+        self.image_msg.width = width
         self.image_msg.encoding = "mono8"  # 단일 채널 그레이스케일 이미지
-        self.image_msg.step = grid.info.width  # 너비만큼의 바이트 수
+        self.image_msg.step = width  # 너비만큼의 바이트 수
 
         self.occ_grid_map_img.publish(self.image_msg)
 
+    def get_map_callback(self, request, response):
+        """
+        GetMap 서비스. 맵 버전이 바뀌었을 때만 메시지를 새로 만들고,
+        그 외에는 캐시한 메시지를 그대로 돌려준다.
+        """
+        with self.integrator.lock:
+            version = self.gridmap.version
+            if version != self.map_cache_version:
+                bounds = self.gridmap.bounds()
+                grid = self.gridmap.read_region(*bounds)
+                data = to_occupancy(grid, np.empty(grid.shape, dtype=np.int8))
+                origin = self.gridmap.cell_to_position(bounds[0], bounds[1])
+
+        if version == self.map_cache_version:
+            self.map_cache_hits += 1
+        else:
+            header = Header(frame_id=self.world_frame_id, stamp=self.get_clock().now().to_msg())
+            self.map_cache = self.make_occupancy_grid(
+                header, array.array("b", data.tobytes()), self.cell_size, origin, data.shape
+            )
+            self.map_cache_version = version
+            self.map_cache_misses += 1
+        response.map = self.map_cache
+        return response
+
+    def log_stats(self):
+        stats = self.pose_buffer.stats()
+        self.get_logger().info(
+            f"pose lookup: {stats['lookups']} calls, "
+            f"mean {stats['mean_ms']:.3f}ms, max {stats['max_ms']:.3f}ms, "
+            f"dropped old {stats['too_old']} / no odometry {stats['too_new']}"
+        )
+        integrator = self.integrator
+        scans, latency, latency_max = integrator.latency.summary()
+        batches, integrate, integrate_max = integrator.integrate_time.summary()
+        publishes, publish, publish_max = self.publish_time.summary()
+        self.get_logger().info(
+            f"queue depth {integrator.depth()} (max {integrator.max_depth}, "
+            f"dropped {integrator.dropped}), "
+            f"scan->map {scans} scans mean {latency:.1f}ms max {latency_max:.1f}ms, "
+            f"integrate {batches} batches mean {integrate:.1f}ms max {integrate_max:.1f}ms, "
+            f"publish {publishes} mean {publish:.1f}ms max {publish_max:.1f}ms "
+            f"(skipped {self.publish_skipped}), "
+            f"get_map cache {self.map_cache_hits} hits / {self.map_cache_misses} misses"
+        )
+        integrator.max_depth = integrator.depth()
+        if integrator.matcher is not None:
+            batches, match, match_max = integrator.match_time.summary()
+            self.get_logger().info(
+                f"scan matching: {integrator.matched} corrections, "
+                f"batch mean {match:.1f}ms max {match_max:.1f}ms, "
+                f"correction {np.round(integrator.correction, 3)}"
+            )
+        if self.distance_layer is not None:
+            self.get_logger().info(
+                f"distance layer: version {self.distance_layer.version}, "
+                f"{self.distance_layer.recomputed} tiles recomputed, "
+                f"{len(self.distance_layer.tiles)} tiles"
+            )
+        if self.particle_filter is not None:
+            with integrator.lock:
+                neff = self.particle_filter.effective_count()
+                memory = self.particle_filter.memory_usage()
+            self.get_logger().info(
+                f"rbpf: {self.particle_filter.count} particles, neff {neff:.1f}, "
+                f"resampled {self.particle_filter.resampled}, "
+                f"maps {memory / 1e6:.2f}MB"
+            )
+
+    def destroy_node(self):
+        self.integrator.close()
+        if self.map_file:
+            try:
+                self.get_logger().info(f"map saved: {self.save_map_state()}")
+            except OSError as e:
+                self.get_logger().error(f"cannot save map {self.map_file}: {e}")
+        self.snapshot_writer.close()
+        if self.scan_logger is not None:
+            self.scan_logger.close()
+        super().destroy_node()
+
 
 def main(args=None):
     rclpy.init(args=args)
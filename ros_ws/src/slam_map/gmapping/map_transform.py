@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+from gmapping.utils_lib.map_pyramid import pool_blocks
+from gmapping.utils_lib.map_snapshot import load_snapshot
 
 # 300x300 배열 생성
 
@@ -21,10 +23,9 @@ filter_kernel = np.array(
     ]
 )
 
-_size = 10
-grid_ratio = 0.1
-grid_size = int(1 / grid_ratio)
-map_size = int(_size / grid_ratio)
+# 블록 크기(m), 블록 평균이 이 값보다 크면 장애물
+block_size = 1.0
+occupied_threshold = 35
 
 # 가우시안 블러 필터 생성
 def gaussian_kernel(size, sigma=1):
@@ -38,11 +39,11 @@ def gaussian_kernel(size, sigma=1):
     kernel /= kernel.sum()
     return kernel
 
-def pre_process(data) -> np.array:
+def pre_process(data, shape: tuple) -> np.array:
     data[data == -1] = 95
     # data[data>70] = 1
     # data[data <= 40] = 0
-    data = data.reshape(map_size, map_size)
+    data = data.reshape(shape)
 
     # 5x5 필터 커널 생성
     filter_kernel = np.array(
@@ -80,41 +81,12 @@ def pre_process(data) -> np.array:
     return data
 
 
-def create_blockmap(data, _grid_size:int, map_size:tuple) -> np.array:
-
-    # data = data.reshape(*map_size, _grid_size, _grid_size)
-    
-    result = np.zeros(map_size)
-    
-    for i in range(result.shape[0]):
-        for j in range(result.shape[1]):
-            start_row = i * _grid_size
-            end_row = start_row + _grid_size
-            start_col = j * _grid_size
-            end_col = start_col + _grid_size
-            _sub = data[start_row:end_row, start_col:end_col]
-            if _sub.mean() > 35:
-                result[i, j] = 1
-            else:
-                result[i, j] = 0
-
-    # 각 행에서 30개의 10x10 서브 배열 추출
-    # reshaped = np.reshape(data, (300, 30, 10))
-
-    # 축 전환 및 최종 형상 변환
-    # result = np.transpose(reshaped, (1, 0, 2)).reshape(30, 30, 10, 10)
-
-    # for i in range(0, _size):
-    #     for j in range(0, _size):
-    #         if result[i,j].sum() > 1:
-    #             t[i,j] =1
-
-    # for r, d in enumerate(data):
-    #     for c, e in enumerate(d):
-    #         if e.sum() > 1:
-    #             t[r,c] =1
-
-    return result
+def create_blockmap(data, _grid_size: int, reduce: str = "mean") -> np.array:
+    """_grid_size x _grid_size 셀 블록마다 장애물(1)/빈 곳(0)을 정한 블록맵 (가장자리는 미탐색으로 채움)"""
+    pooled = pool_blocks(data, _grid_size, reduce, fill=95, threshold=occupied_threshold)
+    if reduce != "any":
+        pooled = pooled > occupied_threshold
+    return pooled.astype(np.float64)
 
 def rotate_map_cw(data):
     # 2x2 시계 방향 90도 회전 행렬
@@ -153,13 +125,14 @@ def main():
     base_dir = (
         r"D:\unity_works\with-robot-2024-1st\ros_ws\install\gmapping\share\gmapping"
     )
-    data = np.loadtxt(f"{base_dir}/resource/occ_map.txt")
+    header, snapshot = load_snapshot(f"{base_dir}/resource/occ_map.bin")
+    data = np.array(snapshot, dtype=float).reshape(-1)
 
-    data = pre_process(data)
-    data = create_blockmap(data, map_size=(10,10), _grid_size=10)
+    data = pre_process(data, (header.height, header.width))
+    data = create_blockmap(data, _grid_size=max(1, round(block_size / header.resolution)))
     data = rotate_map_cw(data)
     print(data)
-    plot_map(data, map_size=10)
+    plot_map(data, map_size=max(data.shape))
 
 
 if __name__ == "__main__":
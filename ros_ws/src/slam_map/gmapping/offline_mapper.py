@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+기록된 pose/measurement 로그로 맵을 만든다. (ROS 없이 실행)
+
+    python3 -m gmapping.offline_mapper resource/scan_log -o occ_map.bin --workers 4
+    python3 -m gmapping.offline_mapper /tmp/scan_log --text test/pose.txt test/measurements.txt
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from gmapping.utils_lib.gridmap import to_occupancy
+from gmapping.utils_lib.map_snapshot import write_snapshot
+from gmapping.utils_lib.scan_log import ScanLogReader, convert_text_log
+from gmapping.utils_lib.tiled_gridmap import TiledGridMap
+
+# Unity LidarPublisher 기본값 (텍스트 로그에는 빔 배치가 없음)
+ANGLE_MIN = -1.57
+ANGLE_INCREMENT = 3.14 / 65
+
+
+def integrate_records(log_dir, index, cell_size, map_width, p=0.7, batch=64):
+    """
+    index 구간의 스캔을 빈 맵에 적분해 TiledGridMap으로 반환한다.
+    여러 스캔의 빔을 이어붙여 add_scan 한번에 batch개 스캔씩 처리한다.
+    """
+    reader = ScanLogReader(log_dir)
+    gridmap = TiledGridMap((0, 0), None, cell_size=cell_size, map_width=map_width)
+    beam_angles = reader.beam_angles()
+    max_range = reader.range_max if np.isfinite(reader.range_max) else None
+
+    for start in range(index.start, index.stop, batch):
+        records = slice(start, min(start + batch, index.stop))
+        poses = np.asarray(reader.poses[records], dtype=np.float64)
+        ranges = np.asarray(reader.ranges[records], dtype=np.float64)
+
+        angles = poses[:, 2:3] + beam_angles
+        starts = np.repeat(poses[:, :2], reader.n_ranges, axis=0)
+        gridmap.add_scan(starts, angles, ranges, p, max_range=max_range)
+
+    return gridmap
+
+
+def fold_map(gridmap, part):
+    """part의 로그확율을 gridmap에 더하고 셀마다 로그확율 범위로 제한한다."""
+    for key, tile in part.tiles.items():
+        target = gridmap._tile(key)
+        target[...] = gridmap._saturate(target, tile)
+    if part.extent is not None:
+        if gridmap.extent is None:
+            gridmap.extent = part.extent
+        else:
+            gridmap.extent = gridmap._union(gridmap.extent, part.extent)
+
+
+def build_map(log_dir, cell_size=0.1, map_width=10.0, workers=None, chunks=None, batch=64):
+    """
+    로그를 시간 구간으로 나누어 프로세스별로 적분하고 구간 순서대로 합친다.
+    구간마다 빈 맵에서 시작하고 batch개 스캔을 더한 후 제한하므로,
+    포화된 셀의 값이 스캔별 순차 add_scan과 다를 수 있다. (근사, chunks=1, batch=1이면 같다)
+    맵은 TiledGridMap이라 map_width(발행 최소 영역) 밖으로도 확장된다.
+    """
+    reader = ScanLogReader(log_dir)
+    total = len(reader)
+    workers = workers or os.cpu_count() or 1
+    chunks = max(1, min(total, chunks or workers * 4))
+    bounds = np.linspace(0, total, chunks + 1).astype(int)
+    indexes = [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    gridmap = TiledGridMap((0, 0), None, cell_size=cell_size, map_width=map_width)
+    if workers == 1:
+        for index in indexes:
+            part = integrate_records(log_dir, index, cell_size, map_width, batch=batch)
+            fold_map(gridmap, part)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    integrate_records, log_dir, index, cell_size, map_width, batch=batch
+                )
+                for index in indexes
+            ]
+            # 끝난 순서가 아니라 시간 순서대로 합친다.
+            for future in futures:
+                fold_map(gridmap, future.result())
+
+    gridmap.version = total
+    return gridmap, reader
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log_dir", help="ScanLogWriter log directory")
+    parser.add_argument(
+        "--text",
+        nargs=2,
+        metavar=("POSE_FILE", "MEASUREMENT_FILE"),
+        help="convert text logs into log_dir first",
+    )
+    parser.add_argument("-o", "--output", default="occ_map.bin")
+    parser.add_argument("--cell-size", type=float, default=0.1)
+    parser.add_argument("--map-width", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunks", type=int, default=None)
+    opts = parser.parse_args(args)
+
+    if opts.text:
+        convert_text_log(*opts.text, opts.log_dir, ANGLE_MIN, ANGLE_INCREMENT)
+
+    started = time.perf_counter()
+    gridmap, reader = build_map(
+        opts.log_dir, opts.cell_size, opts.map_width, opts.workers, opts.chunks
+    )
+    elapsed = time.perf_counter() - started
+
+    row0, col0, row1, col1 = gridmap.bounds()
+    grid = gridmap.read_region(row0, col0, row1, col1)
+    occupancy = to_occupancy(grid, np.empty(grid.shape, dtype=np.int8))
+    write_snapshot(
+        opts.output,
+        occupancy,
+        opts.cell_size,
+        gridmap.cell_to_position(row0, col0),
+        version=gridmap.version,
+        stamp=int(reader.stamps[-1]) if len(reader) else 0,
+    )
+
+    print(
+        f"{len(reader)} scans in {elapsed:.2f}s "
+        f"({len(reader) / elapsed:.1f} scans/s) -> {opts.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+
+def disk_offsets(radius):
+    """반경 radius(셀) 안의 (dy, dx, 거리)를 거리순으로 반환한다."""
+    r = int(np.ceil(radius))
+    dy, dx = np.mgrid[-r : r + 1, -r : r + 1]
+    distance = np.hypot(dy, dx)
+    keep = distance <= radius
+    order = np.argsort(distance[keep], kind="stable")
+    return dy[keep][order], dx[keep][order], distance[keep][order]
+
+
+def distance_field(occupied, max_distance):
+    """
+    각 셀에서 가장 가까운 점유 셀까지의 거리(셀 단위).
+    가까운 오프셋부터 점유 마스크를 밀어보며 처음 닿은 거리를 기록한다. O(셀수 x 반경^2)
+    max_distance보다 먼 셀은 max_distance
+    """
+    height, width = occupied.shape
+    field = np.full((height, width), float(max_distance))
+    pad = int(np.ceil(max_distance))
+    padded = np.pad(occupied, pad)
+    unset = np.ones((height, width), dtype=bool)
+    for dy, dx, distance in zip(*disk_offsets(max_distance)):
+        shifted = padded[pad + dy : pad + dy + height, pad + dx : pad + dx + width]
+        reached = shifted & unset
+        field[reached] = distance
+        unset &= ~reached
+        if not unset.any():
+            break
+    return field
+
+
+def likelihood_field(occupied, cell_size, sigma=0.1, max_distance=0.5):
+    """점유 셀 근처일수록 1에 가까운 가우시안 likelihood (0 ~ 1)"""
+    distance = distance_field(occupied, max_distance / cell_size) * cell_size
+    field = np.exp(-0.5 * (distance / sigma) ** 2)
+    field[distance >= max_distance] = 0.0
+    return field
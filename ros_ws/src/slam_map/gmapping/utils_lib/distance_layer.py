@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+import numpy as np
+from .distance_field import distance_field
+from .map_pyramid import tile_keys
+
+
+class DistanceLayer:
+    """
+    가장 가까운 점유 셀(로그확율 > 0)까지의 유클리드 거리(m) 레이어.
+    GridMap이 갱신된 셀을 알려주면 그 타일의 점유 마스크를 이전과 비교하고,
+    점유가 바뀐 타일 주변 max_distance 안의 타일만 다시 계산한다.
+    (빈 셀의 로그확율만 바뀐 스캔은 계산하지 않는다.)
+    max_distance보다 먼 셀, 계산된 적 없는 셀은 max_distance
+    """
+
+    def __init__(self, gridmap, max_distance=1.0, tile_cells=32):
+        self.gridmap = gridmap
+        self.max_distance = max_distance
+        self.tile_cells = tile_cells
+        # 셀 단위 최대 거리, 점유가 바뀐 타일에서 다시 계산할 주변 타일 수
+        self.max_cells = max_distance / gridmap.cell_size
+        self.pad = int(np.ceil(self.max_cells))
+        self.reach = -(-self.pad // tile_cells)
+        # (tile_row, tile_col) => 거리(m, float32). 모두 max_distance인 타일은 두지 않는다.
+        self.tiles = {}
+        # (tile_row, tile_col) => 마지막 계산 때의 점유 마스크 (점유 셀이 있는 타일만)
+        self.occupied = {}
+        # 갱신되었지만 아직 점유 비교를 하지 않은 타일
+        self.dirty = set()
+        # 거리가 다시 계산될 때마다 증가한다.
+        self.version = 0
+        self.recomputed = 0
+        gridmap.layers.append(self)
+
+    def mark(self, rows, cols):
+        """GridMap.mark_dirty에서 호출. 갱신된 셀이 속한 타일을 기록한다."""
+        self.dirty |= tile_keys(rows, cols, self.tile_cells)
+
+    def _read(self, row0, col0, row1, col1):
+        """셀 영역의 로그확율. 맵 범위(dense GridMap) 밖은 미탐색(0)"""
+        region = np.zeros((row1 - row0, col1 - col0), dtype=self.gridmap.dtype)
+        bounds = self.gridmap.bounds()
+        r0, c0 = max(row0, bounds[0]), max(col0, bounds[1])
+        r1, c1 = min(row1, bounds[2]), min(col1, bounds[3])
+        if r0 < r1 and c0 < c1:
+            region[r0 - row0 : r1 - row0, c0 - col0 : c1 - col0] = self.gridmap.read_region(
+                r0, c0, r1, c1
+            )
+        return region
+
+    def refresh(self):
+        """점유가 바뀐 타일 주변만 다시 계산한다. 다시 계산한 타일 수를 반환한다."""
+        size = self.tile_cells
+        changed = []
+        for key in self.dirty:
+            top, left = key[0] * size, key[1] * size
+            occupied = self._read(top, left, top + size, left + size) > 0
+            previous = self.occupied.get(key)
+            if previous is None:
+                if not occupied.any():
+                    continue
+            elif np.array_equal(previous, occupied):
+                continue
+            if occupied.any():
+                self.occupied[key] = occupied
+            else:
+                self.occupied.pop(key, None)
+            changed.append(key)
+        self.dirty.clear()
+        if not changed:
+            return 0
+
+        # 점유가 바뀐 셀에서 max_distance 안의 타일
+        steps = range(-self.reach, self.reach + 1)
+        affected = {(row + dr, col + dc) for row, col in changed for dr in steps for dc in steps}
+        keys = np.array(sorted(affected))
+        tile_row0, tile_col0 = keys.min(axis=0)
+        tile_row1, tile_col1 = keys.max(axis=0) + 1
+
+        # 영향 타일을 덮는 창을 pad만큼 넓혀 읽으면 창 안의 거리는 정확하다.
+        row0, col0 = tile_row0 * size, tile_col0 * size
+        row1, col1 = tile_row1 * size, tile_col1 * size
+        occupied = self._read(row0 - self.pad, col0 - self.pad, row1 + self.pad, col1 + self.pad) > 0
+        field = distance_field(occupied, self.max_cells)[
+            self.pad : self.pad + row1 - row0, self.pad : self.pad + col1 - col0
+        ]
+        field = (field * self.gridmap.cell_size).astype(np.float32)
+        for key in affected:
+            top, left = (key[0] - tile_row0) * size, (key[1] - tile_col0) * size
+            tile = field[top : top + size, left : left + size]
+            if (tile >= self.max_distance).all():
+                self.tiles.pop(key, None)
+            else:
+                self.tiles[key] = tile.copy()
+        self.version += 1
+        self.recomputed += len(affected)
+        return len(affected)
+
+    def snapshot(self, bounds=None):
+        """
+        bounds(기본은 맵 전체) 영역의 거리 배열(m)과 (resolution, origin)을 반환한다.
+        반환한 배열은 복사본이므로 lock 밖에서 사용해도 된다.
+        """
+        self.refresh()
+        row0, col0, row1, col1 = bounds or self.gridmap.bounds()
+        size = self.tile_cells
+        grid = np.full((row1 - row0, col1 - col0), self.max_distance, dtype=np.float32)
+        for tile_row in range(row0 // size, (row1 - 1) // size + 1):
+            for tile_col in range(col0 // size, (col1 - 1) // size + 1):
+                tile = self.tiles.get((tile_row, tile_col))
+                if tile is None:
+                    continue
+                r0 = max(row0, tile_row * size)
+                r1 = min(row1, (tile_row + 1) * size)
+                c0 = max(col0, tile_col * size)
+                c1 = min(col1, (tile_col + 1) * size)
+                grid[r0 - row0 : r1 - row0, c0 - col0 : c1 - col0] = tile[
+                    r0 - tile_row * size : r1 - tile_row * size,
+                    c0 - tile_col * size : c1 - tile_col * size,
+                ]
+        return grid, (self.gridmap.cell_size, self.gridmap.cell_to_position(row0, col0))
+
+    def distance_at(self, x, y):
+        """월드좌표 (x, y)에서 가장 가까운 장애물까지의 거리(m). 배열도 받는다."""
+        self.refresh()
+        cell_size = self.gridmap.cell_size
+        cols = np.floor((np.asarray(x) - self.gridmap.origin[0]) / cell_size).astype(np.int64)
+        rows = np.floor((np.asarray(y) - self.gridmap.origin[1]) / cell_size).astype(np.int64)
+        tile_rows, local_rows = np.divmod(rows, self.tile_cells)
+        tile_cols, local_cols = np.divmod(cols, self.tile_cells)
+        values = np.full(rows.shape, self.max_distance, dtype=np.float32)
+        for key in tile_keys(np.ravel(rows), np.ravel(cols), self.tile_cells):
+            tile = self.tiles.get(key)
+            if tile is not None:
+                mask = (tile_rows == key[0]) & (tile_cols == key[1])
+                values[mask] = tile[local_rows[mask], local_cols[mask]]
+        return values
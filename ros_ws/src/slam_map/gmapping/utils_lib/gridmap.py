@@ -1,45 +1,135 @@
 #!/usr/bin/python3
 
 import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
 from .bresenham import *
 
+# 고정소수점(int16) 로그확율: 값 = 로그확율 * FIXED_SCALE
+FIXED_SCALE = 1000
+FIXED_MAX = 6910  # LMAX
+FIXED_MIN = -6910  # LMIN
+
 
 def log_ods(p):
     return np.log(p / (1 - p))
 
 
+@lru_cache(maxsize=None)
+def fixed_increments(p):
+    """점유/빈 셀에 더할 고정소수점 증분 (occupied, free)"""
+    return int(round(log_ods(p) * FIXED_SCALE)), int(round(log_ods(1 - p) * FIXED_SCALE))
+
+
+def _occupancy_table():
+    # 고정소수점 값(FIXED_MIN ~ FIXED_MAX) => 0 ~ 100, 0은 미탐색(-1)
+    values = np.arange(FIXED_MIN, FIXED_MAX + 1)
+    table = ((values / FIXED_SCALE + 6.91) * 7.23).astype(np.int8)
+    table[-FIXED_MIN] = -1
+    return table
+
+
+OCCUPANCY_TABLE = _occupancy_table()
+
+
+def to_occupancy(grid, out, scratch=None):
+    """
+    로그확율 맵을 OccupancyGrid 값(0 ~ 100, 미탐색 -1)으로 변환해 out(int8)에 쓴다.
+    (l + 6.91) * 7.23 => 0 ~ 100, 초기값 0인 셀은 미탐색 지역
+    int16(고정소수점) 맵은 미리 계산한 OCCUPANCY_TABLE로 변환한다.
+    """
+    if grid.dtype == np.int16:
+        np.take(OCCUPANCY_TABLE, grid - FIXED_MIN, out=out, mode="clip")
+        return out
+    if scratch is None:
+        scratch = np.empty(grid.shape, dtype=np.float64)
+    np.add(grid, GridMap.LMAX, out=scratch)
+    np.multiply(scratch, 7.23, out=scratch)
+    np.copyto(out, scratch, casting="unsafe")
+    out[grid == 0] = -1
+    return out
+
+
 class GridMap:
 
     LMAX = 6.91  # p가 0.999
     LMIN = -6.91  # p가 0.001
 
-    def __init__(self, center, logger, cell_size=0.1, map_width=30):
+    def __init__(
+        self, center, logger, cell_size=0.1, map_width=30, ray_table=None, fixed_point=False
+    ):
         self.map_width = np.array([map_width, map_width])
         self.cell_size = cell_size
-        self.grid = np.zeros((int(map_width / cell_size), int(map_width / cell_size)))
+        # fixed_point이면 로그확율 * FIXED_SCALE을 int16으로 저장한다. (메모리 1/4)
+        self.fixed_point = fixed_point
+        self.dtype = np.dtype(np.int16 if fixed_point else np.float64)
+        self.grid = np.zeros(
+            (int(map_width / cell_size), int(map_width / cell_size)), dtype=self.dtype
+        )
         self.origin = np.array(center) - self.map_width / 2
 
         self.limit = map_width**2
         self.debugger = logger
+        # 맵이 갱신될 때마다 증가한다. (변경이 없으면 발행을 생략하기 위함)
+        self.version = 0
+        # 마지막 pop_dirty 이후 갱신된 영역 [row0, col0, row1, col1)
+        self.dirty = None
+        # 지정되면 빔 탐색을 테이블 조회로 대신한다.
+        self.ray_table = ray_table
+        # 연결된 레이어(MapPyramid, DistanceLayer)에 갱신된 셀을 알린다.
+        self.layers = []
 
     def get_map(self):
         return self.grid
 
-    def update_cell(self, position, p):
+    def bounds(self):
+        """get_map()이 덮는 셀 영역 (row0, col0, row1, col1)"""
+        return (0, 0) + self.grid.shape
 
-        for i in range(0, len(position) - 1):
-            self.grid[position[i][1]][position[i][0]] = np.clip(
-                self.grid[position[i][1]][position[i][0]] + log_ods(1 - p),
-                self.LMIN,
-                self.LMAX,
-            )
+    def read_region(self, row0, col0, row1, col1):
+        """셀 영역의 로그확율 값"""
+        return self.grid[row0:row1, col0:col1]
 
-        self.grid[position[-1][1]][position[-1][0]] = np.clip(
-            self.grid[position[-1][1]][position[-1][0]] + log_ods(p),
-            self.LMIN,
-            self.LMAX,
+    def cell_to_position(self, row, col):
+        """셀 (row, col)의 모서리 월드좌표 (x, y)"""
+        return (
+            float(self.origin[0] + col * self.cell_size),
+            float(self.origin[1] + row * self.cell_size),
         )
 
+    def mark_dirty(self, rows, cols):
+        """갱신된 셀들을 포함하도록 dirty 영역을 넓힌다."""
+        region = (rows.min(), cols.min(), rows.max() + 1, cols.max() + 1)
+        if self.dirty is not None:
+            region = (
+                min(self.dirty[0], region[0]),
+                min(self.dirty[1], region[1]),
+                max(self.dirty[2], region[2]),
+                max(self.dirty[3], region[3]),
+            )
+        self.dirty = tuple(int(v) for v in region)
+        for layer in self.layers:
+            layer.mark(rows, cols)
+
+    def mark_region(self, row0, col0, row1, col1, step=16):
+        """(row0, col0, row1, col1) 영역 전체를 갱신된 것으로 표시한다."""
+        rows = np.r_[np.arange(row0, row1, step), row1 - 1]
+        cols = np.r_[np.arange(col0, col1, step), col1 - 1]
+        rows, cols = np.meshgrid(rows, cols, indexing="ij")
+        self.mark_dirty(rows.ravel(), cols.ravel())
+
+    def pop_dirty(self):
+        """갱신된 영역 (row0, col0, row1, col1)을 반환하고 초기화한다. 없으면 None"""
+        region, self.dirty = self.dirty, None
+        return region
+
+    def update_cell(self, position, p):
+        """position[(col, row), ...]의 마지막 셀은 점유, 나머지는 빈 셀로 적분한다."""
+        position = np.asarray(position, dtype=np.int64).reshape(-1, 2)
+        occupied = np.zeros(len(position), dtype=bool)
+        occupied[-1] = True
+        self._accumulate(position[:, 1], position[:, 0], occupied, p)
+
     def add_ray(self, start, angle, range, p):
         # Starting Postions
         x_not = start[0]
@@ -70,3 +160,274 @@ class GridMap:
         col_position = (position[1] - self.origin[1]) / self.cell_size
 
         return row_position, col_position
+
+    def add_scan(self, start, angles, ranges, p, max_range=None):
+        """
+        한 스캔의 모든 빔을 한번에 적분한다.
+        start는 (x, y) 또는 빔별 (n, 2) 위치, angles는 빔별 월드 각도.
+        """
+        angles = np.asarray(angles, dtype=np.float64).ravel()
+        ranges = np.asarray(ranges, dtype=np.float64).ravel()
+        start = np.broadcast_to(np.asarray(start, dtype=np.float64), (angles.size, 2))
+
+        # 측정값이 없는 빔(nan, inf, 0)은 제외
+        valid = np.isfinite(ranges) & (ranges > 0)
+        if max_range is not None:
+            # 최대거리 이상은 장애물이 아닌 빈 공간으로만 취급
+            no_return = valid & (ranges >= max_range)
+            ranges = np.where(no_return, max_range, ranges)
+        else:
+            no_return = np.zeros_like(valid)
+
+        angles, ranges, start = angles[valid], ranges[valid], start[valid]
+        no_return = no_return[valid]
+        if angles.size == 0:
+            return
+
+        # 셀 좌표계에서의 시작/끝점
+        x0 = (start[:, 0] - self.origin[0]) / self.cell_size
+        y0 = (start[:, 1] - self.origin[1]) / self.cell_size
+        x1 = x0 + ranges * np.cos(angles) / self.cell_size
+        y1 = y0 + ranges * np.sin(angles) / self.cell_size
+
+        cols, rows, is_end, beam, hit = self._trace(x0, y0, x1, y1, no_return)
+        occupied = is_end & hit[beam]
+
+        self._accumulate(rows, cols, occupied, p)
+
+    def _trace(self, x0, y0, x1, y1, no_return):
+        """빔이 지나는 맵 안의 셀들과 빔별 장애물 검출 여부를 반환한다."""
+        height, width = self.grid.shape
+        if self.ray_table is None:
+            # 맵 범위로 잘라낸 후 탐색한다.
+            x0, y0, x1, y1, inside, end_inside = clip_segments(
+                x0, y0, x1, y1, width, height
+            )
+            hit = end_inside & ~no_return[inside]
+            cols, rows, is_end, beam = trace_cells(x0, y0, x1, y1)
+        else:
+            # 테이블 조회 후 맵 밖의 셀은 제외한다. (빔은 직선이므로 연속구간만 남음)
+            hit = ~no_return
+            cols, rows, is_end, beam = self.ray_table.trace(x0, y0, x1, y1)
+            in_map = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+            cols, rows, is_end, beam = (
+                cols[in_map],
+                rows[in_map],
+                is_end[in_map],
+                beam[in_map],
+            )
+
+        return cols, rows, is_end, beam, hit
+
+    def _accumulate(self, rows, cols, occupied, p):
+        # 셀별로 빈/점유 로그확율을 합산한 후 한번만 clip 한다.
+        flat = self.grid.reshape(-1)
+        index = rows * self.grid.shape[1] + cols
+        cells, inverse = np.unique(index, return_inverse=True)
+        delta = self._delta(inverse.reshape(-1), occupied, cells.size, p)
+        flat[cells] = self._saturate(flat[cells], delta)
+        if cells.size:
+            self.version += 1
+            self.mark_dirty(rows, cols)
+
+    def _delta(self, inverse, occupied, count, p):
+        """셀별 로그확율 변화량. 고정소수점이면 정수 증분의 합(int64)"""
+        if self.fixed_point:
+            # 정수 증분의 합은 float64로도 정확하다.
+            weights = np.where(occupied, *fixed_increments(p))
+            delta = np.bincount(inverse, weights=weights, minlength=count)
+            return delta.astype(np.int64)
+        weights = np.where(occupied, log_ods(p), log_ods(1 - p))
+        return np.bincount(inverse, weights=weights, minlength=count)
+
+    def _saturate(self, values, delta):
+        """values + delta를 로그확율 범위로 제한한다. (int16은 int64로 더한 후 제한)"""
+        if self.fixed_point:
+            return np.clip(values + delta, FIXED_MIN, FIXED_MAX)
+        return np.clip(values + delta, self.LMIN, self.LMAX)
+
+
+def clip_segments(x0, y0, x1, y1, width, height):
+    """
+    Liang-Barsky 방식으로 선분들을 [0, width) x [0, height) 범위로 자른다.
+    잘린 좌표, 범위 안에 걸친 선분 마스크, 끝점이 범위 안인지 여부를 반환한다.
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    # 경계값이 셀 인덱스 width가 되지 않도록 살짝 줄인다.
+    x_max = width - 1e-6
+    y_max = height - 1e-6
+
+    t0 = np.zeros_like(x0)
+    t1 = np.ones_like(x0)
+    inside = np.ones(x0.shape, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p_, q_ in ((-dx, x0), (dx, x_max - x0), (-dy, y0), (dy, y_max - y0)):
+            r = q_ / p_
+            parallel = p_ == 0
+            inside &= ~(parallel & (q_ < 0))
+            t0 = np.where(p_ < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p_ > 0, np.minimum(t1, r), t1)
+    inside &= t0 <= t1
+
+    end_inside = (t1 >= 1.0)[inside]
+    t0, t1 = t0[inside], t1[inside]
+    x0, y0, dx, dy = x0[inside], y0[inside], dx[inside], dy[inside]
+
+    return (
+        x0 + t0 * dx,
+        y0 + t0 * dy,
+        x0 + t1 * dx,
+        y0 + t1 * dy,
+        inside,
+        end_inside,
+    )
+
+
+def trace_cells(x0, y0, x1, y1):
+    """
+    모든 빔이 지나는 셀을 한번에 구한다. (DDA, 정수 연산)
+    빔별 셀들을 이어붙인 cols, rows와 각 빔의 마지막 셀 여부, 빔 인덱스를 반환한다.
+    """
+    cx0 = np.floor(x0).astype(np.int64)
+    cy0 = np.floor(y0).astype(np.int64)
+    dx = np.floor(x1).astype(np.int64) - cx0
+    dy = np.floor(y1).astype(np.int64) - cy0
+
+    steps = np.maximum(np.abs(dx), np.abs(dy))
+    counts = steps + 1
+    ends = np.cumsum(counts)
+
+    beam = np.repeat(np.arange(counts.size), counts)
+    t = np.arange(ends[-1] if ends.size else 0) - np.repeat(ends - counts, counts)
+
+    # round(t * d / steps)를 정수연산으로 계산
+    denom = 2 * np.maximum(steps, 1)[beam]
+    cols = cx0[beam] + (2 * t * dx[beam] + steps[beam]) // denom
+    rows = cy0[beam] + (2 * t * dy[beam] + steps[beam]) // denom
+
+    is_end = np.zeros(t.size, dtype=bool)
+    is_end[ends - 1] = True
+
+    return cols, rows, is_end, beam
+
+
+class RayTable:
+    """
+    셀 크기와 빔 배치가 고정이면 빔이 지나는 셀은 (셀 내 시작 오프셋, 각도, 거리)에만
+    의존한다. (오프셋, 각도, 거리구간)별로 셀 오프셋을 미리 계산해 LRU로 보관하고,
+    빔 탐색은 테이블 조회와 평행이동, 빔 길이만큼의 앞부분 선택으로 대신한다.
+    """
+
+    def __init__(self, angle_bins=720, offset_bins=2, range_bin=32, maxsize=16384):
+        self.angle_bins = angle_bins
+        self.offset_bins = offset_bins
+        # 거리구간 크기 (셀 단위)
+        self.range_bin = range_bin
+        self.maxsize = maxsize
+
+        # 키 => 슬롯 번호 (LRU 순서 유지)
+        self._slots = OrderedDict()
+        self._cols = np.zeros((maxsize, range_bin + 1), dtype=np.int32)
+        self._rows = np.zeros_like(self._cols)
+        self._lengths = np.zeros(maxsize, dtype=np.int64)
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, slot, offset_x, offset_y, angle_bin, range_bin):
+        # 양자화된 구간의 중앙값에서 거리구간 끝까지 한 빔을 탐색한다.
+        x0 = (offset_x + 0.5) / self.offset_bins
+        y0 = (offset_y + 0.5) / self.offset_bins
+        angle = angle_bin * 2 * np.pi / self.angle_bins
+        # trace는 주축 방향 이동 수로 거리구간을 나누므로, 주축으로 구간 끝까지 가도록
+        # 유클리드 길이를 늘린다. (대각선 빔은 최대 sqrt(2)배)
+        major = max(abs(np.cos(angle)), abs(np.sin(angle)))
+        length = ((range_bin + 1) * self.range_bin + 0.5) / major
+        cols, rows, _, _ = trace_cells(
+            np.array([x0]),
+            np.array([y0]),
+            np.array([x0 + length * np.cos(angle)]),
+            np.array([y0 + length * np.sin(angle)]),
+        )
+        if cols.size > self._cols.shape[1]:
+            # 긴 빔이 들어오면 테이블 폭을 늘린다.
+            pad = ((0, 0), (0, cols.size - self._cols.shape[1]))
+            self._cols = np.pad(self._cols, pad)
+            self._rows = np.pad(self._rows, pad)
+        self._cols[slot, : cols.size] = cols
+        self._rows[slot, : rows.size] = rows
+        self._lengths[slot] = cols.size
+
+    def lookup(self, key):
+        """키에 해당하는 슬롯 번호를 반환한다. 없으면 만들고 가장 오래된 것을 버린다."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            self.hits += 1
+            return slot
+
+        self.misses += 1
+        if len(self._slots) < self.maxsize:
+            slot = len(self._slots)
+        else:
+            _, slot = self._slots.popitem(last=False)
+        self._build(slot, *key)
+        self._slots[key] = slot
+        return slot
+
+    def trace(self, x0, y0, x1, y1):
+        """trace_cells와 같은 형태로 결과를 반환한다. (좌표는 셀 단위)"""
+        cx0 = np.floor(x0).astype(np.int64)
+        cy0 = np.floor(y0).astype(np.int64)
+        offset_x = np.minimum(
+            ((x0 - cx0) * self.offset_bins).astype(np.int64), self.offset_bins - 1
+        )
+        offset_y = np.minimum(
+            ((y0 - cy0) * self.offset_bins).astype(np.int64), self.offset_bins - 1
+        )
+        angle_bin = np.rint(
+            np.arctan2(y1 - y0, x1 - x0) / (2 * np.pi) * self.angle_bins
+        ).astype(np.int64) % self.angle_bins
+
+        # 빔이 지나는 셀 개수 (주축 방향 이동 수 + 1)
+        steps = np.maximum(
+            np.abs(np.floor(x1).astype(np.int64) - cx0),
+            np.abs(np.floor(y1).astype(np.int64) - cy0),
+        )
+        range_bin = steps // self.range_bin
+
+        slots = np.fromiter(
+            (
+                self.lookup(key)
+                for key in zip(
+                    offset_x.tolist(),
+                    offset_y.tolist(),
+                    angle_bin.tolist(),
+                    range_bin.tolist(),
+                )
+            ),
+            dtype=np.int64,
+            count=steps.size,
+        )
+
+        counts = np.minimum(steps + 1, self._lengths[slots])
+        ends = np.cumsum(counts)
+        beam = np.repeat(np.arange(counts.size), counts)
+        t = np.arange(ends[-1] if ends.size else 0) - np.repeat(ends - counts, counts)
+
+        slot = slots[beam]
+        cols = self._cols[slot, t] + cx0[beam]
+        rows = self._rows[slot, t] + cy0[beam]
+
+        is_end = np.zeros(t.size, dtype=bool)
+        is_end[ends - 1] = True
+
+        return cols, rows, is_end, beam
+
+    def cache_info(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            maxsize=self.maxsize,
+            currsize=len(self._slots),
+        )
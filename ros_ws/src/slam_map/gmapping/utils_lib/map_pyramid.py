@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+
+import math
+import numpy as np
+
+
+def tile_keys(rows, cols, size):
+    """셀들이 속한 (tile_row, tile_col) 집합 (음수 타일 포함)"""
+    # (tile_row, tile_col)을 하나의 정수로 묶어 중복 제거
+    keys = np.unique((rows // size) * (1 << 32) + (cols // size + (1 << 31)))
+    tile_rows, tile_cols = np.divmod(keys, 1 << 32)
+    return set(zip(tile_rows.tolist(), (tile_cols - (1 << 31)).tolist()))
+
+
+def pool_blocks(grid, block: int, reduce: str = "mean", fill=0, threshold=0):
+    """
+    grid를 block x block 셀 단위로 축소한다. (reshape, 파이썬 루프 없음)
+    나누어 떨어지지 않는 가장자리는 fill로 채운다.
+    reduce
+        "mean" 블록 평균
+        "max"  블록 최대
+        "any"  threshold보다 큰 셀이 하나라도 있으면 True
+    (auto_runner map_transform의 블록맵도 이 함수를 쓴다.)
+    """
+    grid = np.asarray(grid)
+    height, width = grid.shape
+    rows, cols = -(-height // block), -(-width // block)
+    if (rows * block, cols * block) != grid.shape:
+        padded = np.full((rows * block, cols * block), fill, dtype=grid.dtype)
+        padded[:height, :width] = grid
+        grid = padded
+    blocks = grid.reshape(rows, block, cols, block)
+    if reduce == "mean":
+        return blocks.mean(axis=(1, 3))
+    if reduce == "max":
+        return blocks.max(axis=(1, 3))
+    if reduce == "any":
+        return (blocks > threshold).any(axis=(1, 3))
+    raise ValueError(f"unknown reduce: {reduce}")
+
+
+def max_known(blocks, axis):
+    """미탐색(0)을 뺀 셀의 최대 로그확율. 블록 전체가 미탐색이면 0"""
+    known = blocks != 0
+    values = np.where(known, blocks, -np.inf).max(axis=axis)
+    return np.where(known.any(axis=axis), values, 0)
+
+
+class MapPyramid:
+    """
+    GridMap의 저해상도 레벨들. (예: 0.1m 맵에서 factors=(5, 10) => 0.5m, 1.0m)
+    맵을 tile_cells x tile_cells 셀 타일로 나누고, 스캔으로 갱신된 타일만 다시 축소한다.
+    레벨 값은 원본과 같은 형식(로그확율)이므로 to_occupancy로 그대로 발행할 수 있다.
+
+    reduce
+        "max"  블록 안에 장애물이 하나라도 있으면 장애물 (경로계획용)
+               미탐색(0) 셀은 빼고 본다. 빈 셀 사이의 미탐색 셀 하나로 블록이 미탐색이 되지 않는다.
+        "mean" 블록 평균
+    """
+
+    REDUCE = {"max": max_known, "mean": np.mean}
+
+    def __init__(self, gridmap, factors=(5, 10), tile_cells=None, reduce="max"):
+        if tile_cells is None:
+            # 모든 배율로 나누어지는 50셀 내외의 크기
+            unit = math.lcm(*factors)
+            tile_cells = unit * max(1, 50 // unit)
+        for factor in factors:
+            if tile_cells % factor:
+                raise ValueError(f"tile_cells({tile_cells}) must be a multiple of {factor}")
+        self.gridmap = gridmap
+        self.factors = (1,) + tuple(factors)
+        self.tile_cells = tile_cells
+        self.reduce = self.REDUCE[reduce]
+        # 레벨별 (tile_row, tile_col) => (tile_cells/factor, tile_cells/factor) 로그확율
+        self.levels = [dict() for _ in factors]
+        # 갱신되었지만 아직 축소하지 않은 타일
+        self.dirty = set()
+        gridmap.layers.append(self)
+
+    def __len__(self):
+        return len(self.factors)
+
+    def resolution(self, level):
+        return self.gridmap.cell_size * self.factors[level]
+
+    def mark(self, rows, cols):
+        """GridMap.mark_dirty에서 호출. 갱신된 셀이 속한 타일을 기록한다."""
+        self.dirty |= tile_keys(rows, cols, self.tile_cells)
+
+    def refresh(self):
+        """기록된 타일만 각 레벨로 다시 축소한다. 갱신한 타일 수를 반환한다."""
+        size = self.tile_cells
+        row0, col0, row1, col1 = self.gridmap.bounds()
+        for key in self.dirty:
+            top, left = key[0] * size, key[1] * size
+            tile = np.zeros((size, size), dtype=self.gridmap.dtype)
+            # 맵 범위(dense GridMap) 밖은 미탐색(0)
+            r0, c0 = max(top, row0), max(left, col0)
+            r1, c1 = min(top + size, row1), min(left + size, col1)
+            if r0 < r1 and c0 < c1:
+                tile[r0 - top : r1 - top, c0 - left : c1 - left] = (
+                    self.gridmap.read_region(r0, c0, r1, c1)
+                )
+            for tiles, factor in zip(self.levels, self.factors[1:]):
+                blocks = tile.reshape(size // factor, factor, size // factor, factor)
+                tiles[key] = self.reduce(blocks, axis=(1, 3)).astype(tile.dtype)
+        count = len(self.dirty)
+        self.dirty.clear()
+        return count
+
+    def bounds(self, level):
+        """레벨 셀 단위의 맵 영역 (row0, col0, row1, col1). 원본 영역을 모두 덮는다."""
+        factor = self.factors[level]
+        row0, col0, row1, col1 = self.gridmap.bounds()
+        return (
+            row0 // factor,
+            col0 // factor,
+            -(-row1 // factor),
+            -(-col1 // factor),
+        )
+
+    def cell_to_position(self, level, row, col):
+        factor = self.factors[level]
+        return self.gridmap.cell_to_position(row * factor, col * factor)
+
+    def get_level(self, level):
+        """
+        레벨의 로그확율 맵과 (resolution, origin)을 반환한다.
+        레벨 0은 원본 맵이다.
+        """
+        row0, col0, row1, col1 = self.bounds(level)
+        origin = self.cell_to_position(level, row0, col0)
+        if level == 0:
+            return self.gridmap.read_region(row0, col0, row1, col1), (
+                self.resolution(0),
+                origin,
+            )
+
+        self.refresh()
+        tiles = self.levels[level - 1]
+        size = self.tile_cells // self.factors[level]
+        grid = np.zeros((row1 - row0, col1 - col0), dtype=self.gridmap.dtype)
+        for tile_row in range(row0 // size, (row1 - 1) // size + 1):
+            for tile_col in range(col0 // size, (col1 - 1) // size + 1):
+                tile = tiles.get((tile_row, tile_col))
+                if tile is None:
+                    continue
+                r0 = max(row0, tile_row * size)
+                r1 = min(row1, (tile_row + 1) * size)
+                c0 = max(col0, tile_col * size)
+                c1 = min(col1, (tile_col + 1) * size)
+                grid[r0 - row0 : r1 - row0, c0 - col0 : c1 - col0] = tile[
+                    r0 - tile_row * size : r1 - tile_row * size,
+                    c0 - tile_col * size : c1 - tile_col * size,
+                ]
+        return grid, (self.resolution(level), origin)
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+
+import os
+import struct
+import threading
+import time
+from typing import NamedTuple
+import numpy as np
+
+# 고정 길이 헤더(64바이트) + int8 맵 데이터(height x width, 행 우선)
+MAGIC = b"OCCMAP01"
+# magic, 맵 버전, stamp(ns), width, height, resolution, origin x, origin y
+HEADER = struct.Struct("<8sqqIIddd")
+HEADER_SIZE = 64
+
+
+class SnapshotHeader(NamedTuple):
+    version: int
+    stamp: int
+    width: int
+    height: int
+    resolution: float
+    origin: tuple
+
+
+def write_snapshot(path, data, resolution, origin, version=0, stamp=0):
+    """임시파일에 쓴 후 교체하므로 읽는 쪽은 항상 완전한 파일을 본다."""
+    data = np.ascontiguousarray(data, dtype=np.int8)
+    height, width = data.shape
+    header = HEADER.pack(
+        MAGIC,
+        version,
+        stamp,
+        width,
+        height,
+        resolution,
+        float(origin[0]),
+        float(origin[1]),
+    )
+
+    tmp_path = f"{path}.tmp"
+    mm = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=(HEADER_SIZE + data.size,))
+    mm[: HEADER.size] = np.frombuffer(header, dtype=np.uint8)
+    mm[HEADER_SIZE:] = data.reshape(-1).view(np.uint8)
+    mm.flush()
+    del mm
+    os.replace(tmp_path, path)
+
+
+def read_header(path) -> SnapshotHeader:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    magic, version, stamp, width, height, resolution, x, y = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"not an occupancy map snapshot: {path}")
+    return SnapshotHeader(version, stamp, width, height, resolution, (x, y))
+
+
+def load_snapshot(path, mode="r") -> tuple[SnapshotHeader, np.memmap]:
+    """헤더와 (height, width) int8 memmap을 반환한다. 값은 0 ~ 100, 미탐색 -1"""
+    header = read_header(path)
+    data = np.memmap(
+        path,
+        dtype=np.int8,
+        mode=mode,
+        offset=HEADER_SIZE,
+        shape=(header.height, header.width),
+    )
+    return header, data
+
+
+def patch_frame_id(frame_id, width, height, origin) -> str:
+    """
+    OccupancyGridUpdate 패치의 header.frame_id. 패치를 만든 전체 맵 영역을 붙인다.
+    "<frame_id>;<width>x<height>@<origin x>,<origin y>"
+    """
+    return f"{frame_id};{width}x{height}@{float(origin[0])!r},{float(origin[1])!r}"
+
+
+def patch_geometry(frame_id):
+    """patch_frame_id => (width, height, (origin x, origin y)), 영역이 없으면 None"""
+    _, sep, geometry = frame_id.rpartition(";")
+    if not sep:
+        return None
+    try:
+        size, origin = geometry.split("@")
+        width, height = size.split("x")
+        x, y = origin.split(",")
+        return int(width), int(height), (float(x), float(y))
+    except ValueError:
+        return None
+
+
+class SnapshotWriter(threading.Thread):
+    """
+    가장 최근에 제출된 맵만 보관하고, min_interval 이상의 간격으로 백그라운드에서 쓴다.
+    ROS 콜백은 submit으로 복사만 하고 바로 돌아간다.
+    """
+
+    def __init__(self, path, min_interval=1.0):
+        super().__init__(daemon=True)
+        self.path = path
+        self.min_interval = min_interval
+        self.written = 0
+        self._pending = None
+        self._stopped = False
+        self._last_write = 0.0
+        self._cond = threading.Condition()
+
+    def submit(self, data, resolution, origin, version=0, stamp=0):
+        with self._cond:
+            self._pending = (np.array(data, dtype=np.int8), resolution, origin, version, stamp)
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                # 쓰기 간격 제한
+                wait = self._last_write + self.min_interval - time.monotonic()
+                if wait > 0 and not self._stopped:
+                    self._cond.wait(wait)
+                    continue
+                pending, self._pending = self._pending, None
+
+            self._write(pending)
+
+    def _write(self, pending):
+        data, resolution, origin, version, stamp = pending
+        write_snapshot(self.path, data, resolution, origin, version, stamp)
+        self._last_write = time.monotonic()
+        self.written += 1
+
+    def close(self):
+        """남은 맵을 기록하고 쓰기 스레드를 종료한다."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join()
+        elif self._pending is not None:
+            self._write(self._pending)
+            self._pending = None
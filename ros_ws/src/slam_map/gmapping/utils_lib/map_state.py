@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+
+import glob
+import json
+import math
+import os
+import time
+import numpy as np
+from .tiled_gridmap import TiledGridMap
+
+# 맵 상태 디렉토리
+#   meta.json          origin, 해상도, 버전, 타일 목록 등. tiles 파일 이름을 가리킨다.
+#   tiles-*.npy        (타일 수, tile_size, tile_size) 로그확율 (탐색한 타일만 저장)
+META_FILE = "meta.json"
+FORMAT = "gmapping-tiles/1"
+
+
+def pack_map_state(gridmap):
+    """
+    TiledGridMap의 상태를 (meta, tiles 배열)로 복사한다.
+    맵을 갱신하는 스레드와 lock을 공유한다면 lock 안에서 호출하고, 쓰기는 밖에서 한다.
+    """
+    keys = sorted(gridmap.tiles)
+    size = gridmap.tile_size
+    tiles = np.zeros((len(keys), size, size), dtype=gridmap.dtype)
+    for index, key in enumerate(keys):
+        tiles[index] = gridmap.tiles[key]
+    meta = dict(
+        format=FORMAT,
+        origin=[float(v) for v in gridmap.origin],
+        resolution=gridmap.cell_size,
+        map_width=float(gridmap.map_width[0]),
+        tile_size=size,
+        fixed_point=gridmap.fixed_point,
+        dtype=gridmap.dtype.str,
+        version=gridmap.version,
+        min_bounds=list(gridmap.min_bounds),
+        extent=None if gridmap.extent is None else list(gridmap.extent),
+        keys=[list(key) for key in keys],
+    )
+    return meta, tiles
+
+
+def write_map_state(path, meta, tiles):
+    """
+    타일 파일을 새 이름으로 쓴 후 meta.json을 교체하므로,
+    읽는 쪽(memmap으로 열고 있는 이전 파일 포함)은 항상 완전한 상태를 본다.
+    """
+    os.makedirs(path, exist_ok=True)
+    tiles_file = f"tiles-{meta['version']}-{time.time_ns()}.npy"
+    np.save(os.path.join(path, tiles_file), tiles)
+
+    meta = dict(meta, tiles=tiles_file)
+    meta_path = os.path.join(path, META_FILE)
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+    # 이전 타일 파일 정리 (열려 있는 memmap은 유효하게 남는다.)
+    for old in glob.glob(os.path.join(path, "tiles-*.npy")):
+        if os.path.basename(old) != tiles_file:
+            os.remove(old)
+    return os.path.join(path, tiles_file)
+
+
+def save_map_state(gridmap, path):
+    return write_map_state(path, *pack_map_state(gridmap))
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT:
+        raise ValueError(f"not a gmapping map state: {path}")
+    return meta
+
+
+def mismatched_settings(meta, cell_size=None, tile_size=None, fixed_point=None):
+    """저장된 맵과 다른 설정 항목의 설명 목록. None인 항목은 비교하지 않는다."""
+    mismatches = []
+    if cell_size is not None and not math.isclose(meta["resolution"], cell_size):
+        mismatches.append(f"resolution {meta['resolution']} != {cell_size}")
+    if tile_size is not None and meta["tile_size"] != tile_size:
+        mismatches.append(f"tile_size {meta['tile_size']} != {tile_size}")
+    if fixed_point is not None and meta["fixed_point"] != fixed_point:
+        mismatches.append(f"fixed_point {meta['fixed_point']} != {fixed_point}")
+    return mismatches
+
+
+def load_map_state(
+    path, logger=None, mmap=True, cell_size=None, tile_size=None, fixed_point=None
+):
+    """
+    저장된 TiledGridMap을 불러온다.
+    mmap이면 타일을 읽기 전용 memmap으로 열어 바로 반환하고(큰 맵도 즉시 시작),
+    스캔이 처음 쓰는 타일만 메모리로 복사한다. (copy-on-write)
+    cell_size, tile_size, fixed_point를 지정하면 저장된 맵과 다를 때 ValueError
+    """
+    meta = read_meta(path)
+    mismatches = mismatched_settings(meta, cell_size, tile_size, fixed_point)
+    if mismatches:
+        raise ValueError(f"map state does not match ({', '.join(mismatches)}): {path}")
+    tiles = np.load(os.path.join(path, meta["tiles"]), mmap_mode="r" if mmap else None)
+    if tiles.dtype != np.dtype(meta["dtype"]):
+        raise ValueError(f"tile dtype {tiles.dtype} != {meta['dtype']}: {path}")
+
+    gridmap = TiledGridMap(
+        (0, 0),
+        logger,
+        cell_size=meta["resolution"],
+        map_width=meta["map_width"],
+        tile_size=meta["tile_size"],
+        fixed_point=meta["fixed_point"],
+    )
+    gridmap.origin = np.array(meta["origin"])
+    gridmap.version = meta["version"]
+    gridmap.min_bounds = tuple(meta["min_bounds"])
+    gridmap.extent = None if meta["extent"] is None else tuple(meta["extent"])
+    gridmap.tiles = {tuple(key): tiles[index] for index, key in enumerate(meta["keys"])}
+    return gridmap
@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+
+import numpy as np
+from .pose_buffer import wrap_angle
+from .scan_matcher import apply_transform
+from .tiled_gridmap import TiledGridMap
+
+# 끝점 주변 3 x 3 셀 중 가장 높은 로그확율로 점수를 매긴다. (셀 경계 오차 완화)
+NEIGHBORS = np.array([(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)])
+
+
+def shared_memory_usage(maps):
+    """맵들이 공유하는 타일은 한번만 센 메모리 사용량(bytes)"""
+    tiles = {id(tile): tile for gridmap in maps for tile in gridmap.tiles.values()}
+    return sum(tile.nbytes for tile in tiles.values())
+
+
+def endpoint_scores(values, scale, fixed_point):
+    """
+    (N, n, 9) 로그확율 => 입자별 로그 가중치 증분 (N,)
+    끝점이 점유 셀일수록 높고, 미탐색(0)은 0.5로 본다.
+    """
+    log_odds = values.max(axis=2).astype(np.float64)
+    if fixed_point:
+        log_odds /= 1000.0
+    p_hit = 0.05 + 0.9 / (1.0 + np.exp(-log_odds))
+    return scale * np.log(p_hit).sum(axis=1)
+
+
+class ParticleFilterSLAM:
+    """
+    Rao-Blackwellized particle filter. 입자마다 pose와 TiledGridMap을 가지며,
+    리샘플링으로 복제된 맵은 타일을 copy-on-write로 공유한다.
+
+    update는 odometry 좌표의 빔 (start, angles)을 받는다. 입자 pose는
+    (빔 시작점, 0번 빔의 월드 각도)로 나타내므로 빔 배치를 몰라도 된다.
+    맵은 기본으로 int16 고정소수점이다. (입자 수만큼 맵을 가지므로 float64의 1/4)
+    """
+
+    def __init__(
+        self,
+        particles=30,
+        cell_size=0.1,
+        map_width=10,
+        motion_noise=(0.005, 0.005, 0.002),
+        motion_scale=(0.1, 0.1, 0.1),
+        score_scale=0.05,
+        resample_threshold=0.5,
+        fixed_point=True,
+        seed=None,
+        initial_map=None,
+    ):
+        self.count = particles
+        self.cell_size = cell_size
+        # 스텝마다 더하는 잡음 표준편차 = motion_noise + motion_scale * |이동량|
+        self.motion_noise = np.array(motion_noise)
+        self.motion_scale = np.array(motion_scale)
+        self.score_scale = score_scale
+        self.resample_threshold = resample_threshold
+        self.fixed_point = fixed_point
+        self.rng = np.random.default_rng(seed)
+
+        if initial_map is not None:
+            # 불러온 맵에서 시작. 모든 입자가 타일을 공유한다.
+            base = initial_map.copy()
+        else:
+            base = TiledGridMap(
+                (0, 0), None, cell_size=cell_size, map_width=map_width, fixed_point=fixed_point
+            )
+        self.maps = [base] + [base.copy() for _ in range(particles - 1)]
+        self.poses = None
+        self.log_weights = np.zeros(particles)
+        self.odom_pose = None
+        self.resampled = 0
+        self._view_index = None
+
+    def weights(self):
+        w = np.exp(self.log_weights - self.log_weights.max())
+        return w / w.sum()
+
+    def effective_count(self):
+        w = self.weights()
+        return 1.0 / np.sum(w * w)
+
+    def best_index(self):
+        return int(np.argmax(self.log_weights))
+
+    def memory_usage(self):
+        return shared_memory_usage(self.maps)
+
+    def _transforms(self, odom_pose):
+        """odometry pose를 각 입자 pose로 옮기는 변환 (N, 3)"""
+        theta = self.poses[:, 2] - odom_pose[2]
+        c, s = np.cos(theta), np.sin(theta)
+        tx = self.poses[:, 0] - (c * odom_pose[0] - s * odom_pose[1])
+        ty = self.poses[:, 1] - (s * odom_pose[0] + c * odom_pose[1])
+        return np.column_stack([tx, ty, theta])
+
+    def _move(self, odom_pose):
+        """odometry 이동량을 입자 좌표계로 적용하고 잡음을 더한다."""
+        dx, dy = odom_pose[:2] - self.odom_pose[:2]
+        c, s = np.cos(self.odom_pose[2]), np.sin(self.odom_pose[2])
+        # 이전 pose 기준 이동량
+        local = np.array([c * dx + s * dy, -s * dx + c * dy])
+        turn = wrap_angle(odom_pose[2] - self.odom_pose[2])
+        if not (np.any(local) or turn):
+            return False
+
+        sigma = self.motion_noise + self.motion_scale * np.abs([local[0], local[1], turn])
+        noise = self.rng.normal(0.0, 1.0, (self.count, 3)) * sigma
+        c, s = np.cos(self.poses[:, 2]), np.sin(self.poses[:, 2])
+        lx, ly = local[0] + noise[:, 0], local[1] + noise[:, 1]
+        self.poses[:, 0] += c * lx - s * ly
+        self.poses[:, 1] += s * lx + c * ly
+        self.poses[:, 2] += turn + noise[:, 2]
+        return True
+
+    def _endpoint_cells(self, transforms, start, angles, ranges, hit):
+        """모든 입자의 끝점 주변 3 x 3 셀 (N, n * 9) rows, cols"""
+        ends = start[hit] + ranges[hit, None] * np.column_stack(
+            [np.cos(angles[hit]), np.sin(angles[hit])]
+        )
+        c, s = np.cos(transforms[:, 2:3]), np.sin(transforms[:, 2:3])
+        x = c * ends[:, 0] - s * ends[:, 1] + transforms[:, 0:1]
+        y = s * ends[:, 0] + c * ends[:, 1] + transforms[:, 1:2]
+        gridmap = self.maps[0]
+        cols = np.floor((x - gridmap.origin[0]) / self.cell_size).astype(np.int64)
+        rows = np.floor((y - gridmap.origin[1]) / self.cell_size).astype(np.int64)
+        rows = rows[:, :, None] + NEIGHBORS[:, 0]
+        cols = cols[:, :, None] + NEIGHBORS[:, 1]
+        return rows.reshape(self.count, -1), cols.reshape(self.count, -1)
+
+    def _score(self, rows, cols, beams):
+        """입자별 끝점 로그확율로 로그 가중치 증분을 계산한다."""
+        values = self._gather(rows, cols)
+        return endpoint_scores(
+            values.reshape(self.count, beams, -1), self.score_scale, self.fixed_point
+        )
+
+    def _gather(self, rows, cols):
+        """
+        모든 입자의 (rows, cols) 셀 값 (N, m).
+        끝점이 닿는 타일을 입자들이 공유하는 것끼리 한번만 모아 한 배열로 쌓고,
+        한번의 인덱싱으로 읽는다. (입자별 values_at 반복 없음)
+        """
+        size = self.maps[0].tile_size
+        tile_rows, local_rows = np.divmod(rows, size)
+        tile_cols, local_cols = np.divmod(cols, size)
+        # 타일 번호를 (이번 끝점 범위 기준) 정수 하나로 묶는다.
+        row0, col0 = int(tile_rows.min()), int(tile_cols.min())
+        width = int(tile_cols.max()) - col0 + 1
+        codes, inverse = np.unique(
+            (tile_rows - row0) * width + (tile_cols - col0), return_inverse=True
+        )
+        keys = np.column_stack(np.divmod(codes, width)) + (row0, col0)
+        # (입자, 타일 키) => 쌓은 배열의 위치. 0은 할당되지 않은 타일 (값 0)
+        stack = [np.zeros((size, size), dtype=self.maps[0].dtype)]
+        slots = {}
+        table = np.zeros((self.count, len(keys)), dtype=np.int64)
+        for k, key in enumerate(map(tuple, keys.tolist())):
+            for i, gridmap in enumerate(self.maps):
+                tile = gridmap.tiles.get(key)
+                if tile is None:
+                    continue
+                slot = slots.get(id(tile))
+                if slot is None:
+                    slot = slots[id(tile)] = len(stack)
+                    stack.append(tile)
+                table[i, k] = slot
+        slot = table[np.arange(self.count)[:, None], inverse.reshape(rows.shape)]
+        return np.stack(stack)[slot, local_rows, local_cols]
+
+    def _resample(self):
+        """저분산(systematic) 리샘플링. 복제된 입자의 맵은 타일을 공유한다."""
+        w = self.weights()
+        positions = (self.rng.random() + np.arange(self.count)) / self.count
+        index = np.minimum(np.searchsorted(np.cumsum(w), positions), self.count - 1)
+
+        maps = []
+        used = set()
+        for i in index.tolist():
+            if i in used:
+                maps.append(self.maps[i].copy())
+            else:
+                maps.append(self.maps[i])
+                used.add(i)
+        self.maps = maps
+        self.poses = self.poses[index]
+        self.log_weights = np.zeros(self.count)
+        self.resampled += 1
+        # 보고 있던 입자가 바뀌었을 수 있으므로 다음 sync에서 전체를 다시 보낸다.
+        self._view_index = None
+
+    def update(self, start, angles, ranges, p=0.7, max_range=None):
+        """odometry 좌표의 한 스캔으로 입자를 이동, 평가, 리샘플링하고 맵에 적분한다."""
+        start = np.broadcast_to(np.asarray(start, dtype=np.float64), (len(ranges), 2))
+        angles = np.asarray(angles, dtype=np.float64)
+        ranges = np.asarray(ranges, dtype=np.float64)
+        odom_pose = np.array([start[0, 0], start[0, 1], angles[0]])
+
+        if self.poses is None:
+            # 첫 스캔: 모든 입자가 odometry pose에서 시작
+            self.poses = np.tile(odom_pose, (self.count, 1))
+        elif self._move(odom_pose):
+            hit = np.isfinite(ranges) & (ranges > 0)
+            if max_range is not None:
+                hit &= ranges < max_range
+            if hit.any():
+                transforms = self._transforms(odom_pose)
+                rows, cols = self._endpoint_cells(transforms, start, angles, ranges, hit)
+                self.log_weights += self._score(rows, cols, int(hit.sum()))
+                self.log_weights -= self.log_weights.max()
+                if self.effective_count() < self.resample_threshold * self.count:
+                    self._resample()
+        self.odom_pose = odom_pose
+
+        for gridmap, transform in zip(self.maps, self._transforms(odom_pose)):
+            gridmap.add_scan(*apply_transform(transform, start, angles), ranges, p, max_range)
+
+    def sync_view(self, view):
+        """
+        발행용 TiledGridMap(view)이 가장 가중치가 높은 입자의 맵을 가리키게 한다.
+        같은 입자면 그 입자의 변경 영역만, 입자가 바뀌면 전체를 갱신된 것으로 표시한다.
+        """
+        index = self.best_index()
+        best = self.maps[index]
+        region = best.pop_dirty()
+        for gridmap in self.maps:
+            gridmap.dirty = None
+        if index != self._view_index:
+            region = best.bounds()
+            self._view_index = index
+
+        view.tiles = best.tiles
+        view.extent = best.extent
+        if region is not None:
+            view.version += 1
+            view.mark_region(*region)
+        return index
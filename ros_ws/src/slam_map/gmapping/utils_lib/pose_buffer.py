@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+import time
+import numpy as np
+
+
+def wrap_angle(angle):
+    """-pi ~ pi 범위로 변환"""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+class PoseBuffer:
+    """
+    시간순 (stamp, x, y, theta) 링버퍼. 스캔 시각의 pose를 앞뒤 두 pose로 보간한다.
+    각 샘플을 i와 i + capacity 두 곳에 써서 최근 capacity개가 항상 연속된 구간이 되므로
+    np.searchsorted로 O(log n) 조회한다.
+
+    lookup 결과가 None인 경우
+        버퍼의 가장 오래된 pose보다 이전 시각 => too_old (스캔 폐기)
+        최신 pose보다 max_extrapolation 이상 이후 시각 => too_new (odometry 지연)
+
+    보간하려면 pose와 스캔의 stamp가 같은 시계(ROS 시각 또는 같은 시뮬레이션 시각)여야 한다.
+    버퍼 범위에서 clock_mismatch의 tolerance 이상 벗어나면 시계가 다른 것으로 보고,
+    호출하는 쪽은 latest_pose로 대신한다.
+    """
+
+    def __init__(self, capacity=512, max_extrapolation=0.1):
+        self.capacity = capacity
+        # 최신 pose보다 이만큼(ns) 늦은 시각까지는 최신 pose를 사용한다.
+        self.max_extrapolation = int(max_extrapolation * 1e9)
+        self._stamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._poses = np.zeros((2 * capacity, 3), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+        # 통계
+        self.too_old = 0
+        self.too_new = 0
+        self.out_of_order = 0
+        # 시계가 달라 최신 pose로 대신한 횟수
+        self.fallbacks = 0
+        self.lookups = 0
+        self.lookup_time = 0.0
+        self.lookup_time_max = 0.0
+
+    def __len__(self):
+        return self._count
+
+    def _window(self):
+        start = self._next - self._count + self.capacity
+        return slice(start, start + self._count)
+
+    def add(self, stamp, x, y, theta):
+        """stamp(ns)는 증가해야 한다. 이전 시각의 pose는 무시한다."""
+        if self._count and stamp <= self._stamps[self._window()][-1]:
+            self.out_of_order += 1
+            return False
+        index = self._next
+        for slot in (index, index + self.capacity):
+            self._stamps[slot] = stamp
+            self._poses[slot] = (x, y, theta)
+        self._next = (index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return True
+
+    def oldest(self):
+        return int(self._stamps[self._window()][0]) if self._count else None
+
+    def latest(self):
+        return int(self._stamps[self._window()][-1]) if self._count else None
+
+    def latest_pose(self):
+        """가장 최근 pose (x, y, theta), 없으면 None"""
+        if not self._count:
+            return None
+        self.fallbacks += 1
+        return self._poses[self._window()][-1].copy()
+
+    def clock_mismatch(self, stamps, tolerance=1.0):
+        """
+        stamps가 버퍼 범위에서 tolerance(s) 이상 벗어나면 True.
+        stamp가 0이거나 pose와 스캔이 다른 시계를 쓰는 경우로 본다.
+        """
+        if not self._count:
+            return False
+        stamps = np.asarray(stamps, dtype=np.int64)
+        window = self._window()
+        margin = int(tolerance * 1e9)
+        return bool(
+            stamps.min() < self._stamps[window][0] - margin
+            or stamps.max() > self._stamps[window][-1] + margin
+        )
+
+    def lookup(self, stamps):
+        """
+        stamps(ns, 스칼라 또는 배열) 시각의 pose (x, y, theta)를 반환한다.
+        x, y는 선형, theta는 -pi ~ pi 경계를 고려해 보간한다.
+        """
+        started = time.perf_counter()
+        try:
+            return self._lookup(stamps)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.lookups += 1
+            self.lookup_time += elapsed
+            self.lookup_time_max = max(self.lookup_time_max, elapsed)
+
+    def _lookup(self, stamps):
+        if self._count == 0:
+            self.too_new += 1
+            return None
+        window = self._window()
+        buffer_stamps = self._stamps[window]
+        buffer_poses = self._poses[window]
+        stamps = np.asarray(stamps, dtype=np.int64)
+
+        if stamps.min() < buffer_stamps[0]:
+            self.too_old += 1
+            return None
+        if stamps.max() > buffer_stamps[-1] + self.max_extrapolation:
+            self.too_new += 1
+            return None
+
+        # 최신 pose 이후 시각은 최신 pose로 고정
+        stamps = np.minimum(stamps, buffer_stamps[-1])
+        if self._count == 1:
+            return np.broadcast_to(buffer_poses[0], stamps.shape + (3,)).copy()
+        upper = np.clip(np.searchsorted(buffer_stamps, stamps), 1, self._count - 1)
+        lower = upper - 1
+
+        t0 = buffer_stamps[lower]
+        ratio = ((stamps - t0) / (buffer_stamps[upper] - t0))[..., None]
+        p0 = buffer_poses[lower]
+        p1 = buffer_poses[upper]
+        pose = p0 + (p1 - p0) * ratio
+        pose[..., 2] = wrap_angle(p0[..., 2] + wrap_angle(p1[..., 2] - p0[..., 2]) * ratio[..., 0])
+        return pose
+
+    def stats(self):
+        """조회 횟수, 평균/최대 조회시간(ms), 폐기 횟수"""
+        return dict(
+            lookups=self.lookups,
+            mean_ms=1e3 * self.lookup_time / self.lookups if self.lookups else 0.0,
+            max_ms=1e3 * self.lookup_time_max,
+            too_old=self.too_old,
+            too_new=self.too_new,
+            out_of_order=self.out_of_order,
+            fallbacks=self.fallbacks,
+        )
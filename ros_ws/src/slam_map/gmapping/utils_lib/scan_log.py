@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+# 로그 디렉토리 구성 (레코드 i는 세 파일의 i번째 행)
+#   meta.json   빔 배치 (n_ranges, angle_min, angle_increment, range_max)
+#   stamp.i64   int64 timestamp(ns), 시간순 => 타임스탬프 인덱스
+#   pose.f32    float32 (x, y, theta)
+#   ranges.f32  float32 x n_ranges
+META_FILE = "meta.json"
+STAMP_FILE = "stamp.i64"
+POSE_FILE = "pose.f32"
+RANGES_FILE = "ranges.f32"
+
+
+class ScanLogWriter(threading.Thread):
+    """
+    pose와 거리측정값을 고정폭 float32 레코드로 모아 두었다가,
+    chunk_records개가 차거나 flush_interval초가 지나면 백그라운드에서 파일에 덧붙인다.
+    """
+
+    def __init__(
+        self,
+        log_dir,
+        n_ranges,
+        angle_min,
+        angle_increment,
+        range_max=float("inf"),
+        chunk_records=256,
+        flush_interval=1.0,
+    ):
+        super().__init__(daemon=True)
+        self.log_dir = log_dir
+        self.n_ranges = n_ranges
+        self.chunk_records = chunk_records
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.dropped = 0
+
+        os.makedirs(log_dir, exist_ok=True)
+        for name in (STAMP_FILE, POSE_FILE, RANGES_FILE):
+            open(os.path.join(log_dir, name), "wb").close()
+        with open(os.path.join(log_dir, META_FILE), "w") as f:
+            json.dump(
+                dict(
+                    n_ranges=n_ranges,
+                    angle_min=angle_min,
+                    angle_increment=angle_increment,
+                    range_max=range_max,
+                ),
+                f,
+            )
+
+        self._lock = threading.Lock()
+        self._chunks = queue.Queue()
+        self._stopped = threading.Event()
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self._stamps = np.empty(self.chunk_records, dtype=np.int64)
+        self._poses = np.empty((self.chunk_records, 3), dtype=np.float32)
+        self._ranges = np.empty((self.chunk_records, self.n_ranges), dtype=np.float32)
+        self._count = 0
+
+    def _swap_chunk(self):
+        # lock 안에서 호출. 채워진 부분만 쓰기 큐로 넘긴다.
+        if self._count:
+            count = self._count
+            self._chunks.put(
+                (self._stamps[:count], self._poses[:count], self._ranges[:count])
+            )
+            self._new_chunk()
+
+    def append(self, stamp, pose, ranges):
+        """ROS 콜백에서 호출. 버퍼에 복사만 한다."""
+        if len(ranges) != self.n_ranges:
+            self.dropped += 1
+            return
+        with self._lock:
+            index = self._count
+            self._stamps[index] = stamp
+            self._poses[index] = pose
+            self._ranges[index] = ranges
+            self._count += 1
+            self.records += 1
+            if self._count == self.chunk_records:
+                self._swap_chunk()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                chunk = self._chunks.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # 시간 경과 => 모인 만큼 기록
+                with self._lock:
+                    self._swap_chunk()
+                continue
+            self._write(chunk)
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                self._write(self._chunks.get_nowait())
+            except queue.Empty:
+                return
+
+    def _write(self, chunk):
+        for name, array in zip((STAMP_FILE, POSE_FILE, RANGES_FILE), chunk):
+            with open(os.path.join(self.log_dir, name), "ab") as f:
+                f.write(array.tobytes())
+
+    def close(self):
+        """남은 레코드를 기록하고 종료한다."""
+        with self._lock:
+            self._swap_chunk()
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        else:
+            self._drain()
+
+
+class ScanLogReader:
+    """ScanLogWriter로 기록한 로그를 memmap으로 읽는다. (재생/분석용)"""
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        with open(os.path.join(log_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.n_ranges = self.meta["n_ranges"]
+        self.angle_min = self.meta["angle_min"]
+        self.angle_increment = self.meta["angle_increment"]
+        self.range_max = self.meta.get("range_max", float("inf"))
+
+        # 기록 중단 등으로 길이가 다르면 완전한 레코드까지만 사용
+        count = min(
+            self._records(STAMP_FILE, 8),
+            self._records(POSE_FILE, 3 * 4),
+            self._records(RANGES_FILE, self.n_ranges * 4),
+        )
+        self.stamps = self._map(STAMP_FILE, np.int64, (count,))
+        self.poses = self._map(POSE_FILE, np.float32, (count, 3))
+        self.ranges = self._map(RANGES_FILE, np.float32, (count, self.n_ranges))
+
+    def _records(self, name, record_size):
+        return os.path.getsize(os.path.join(self.log_dir, name)) // record_size
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.log_dir, name), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.stamps.shape[0]
+
+    def beam_angles(self):
+        """로봇 기준 빔 각도"""
+        return self.angle_min + np.arange(self.n_ranges) * self.angle_increment
+
+    def index_range(self, start_stamp=None, end_stamp=None):
+        """[start_stamp, end_stamp) 구간 레코드의 slice"""
+        start = 0 if start_stamp is None else np.searchsorted(self.stamps, start_stamp)
+        end = len(self) if end_stamp is None else np.searchsorted(self.stamps, end_stamp)
+        return slice(int(start), int(end))
+
+
+def load_text_log(pose_file, measurement_file):
+    """이전 텍스트 로그(pose.txt, measurements.txt)를 읽는다. (timestamp,값,...)"""
+    # ns 단위 timestamp는 float64로 읽으면 정밀도가 손실된다.
+    stamps = np.loadtxt(pose_file, delimiter=",", usecols=0, dtype=np.int64, ndmin=1)
+    poses = np.loadtxt(pose_file, delimiter=",", ndmin=2)[:, 1:4]
+    ranges = np.loadtxt(measurement_file, delimiter=",", ndmin=2)[:, 1:]
+    return stamps, poses, ranges
+
+
+def convert_text_log(pose_file, measurement_file, log_dir, angle_min, angle_increment):
+    """텍스트 로그를 바이너리 로그로 변환한다."""
+    stamps, poses, ranges = load_text_log(pose_file, measurement_file)
+    writer = ScanLogWriter(
+        log_dir, ranges.shape[1], angle_min, angle_increment, chunk_records=len(stamps) or 1
+    )
+    for record in zip(stamps, poses, ranges):
+        writer.append(*record)
+    writer.close()
+    return ScanLogReader(log_dir)
@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+
+import numpy as np
+from .distance_field import likelihood_field
+
+
+def apply_transform(transform, start, angles):
+    """(tx, ty, theta) 강체변환을 빔 시작점 (n, 2)와 월드 각도 (n,)에 적용한다."""
+    tx, ty, theta = transform
+    c, s = np.cos(theta), np.sin(theta)
+    start = np.asarray(start, dtype=np.float64)
+    moved = np.empty(start.shape)
+    moved[..., 0] = c * start[..., 0] - s * start[..., 1] + tx
+    moved[..., 1] = s * start[..., 0] + c * start[..., 1] + ty
+    return moved, np.asarray(angles) + theta
+
+
+def compose(a, b):
+    """a(b(p)) 변환"""
+    ax, ay, at = a
+    bx, by, bt = b
+    c, s = np.cos(at), np.sin(at)
+    return (c * bx - s * by + ax, s * bx + c * by + ay, at + bt)
+
+
+class CorrelativeScanMatcher:
+    """
+    스캔 끝점을 맵의 likelihood field에 맞춰 pose 보정량을 찾는다.
+    likelihood field를 max-pooling으로 levels 단계 축소해 두고,
+    가장 거친 레벨에서 탐색창 전체를, 이후 레벨에서는 상위 후보들 주변만 탐색한다.
+    회전 후보는 모든 끝점에 한번에(벡터) 적용한다.
+    """
+
+    def __init__(
+        self,
+        cell_size,
+        sigma=0.1,
+        max_distance=0.5,
+        window=0.3,
+        angle_window=0.15,
+        angle_step=0.01,
+        levels=3,
+        min_points=10,
+        min_occupied=50,
+        min_score=0.3,
+        candidates=8,
+        min_improvement=0.02,
+        prior_weight=0.1,
+    ):
+        self.cell_size = cell_size
+        self.sigma = sigma
+        self.max_distance = max_distance
+        self.window = window
+        self.angle_window = angle_window
+        self.angle_step = angle_step
+        self.levels = levels
+        self.min_points = min_points
+        self.min_occupied = min_occupied
+        self.min_score = min_score
+        # 레벨마다 세밀하게 다시 평가할 상위 후보 수
+        self.candidates = candidates
+        # 보정 전보다 이만큼 이상 점수가 올라야 보정한다. (작은 보정이 누적되는 것을 막음)
+        self.min_improvement = min_improvement
+        # odometry를 믿는 정도. 탐색창 끝까지 보정하면 점수에서 이만큼 뺀다.
+        self.prior_weight = prior_weight
+        # prepare로 만든 레벨별 field, field[0]의 (0, 0) 셀 월드좌표
+        self.fields = None
+        self.base = None
+
+    def prepare(self, gridmap, center, radius):
+        """
+        center 주변 radius(m) 영역의 likelihood field 피라미드를 만든다.
+        점유 셀이 min_occupied 미만이면 False (매칭 생략)
+        """
+        row, col = (
+            int((center[1] - gridmap.origin[1]) / self.cell_size),
+            int((center[0] - gridmap.origin[0]) / self.cell_size),
+        )
+        cells = int(np.ceil(radius / self.cell_size))
+        row0, col0, row1, col1 = gridmap.bounds()
+        row0, col0 = max(row0, row - cells), max(col0, col - cells)
+        row1, col1 = min(row1, row + cells), min(col1, col + cells)
+        if row0 >= row1 or col0 >= col1:
+            self.fields = None
+            return False
+
+        occupied = gridmap.read_region(row0, col0, row1, col1) > 0
+        if np.count_nonzero(occupied) < self.min_occupied:
+            self.fields = None
+            return False
+
+        field = likelihood_field(occupied, self.cell_size, self.sigma, self.max_distance)
+        self.fields = [field]
+        for _ in range(1, self.levels):
+            # 거친 레벨의 값은 해당 영역 세밀한 값의 최대값 (상한)
+            height, width = field.shape
+            padded = np.zeros((height + height % 2, width + width % 2))
+            padded[:height, :width] = field
+            field = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(
+                axis=(1, 3)
+            )
+            self.fields.append(field)
+        self.base = np.array(gridmap.cell_to_position(row0, col0))
+        return True
+
+    def _scores(self, level, points, thetas, shifts):
+        """
+        points (n, 2) 원점 기준 끝점(셀), thetas (T,), shifts (S, 2) 이동량(셀)
+        => (T, S) 평균 likelihood
+        """
+        field = self.fields[level]
+        c, s = np.cos(thetas)[:, None], np.sin(thetas)[:, None]
+        x = c * points[:, 0] - s * points[:, 1]
+        y = s * points[:, 0] + c * points[:, 1]
+        # (T, S, n)
+        x = x[:, None, :] + shifts[None, :, 0, None]
+        y = y[:, None, :] + shifts[None, :, 1, None]
+        cols = np.floor(x / (1 << level)).astype(np.intp)
+        rows = np.floor(y / (1 << level)).astype(np.intp)
+        inside = (rows >= 0) & (rows < field.shape[0]) & (cols >= 0) & (cols < field.shape[1])
+        values = field[np.where(inside, rows, 0), np.where(inside, cols, 0)]
+        return np.where(inside, values, 0.0).mean(axis=2)
+
+    def match(self, start, angles, ranges, max_range=None):
+        """
+        빔 시작점 (n, 2)와 월드 각도 (n,)로 본 스캔의 보정 변환 (tx, ty, theta)과 점수를 반환한다.
+        매칭하지 못하면 (None, 점수)
+        """
+        if self.fields is None:
+            return None, 0.0
+        start = np.broadcast_to(np.asarray(start, dtype=np.float64), (len(ranges), 2))
+        ranges = np.asarray(ranges, dtype=np.float64)
+        hit = np.isfinite(ranges) & (ranges > 0)
+        if max_range is not None:
+            hit &= ranges < max_range
+        if np.count_nonzero(hit) < self.min_points:
+            return None, 0.0
+
+        angles = np.asarray(angles, dtype=np.float64)[hit]
+        ends = start[hit] + ranges[hit, None] * np.column_stack([np.cos(angles), np.sin(angles)])
+        # 회전 중심 (스캔 원점)을 기준으로 한 셀 좌표
+        origin = start[hit].mean(axis=0)
+        origin_cell = (origin - self.base) / self.cell_size
+        points = (ends - origin) / self.cell_size
+
+        # 가장 거친 레벨: 탐색창 전체 (회전은 angle_step 간격 전체)
+        level = self.levels - 1
+        step = 1 << level
+        reach = int(np.ceil(self.window / self.cell_size / step)) * step
+        offsets = np.arange(-reach, reach + 1, step)
+        thetas = np.arange(-self.angle_window, self.angle_window + 1e-9, self.angle_step)
+        candidates = self._search(level, points, origin_cell, thetas, offsets, offsets)
+
+        # 세밀한 레벨: 상위 후보들의 회전은 그대로 두고 주변 이동량만 다시 평가
+        for level in range(self.levels - 2, -1, -1):
+            step = 1 << level
+            refined = []
+            for theta, dx, dy, _ in candidates:
+                refined.extend(
+                    self._search(
+                        level,
+                        points,
+                        origin_cell,
+                        np.array([theta]),
+                        dx + np.array([-step, 0, step]),
+                        dy + np.array([-step, 0, step]),
+                    )
+                )
+            refined.sort(key=lambda candidate: -candidate[3])
+            candidates = refined[: self.candidates]
+        theta, dx, dy, score = candidates[0]
+
+        # 보정 전 점수보다 충분히 나아지지 않으면 보정하지 않는다.
+        identity = self._scores(0, points + origin_cell, np.zeros(1), np.zeros((1, 2)))[0, 0]
+        if score < self.min_score or score < identity + self.min_improvement:
+            return None, float(identity)
+
+        # 원점 기준 회전 + 이동 => 월드 변환
+        c, s = np.cos(theta), np.sin(theta)
+        shift = np.array([dx, dy]) * self.cell_size
+        tx = origin[0] - (c * origin[0] - s * origin[1]) + shift[0]
+        ty = origin[1] - (s * origin[0] + c * origin[1]) + shift[1]
+        return (float(tx), float(ty), float(theta)), float(score)
+
+    def _search(self, level, points, origin_cell, thetas, dxs, dys):
+        """회전 x 이동 후보를 평가해 점수가 높은 candidates개 (theta, dx, dy, 점수)를 반환한다."""
+        thetas = np.unique(thetas)
+        dx, dy = np.meshgrid(dxs, dys, indexing="ij")
+        shifts = np.column_stack([dx.ravel(), dy.ravel()]).astype(np.float64)
+        scores = self._scores(level, points, thetas, shifts + origin_cell)
+        # 보정량이 클수록 감점 (odometry prior), 점수가 같으면 작은 보정을 고른다.
+        penalty = self.prior_weight * (
+            np.abs(thetas)[:, None] / self.angle_window
+            + np.hypot(shifts[:, 0], shifts[:, 1]) * self.cell_size / self.window
+        )
+        ranked = (scores - penalty).ravel()
+        count = min(self.candidates, ranked.size)
+        best = np.argpartition(-ranked, count - 1)[:count]
+        t, s = np.unravel_index(best, scores.shape)
+        return [
+            (thetas[i], shifts[j, 0], shifts[j, 1], scores[i, j] - penalty[i, j])
+            for i, j in zip(t.tolist(), s.tolist())
+        ]
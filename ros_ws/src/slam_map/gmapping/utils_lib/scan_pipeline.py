@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+
+import queue
+import threading
+import time
+import numpy as np
+from .scan_matcher import apply_transform, compose
+
+
+class StageStats:
+    """단계별 처리 횟수와 평균/최대 시간(ms)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed, count=1):
+        with self._lock:
+            self.count += count
+            self.total += elapsed * count
+            self.max = max(self.max, elapsed)
+
+    def summary(self):
+        """(횟수, 평균ms, 최대ms)를 반환하고 초기화한다."""
+        with self._lock:
+            mean = self.total / self.count if self.count else 0.0
+            result = (self.count, 1e3 * mean, 1e3 * self.max)
+            self.reset()
+        return result
+
+
+class ScanIntegrator(threading.Thread):
+    """
+    ROS 콜백이 넣은 스캔을 모아 한번의 add_scan으로 맵에 적분한다.
+    맵은 lock으로 보호하며, 발행 단계는 같은 lock 안에서 변경 영역만 복사해 간다.
+    큐가 가득 차면 가장 오래된 스캔을 버린다.
+
+    matcher가 지정되면 각 스캔을 적분하기 전에 맵에 맞춰 pose를 보정한다.
+    보정량은 누적되어(correction) 이후 스캔의 odometry에도 적용된다.
+
+    particle_filter가 지정되면 스캔을 입자 필터로 적분하고,
+    gridmap은 가장 가중치가 높은 입자의 맵을 보여주는 발행용 맵이 된다.
+    """
+
+    def __init__(
+        self,
+        gridmap,
+        p=0.7,
+        batch_size=8,
+        max_queue=64,
+        matcher=None,
+        match_radius=10.5,
+        particle_filter=None,
+    ):
+        super().__init__(daemon=True)
+        self.gridmap = gridmap
+        self.p = p
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.matcher = matcher
+        self.match_radius = match_radius
+        self.particle_filter = particle_filter
+        # odometry => 맵 좌표 보정 변환 (tx, ty, theta)
+        self.correction = (0.0, 0.0, 0.0)
+        self.matched = 0
+        self.dropped = 0
+        self.max_depth = 0
+        # 콜백 => 적분 완료 지연, 배치 적분 시간
+        self.latency = StageStats()
+        self.integrate_time = StageStats()
+        self.match_time = StageStats()
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = threading.Event()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, start, angles, ranges, max_range=None):
+        """ROS 콜백에서 호출. 복사한 스캔을 큐에 넣기만 한다."""
+        item = (
+            np.broadcast_to(np.asarray(start, dtype=np.float64), (len(ranges), 2)),
+            np.asarray(angles, dtype=np.float64),
+            np.array(ranges, dtype=np.float64),
+            max_range,
+            time.perf_counter(),
+        )
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if batch:
+                self.integrate(batch)
+
+    def integrate(self, batch):
+        if self.particle_filter is not None:
+            self.integrate_particles(batch)
+            return
+        if self.matcher is not None:
+            batch = self.correct(batch)
+
+        # max_range가 같은 스캔끼리 빔을 이어붙여 적분한다.
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[3], []).append(item)
+
+        started = time.perf_counter()
+        with self.lock:
+            for max_range, items in groups.items():
+                self.gridmap.add_scan(
+                    np.concatenate([item[0] for item in items]),
+                    np.concatenate([item[1] for item in items]),
+                    np.concatenate([item[2] for item in items]),
+                    self.p,
+                    max_range=max_range,
+                )
+        finished = time.perf_counter()
+        self.integrate_time.add(finished - started)
+        for item in batch:
+            self.latency.add(finished - item[4])
+
+    def integrate_particles(self, batch):
+        """입자 필터는 스캔마다 리샘플링 여부가 달라지므로 한 스캔씩 적분한다."""
+        started = time.perf_counter()
+        with self.lock:
+            for start, angles, ranges, max_range, _ in batch:
+                self.particle_filter.update(start, angles, ranges, self.p, max_range)
+            self.particle_filter.sync_view(self.gridmap)
+        finished = time.perf_counter()
+        self.integrate_time.add(finished - started)
+        for item in batch:
+            self.latency.add(finished - item[4])
+
+    def correct(self, batch):
+        """누적 보정을 적용한 후 스캔별로 맵에 매칭해 보정량을 갱신한다."""
+        started = time.perf_counter()
+        corrected = []
+        with self.lock:
+            center = apply_transform(self.correction, batch[0][0][0], 0.0)[0]
+            ready = self.matcher.prepare(self.gridmap, center, self.match_radius)
+        for start, angles, ranges, max_range, stamp in batch:
+            start, angles = apply_transform(self.correction, start, angles)
+            if ready:
+                transform, _ = self.matcher.match(start, angles, ranges, max_range)
+                if transform is not None:
+                    self.correction = compose(transform, self.correction)
+                    start, angles = apply_transform(transform, start, angles)
+                    self.matched += 1
+            corrected.append((start, angles, ranges, max_range, stamp))
+        self.match_time.add(time.perf_counter() - started)
+        return corrected
+
+    def close(self):
+        """남은 스캔을 적분하고 종료한다."""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break
+            self.integrate(batch)
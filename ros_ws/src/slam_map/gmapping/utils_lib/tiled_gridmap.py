@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+
+import numpy as np
+from .gridmap import GridMap, trace_cells
+
+TILE_SIZE = 64
+
+
+class TiledGridMap(GridMap):
+    """
+    tile_size x tile_size 셀 단위의 타일을 필요할 때만 할당하는 맵.
+    셀 (0, 0)은 origin이고 음수 인덱스를 포함해 모든 방향으로 확장된다.
+    메모리는 탐색한 영역에 비례한다.
+    copy()한 맵끼리는 타일을 공유하고, 쓰기 전에만 타일을 복사한다. (copy-on-write)
+    """
+
+    def __init__(
+        self,
+        center,
+        logger,
+        cell_size=0.1,
+        map_width=10,
+        tile_size=TILE_SIZE,
+        ray_table=None,
+        fixed_point=False,
+    ):
+        self.map_width = np.array([map_width, map_width])
+        self.cell_size = cell_size
+        self.fixed_point = fixed_point
+        self.dtype = np.dtype(np.int16 if fixed_point else np.float64)
+        self.tile_size = tile_size
+        self.origin = np.array(center) - self.map_width / 2
+        self.debugger = logger
+        self.version = 0
+        self.dirty = None
+        self.ray_table = ray_table
+        self.layers = []
+
+        # (tile_row, tile_col) => (tile_size, tile_size) 로그확율
+        self.tiles = {}
+        # 이 맵만 참조하는(바로 쓸 수 있는) 타일
+        self._owned = set()
+        # 발행 시 최소 영역 (초기 map_width 영역), 갱신된 셀 전체 영역
+        cells = int(map_width / cell_size)
+        self.min_bounds = (0, 0, cells, cells)
+        self.extent = None
+
+    @property
+    def grid(self):
+        return self.get_map()
+
+    def get_map(self):
+        return self.read_region(*self.bounds())
+
+    def bounds(self):
+        """초기 영역과 갱신된 셀 영역을 모두 포함하는 (row0, col0, row1, col1)"""
+        if self.extent is None:
+            return self.min_bounds
+        return (
+            min(self.min_bounds[0], self.extent[0]),
+            min(self.min_bounds[1], self.extent[1]),
+            max(self.min_bounds[2], self.extent[2]),
+            max(self.min_bounds[3], self.extent[3]),
+        )
+
+    def memory_usage(self):
+        return sum(tile.nbytes for tile in self.tiles.values())
+
+    def read_region(self, row0, col0, row1, col1):
+        """셀 영역을 dense 배열로 만든다. 할당되지 않은 타일은 0 (미탐색)"""
+        size = self.tile_size
+        region = np.zeros((row1 - row0, col1 - col0), dtype=self.dtype)
+        for tile_row in range(row0 // size, (row1 - 1) // size + 1):
+            for tile_col in range(col0 // size, (col1 - 1) // size + 1):
+                tile = self.tiles.get((tile_row, tile_col))
+                if tile is None:
+                    continue
+                # 타일과 영역이 겹치는 부분
+                r0 = max(row0, tile_row * size)
+                r1 = min(row1, (tile_row + 1) * size)
+                c0 = max(col0, tile_col * size)
+                c1 = min(col1, (tile_col + 1) * size)
+                region[r0 - row0 : r1 - row0, c0 - col0 : c1 - col0] = tile[
+                    r0 - tile_row * size : r1 - tile_row * size,
+                    c0 - tile_col * size : c1 - tile_col * size,
+                ]
+        return region
+
+    def values_at(self, rows, cols):
+        """셀들의 로그확율 값 (할당되지 않은 타일은 0)"""
+        tile_rows, local_rows = np.divmod(rows, self.tile_size)
+        tile_cols, local_cols = np.divmod(cols, self.tile_size)
+        values = np.zeros(np.shape(rows), dtype=self.dtype)
+        keys, inverse = np.unique(
+            np.stack([tile_rows, tile_cols], axis=-1).reshape(-1, 2),
+            axis=0,
+            return_inverse=True,
+        )
+        inverse = inverse.reshape(np.shape(rows))
+        for index, key in enumerate(map(tuple, keys.tolist())):
+            tile = self.tiles.get(key)
+            if tile is not None:
+                mask = inverse == index
+                values[mask] = tile[local_rows[mask], local_cols[mask]]
+        return values
+
+    def copy(self):
+        """타일을 공유하는 복사본. 이후 양쪽 모두 공유 타일에 쓸 때 복사한다."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.tiles = dict(self.tiles)
+        clone.layers = []
+        self._owned = set()
+        clone._owned = set()
+        return clone
+
+    def _tile(self, key):
+        """쓰기용 타일. 공유 중이면 복사한다."""
+        if key in self._owned:
+            return self.tiles[key]
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = np.zeros((self.tile_size, self.tile_size), dtype=self.dtype)
+        else:
+            # 공유 타일, 또는 불러온 맵의 읽기 전용 memmap 타일
+            tile = np.array(tile)
+        self.tiles[key] = tile
+        self._owned.add(key)
+        return tile
+
+    def update_cell(self, position, p):
+        cols = np.array([pos[0] for pos in position])
+        rows = np.array([pos[1] for pos in position])
+        occupied = np.zeros(len(position), dtype=bool)
+        occupied[-1] = True
+        self._accumulate(rows, cols, occupied, p)
+
+    def add_ray(self, start, angle, range, p):
+        self.add_scan(start, [angle], [range], p)
+
+    def _trace(self, x0, y0, x1, y1, no_return):
+        # 맵 경계가 없으므로 자르지 않는다.
+        if self.ray_table is None:
+            cols, rows, is_end, beam = trace_cells(x0, y0, x1, y1)
+        else:
+            cols, rows, is_end, beam = self.ray_table.trace(x0, y0, x1, y1)
+        return cols, rows, is_end, beam, ~no_return
+
+    def _accumulate(self, rows, cols, occupied, p):
+        if rows.size == 0:
+            return
+        size = self.tile_size
+        tile_rows, local_rows = np.divmod(rows, size)
+        tile_cols, local_cols = np.divmod(cols, size)
+
+        # 셀 인덱스 = 타일 번호(이번 갱신 범위 기준) * 타일크기 + 타일 내 위치
+        tile_row0 = int(tile_rows.min())
+        tile_col0 = int(tile_cols.min())
+        tile_cols_count = int(tile_cols.max()) - tile_col0 + 1
+        tile_id = (tile_rows - tile_row0) * tile_cols_count + (tile_cols - tile_col0)
+        index = tile_id * (size * size) + local_rows * size + local_cols
+        cells, inverse = np.unique(index, return_inverse=True)
+        delta = self._delta(inverse.reshape(-1), occupied, cells.size, p)
+
+        # cells는 정렬되어 있으므로 타일별로 연속된 구간이다.
+        cell_tile, cell_local = np.divmod(cells, size * size)
+        starts = np.flatnonzero(np.r_[True, cell_tile[1:] != cell_tile[:-1]])
+        ends = np.r_[starts[1:], cells.size]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            key_row, key_col = divmod(int(cell_tile[start]), tile_cols_count)
+            flat = self._tile((tile_row0 + key_row, tile_col0 + key_col)).reshape(-1)
+            local = cell_local[start:end]
+            flat[local] = self._saturate(flat[local], delta[start:end])
+
+        self.version += 1
+        self.mark_dirty(rows, cols)
+        update = (
+            int(rows.min()),
+            int(cols.min()),
+            int(rows.max()) + 1,
+            int(cols.max()) + 1,
+        )
+        self.extent = update if self.extent is None else self._union(self.extent, update)
+
+    @staticmethod
+    def _union(a, b):
+        return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
@@ -2,13 +2,17 @@ import os
 from ament_index_python.packages import get_package_share_directory
 from launch import LaunchDescription
 from launch_ros.actions import Node
-from launch.actions import IncludeLaunchDescription
+from launch.actions import DeclareLaunchArgument, IncludeLaunchDescription
 from launch.launch_description_sources import PythonLaunchDescriptionSource
+from launch.substitutions import LaunchConfiguration
 
 
 def generate_launch_description():
     package_name = "gmapping"
 
+    # 맵 상태 디렉토리. 지정하면 불러와서 시작하고 종료 시 저장한다. (비우면 저장하지 않음)
+    map_file = DeclareLaunchArgument("map_file", default_value="")
+
     unity_launch = IncludeLaunchDescription(
         PythonLaunchDescriptionSource(
             os.path.join(
@@ -22,7 +26,7 @@ def generate_launch_description():
         package=package_name,
         executable="create_map",
         output="screen",
-        parameters=[],
+        parameters=[{"map_file": LaunchConfiguration("map_file")}],
     )
 
-    return LaunchDescription([unity_launch, grid_map_node])
+    return LaunchDescription([map_file, unity_launch, grid_map_node])
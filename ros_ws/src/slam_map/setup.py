@@ -32,6 +32,8 @@ setup(
         "console_scripts": [
             f"occupancy_gridmap = {package_name}.occupancy_gridmap:main",
             f"create_map = {package_name}.gridmap_create:main",
+            f"map_benchmark = {package_name}.benchmark:main",
+            f"offline_map = {package_name}.offline_mapper:main",
         ],
     },
 )
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from gmapping.utils_lib.gridmap import GridMap, log_ods
+
+
+def baseline_update_cell(grid, position, p):
+    """기존 셀별 파이썬 루프 (float 맵)"""
+    for col, row in position[:-1]:
+        grid[row][col] = np.clip(grid[row][col] + log_ods(1 - p), GridMap.LMIN, GridMap.LMAX)
+    col, row = position[-1]
+    grid[row][col] = np.clip(grid[row][col] + log_ods(p), GridMap.LMIN, GridMap.LMAX)
+
+
+@pytest.mark.parametrize("fixed_point", [False, True])
+def test_update_cell_matches_loop(fixed_point):
+    rng = np.random.default_rng(0)
+    gridmap = GridMap((0, 0), None, cell_size=0.1, map_width=2, fixed_point=fixed_point)
+    expected = np.zeros(gridmap.grid.shape)
+    for _ in range(200):
+        # 한 빔의 셀은 서로 다르다.
+        cells = rng.choice(gridmap.grid.size, rng.integers(1, 12), replace=False)
+        position = [(int(c % 20), int(c // 20)) for c in cells]
+        gridmap.update_cell(position, 0.7)
+        baseline_update_cell(expected, position, 0.7)
+    if fixed_point:
+        # 고정소수점은 정수 증분이라 값은 근사, 부호(빈/점유/미탐색)는 같다.
+        assert np.array_equal(np.sign(gridmap.grid), np.sign(expected))
+    else:
+        assert np.allclose(gridmap.grid, expected)
+    assert gridmap.version == 200
+    assert gridmap.pop_dirty() == (0, 0, 20, 20)
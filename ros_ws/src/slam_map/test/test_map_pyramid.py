@@ -0,0 +1,21 @@
+import numpy as np
+from gmapping.utils_lib.gridmap import GridMap
+from gmapping.utils_lib.map_pyramid import MapPyramid
+
+
+def test_max_level_ignores_unknown_cells():
+    gridmap = GridMap((0.0, 0.0), None, cell_size=0.1, map_width=1.0)
+    pyramid = MapPyramid(gridmap, factors=(5,), tile_cells=10)
+    grid = gridmap.grid
+    # 왼쪽 위: 빈 셀 사이에 미탐색 셀 하나
+    grid[:5, :5] = -2.0
+    grid[2, 2] = 0.0
+    # 오른쪽 위: 빈 셀 사이에 장애물 하나
+    grid[:5, 5:] = -2.0
+    grid[1, 7] = 3.0
+    # 왼쪽 아래: 미탐색 셀과 장애물 하나
+    grid[8, 1] = 3.0
+    # 오른쪽 아래: 전부 미탐색
+    gridmap.mark_region(0, 0, 10, 10)
+    level, _ = pyramid.get_level(1)
+    assert np.array_equal(level, [[-2.0, 3.0], [3.0, 0.0]])
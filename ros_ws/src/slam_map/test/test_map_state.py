@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from gmapping.utils_lib.map_state import load_map_state, save_map_state
+from gmapping.utils_lib.tiled_gridmap import TiledGridMap
+
+
+def saved_map(path, **kwargs):
+    gridmap = TiledGridMap((0, 0), None, **kwargs)
+    gridmap.add_scan((0.0, 0.0), np.linspace(-1.0, 1.0, 20), np.full(20, 2.0), 0.7)
+    save_map_state(gridmap, str(path))
+    return gridmap
+
+
+def test_load_map_state_round_trip(tmp_path):
+    gridmap = saved_map(tmp_path, cell_size=0.1, fixed_point=True)
+    loaded = load_map_state(str(tmp_path), cell_size=0.1, tile_size=64, fixed_point=True)
+    assert loaded.bounds() == gridmap.bounds()
+    assert np.array_equal(loaded.get_map(), gridmap.get_map())
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [dict(cell_size=0.05), dict(tile_size=32), dict(fixed_point=False)],
+)
+def test_load_map_state_refuses_other_settings(tmp_path, settings):
+    saved_map(tmp_path, cell_size=0.1, fixed_point=True)
+    expected = dict(cell_size=0.1, tile_size=64, fixed_point=True)
+    expected.update(settings)
+    with pytest.raises(ValueError, match="does not match"):
+        load_map_state(str(tmp_path), **expected)
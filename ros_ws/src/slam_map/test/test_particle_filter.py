@@ -0,0 +1,18 @@
+import numpy as np
+from gmapping.utils_lib.particle_filter import ParticleFilterSLAM
+
+ANGLES = -1.57 + np.arange(65) * 3.14 / 65
+
+
+def test_gather_matches_values_at():
+    rng = np.random.default_rng(0)
+    pf = ParticleFilterSLAM(20, seed=0)
+    ranges = rng.uniform(1.0, 4.0, len(ANGLES))
+    for step in range(15):
+        # 리샘플링으로 입자들이 타일을 공유/복사한 상태를 만든다.
+        pf.update((0.05 * step, 0.0), 0.02 * step + ANGLES, ranges, 0.7, 10.0)
+    rows = rng.integers(-80, 150, (pf.count, 300))
+    cols = rng.integers(-80, 150, (pf.count, 300))
+    expected = np.stack([m.values_at(r, c) for m, r, c in zip(pf.maps, rows, cols)])
+    assert np.array_equal(pf._gather(rows, cols), expected)
+    assert pf.resampled > 0
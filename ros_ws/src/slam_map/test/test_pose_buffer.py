@@ -0,0 +1,56 @@
+import numpy as np
+from gmapping.utils_lib.pose_buffer import PoseBuffer
+
+SECOND = 1_000_000_000
+
+
+def test_lookup_interpolates_between_poses():
+    buffer = PoseBuffer(capacity=8)
+    buffer.add(1 * SECOND, 0.0, 0.0, 0.0)
+    buffer.add(2 * SECOND, 1.0, 2.0, 0.5)
+    buffer.add(3 * SECOND, 1.0, 4.0, 1.0)
+    poses = buffer.lookup(np.array([1, 1.5, 2.5, 3]) * SECOND)
+    assert np.allclose(poses, [[0, 0, 0], [0.5, 1, 0.25], [1, 3, 0.75], [1, 4, 1]])
+    # 최신 pose 이후 max_extrapolation까지는 최신 pose, 그 이후와 가장 오래된 pose 이전은 None
+    assert np.allclose(buffer.lookup(3 * SECOND + SECOND // 20), [1, 4, 1])
+    assert buffer.lookup(4 * SECOND) is None
+    assert buffer.lookup(SECOND // 2) is None
+    assert (buffer.too_new, buffer.too_old) == (1, 1)
+    # 시간이 거꾸로 가는 pose는 무시한다.
+    assert not buffer.add(2 * SECOND, 9.0, 9.0, 0.0)
+
+
+def test_lookup_wraps_theta_across_pi():
+    buffer = PoseBuffer(capacity=8)
+    buffer.add(0, 0.0, 0.0, np.pi - 0.1)
+    buffer.add(SECOND, 0.0, 0.0, -np.pi + 0.1)
+    # 0.2 rad 회전의 중간은 0이 아니라 pi
+    theta = buffer.lookup(SECOND // 2)[2]
+    assert np.isclose(abs(theta), np.pi)
+    assert np.isclose(buffer.lookup(SECOND // 4)[2], np.pi - 0.05)
+
+
+def test_ring_keeps_latest_capacity_poses():
+    buffer = PoseBuffer(capacity=4)
+    for i in range(10):
+        buffer.add(i * SECOND, float(i), 0.0, 0.0)
+    assert len(buffer) == 4
+    assert (buffer.oldest(), buffer.latest()) == (6 * SECOND, 9 * SECOND)
+    assert np.isclose(buffer.lookup(7.5 * SECOND)[0], 7.5)
+    assert buffer.lookup(5 * SECOND) is None
+
+
+def test_clock_mismatch_falls_back_to_latest_pose():
+    buffer = PoseBuffer(capacity=8)
+    # pose는 시뮬레이션 시각, 스캔은 벽시계 시각(또는 0)
+    buffer.add(100 * SECOND, 0.0, 0.0, 0.0)
+    buffer.add(101 * SECOND, 1.0, 0.0, 0.2)
+    for stamps in (1_700_000_000 * SECOND, 0):
+        assert buffer.lookup(stamps) is None
+        assert buffer.clock_mismatch(stamps, tolerance=1.0)
+    assert np.allclose(buffer.latest_pose(), [1.0, 0.0, 0.2])
+    assert buffer.stats()["fallbacks"] == 1
+    # tolerance 안쪽이면 같은 시계로 보고 None(폐기/대기)을 그대로 둔다.
+    assert buffer.lookup(101.5 * SECOND) is None
+    assert not buffer.clock_mismatch(101.5 * SECOND, tolerance=1.0)
+    assert not PoseBuffer().clock_mismatch(0)
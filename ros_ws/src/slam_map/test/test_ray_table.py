@@ -0,0 +1,36 @@
+import numpy as np
+from gmapping.utils_lib.gridmap import RayTable, trace_cells
+
+
+def _ends(result):
+    cols, rows, is_end, beam = result
+    return cols[is_end], rows[is_end], np.bincount(beam)
+
+
+def test_diagonal_beam_reaches_range():
+    # 셀 내 오프셋/각도가 양자화 중앙값과 같으면 DDA와 같아야 한다.
+    x0 = y0 = np.array([0.25])
+    length = 40.3
+    x1, y1 = x0 + length * np.cos(np.pi / 4), y0 + length * np.sin(np.pi / 4)
+    table = RayTable()
+    cols, rows, counts = _ends(table.trace(x0, y0, x1, y1))
+    ref_cols, ref_rows, ref_counts = _ends(trace_cells(x0, y0, x1, y1))
+    assert (cols.tolist(), rows.tolist()) == (ref_cols.tolist(), ref_rows.tolist())
+    assert counts.tolist() == ref_counts.tolist()
+
+
+def test_matches_trace_cells_on_random_beams():
+    rng = np.random.default_rng(0)
+    n = 2000
+    x0, y0 = rng.uniform(0, 50, n), rng.uniform(0, 50, n)
+    angle = rng.uniform(-np.pi, np.pi, n)
+    length = rng.uniform(0.5, 80, n)
+    x1, y1 = x0 + length * np.cos(angle), y0 + length * np.sin(angle)
+
+    cols, rows, counts = _ends(RayTable().trace(x0, y0, x1, y1))
+    ref_cols, ref_rows, ref_counts = _ends(trace_cells(x0, y0, x1, y1))
+    # 빔별 셀 개수는 같고, 끝 셀은 오프셋/각도 양자화 오차(80셀에서 1셀 남짓) 안이어야 한다.
+    assert counts.tolist() == ref_counts.tolist()
+    error = np.maximum(np.abs(cols - ref_cols), np.abs(rows - ref_rows))
+    assert error.max() <= 2
+    assert np.mean(error <= 1) > 0.99
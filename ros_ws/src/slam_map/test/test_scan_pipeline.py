@@ -0,0 +1,64 @@
+import time
+import numpy as np
+from gmapping.utils_lib.scan_pipeline import ScanIntegrator
+from gmapping.utils_lib.tiled_gridmap import TiledGridMap
+
+ANGLES = np.linspace(-1.5, 1.5, 30)
+
+
+class RecordingFilter:
+    """update 순서만 기록하는 입자 필터"""
+
+    def __init__(self):
+        self.starts = []
+
+    def update(self, start, angles, ranges, p, max_range):
+        self.starts.append(float(start[0][0]))
+
+    def sync_view(self, view):
+        pass
+
+
+def scans(count):
+    rng = np.random.default_rng(0)
+    return [
+        ((0.1 * i, 0.0), ANGLES + 0.05 * i, rng.uniform(1.0, 3.0, ANGLES.size))
+        for i in range(count)
+    ]
+
+
+def test_thread_integrates_in_submit_order():
+    integrator = ScanIntegrator(
+        TiledGridMap((0, 0), None), batch_size=4, particle_filter=RecordingFilter()
+    )
+    integrator.start()
+    for start, angles, ranges in scans(20):
+        integrator.submit(start, angles, ranges)
+        time.sleep(0.001)
+    integrator.close()
+    assert integrator.particle_filter.starts == [0.1 * i for i in range(20)]
+    assert integrator.dropped == 0
+
+
+def test_full_queue_drops_oldest_scans():
+    integrator = ScanIntegrator(
+        TiledGridMap((0, 0), None), max_queue=5, particle_filter=RecordingFilter()
+    )
+    # 스레드를 시작하지 않아 큐가 찬다.
+    for start, angles, ranges in scans(12):
+        integrator.submit(start, angles, ranges)
+    assert integrator.dropped == 7
+    integrator.close()
+    assert integrator.particle_filter.starts == [0.1 * i for i in range(7, 12)]
+
+
+def test_batches_match_sequential_add_scan():
+    expected = TiledGridMap((0, 0), None)
+    integrator = ScanIntegrator(TiledGridMap((0, 0), None), batch_size=1)
+    for start, angles, ranges in scans(10):
+        expected.add_scan(start, angles, ranges, 0.7)
+        integrator.submit(start, angles, ranges)
+    integrator.close()
+    assert integrator.gridmap.bounds() == expected.bounds()
+    assert np.array_equal(integrator.gridmap.get_map(), expected.get_map())
+    assert integrator.gridmap.version == expected.version
@@ -0,0 +1,60 @@
+import numpy as np
+from gmapping.utils_lib.gridmap import GridMap
+from gmapping.utils_lib.tiled_gridmap import TiledGridMap
+
+ANGLES = np.linspace(-np.pi, np.pi, 90, endpoint=False)
+
+
+def test_matches_dense_gridmap_inside_initial_area():
+    dense = GridMap((0, 0), None, cell_size=0.1, map_width=10)
+    tiled = TiledGridMap((0, 0), None, cell_size=0.1, map_width=10, tile_size=16)
+    for gridmap in (dense, tiled):
+        gridmap.add_scan((0.3, -0.2), ANGLES, np.full(ANGLES.size, 3.0), 0.7)
+    assert tiled.bounds() == dense.bounds()
+    assert np.array_equal(tiled.get_map(), dense.get_map())
+
+
+def test_bounds_grow_in_every_direction():
+    gridmap = TiledGridMap((0, 0), None, cell_size=0.1, map_width=2, tile_size=16)
+    assert gridmap.bounds() == (0, 0, 20, 20)
+    assert gridmap.memory_usage() == 0
+    # 초기 영역 (-1 ~ 1m) 밖으로 4m 빔
+    gridmap.add_scan((0.0, 0.0), ANGLES, np.full(ANGLES.size, 4.0), 0.7)
+    row0, col0, row1, col1 = gridmap.bounds()
+    assert row0 < -20 and col0 < -20 and row1 > 40 and col1 > 40
+    grid = gridmap.get_map()
+    assert grid.shape == (row1 - row0, col1 - col0)
+    # 원점은 (-1, -1)m, (0, -4)m 빔 끝의 장애물은 셀 (-30, 10) 근처
+    assert gridmap.read_region(-31, 9, -29, 12).max() > 0
+
+
+def test_allocates_only_visited_tiles():
+    gridmap = TiledGridMap((0, 0), None, cell_size=0.1, map_width=2, tile_size=16)
+    # 대각선 8m 빔 하나: 지나는 타일만 할당한다.
+    gridmap.add_scan((0.0, 0.0), [np.pi / 4], [8.0], 0.7)
+    row0, col0, row1, col1 = gridmap.extent
+    assert row1 - row0 > 50 and col1 - col0 > 50
+    assert len(gridmap.tiles) <= 2 * (row1 - row0) // 16 + 2
+    assert gridmap.memory_usage() == len(gridmap.tiles) * 16 * 16 * 8
+
+
+def test_copy_shares_tiles_until_write():
+    gridmap = TiledGridMap((0, 0), None, cell_size=0.1, map_width=4, tile_size=16)
+    gridmap.add_scan((0.0, 0.0), ANGLES, np.full(ANGLES.size, 1.0), 0.7)
+    before = gridmap.get_map().copy()
+    clone = gridmap.copy()
+    assert all(clone.tiles[key] is tile for key, tile in gridmap.tiles.items())
+
+    # 복사본에 쓰면 쓴 타일만 복사되고 원본은 그대로다.
+    clone.add_scan((0.0, 0.0), [0.0], [1.5], 0.7)
+    assert np.array_equal(gridmap.get_map(), before)
+    assert not np.array_equal(clone.get_map(), before)
+    copied = [key for key in gridmap.tiles if clone.tiles[key] is not gridmap.tiles[key]]
+    assert 0 < len(copied) < len(gridmap.tiles)
+
+    # 원본도 공유 중인 타일에 쓰기 전에 복사한다.
+    shared = next(key for key in gridmap.tiles if key not in copied)
+    clone_tile = clone.tiles[shared].copy()
+    gridmap.add_scan((0.0, 0.0), ANGLES, np.full(ANGLES.size, 1.0), 0.7)
+    assert gridmap.tiles[shared] is not clone.tiles[shared]
+    assert np.array_equal(clone.tiles[shared], clone_tile)